@@ -1,7 +1,12 @@
 from django.contrib import admin
-from .models import Category,Transaction
+from .models import Budget,BudgetEvent,Category,ExchangeRate,MonthlyRollup,RecurringRule,Transaction,TransactionTombstone
 
 # Register your models here.
 admin.site.register(Category)
 admin.site.register(Transaction)
-
+admin.site.register(MonthlyRollup)
+admin.site.register(RecurringRule)
+admin.site.register(Budget)
+admin.site.register(BudgetEvent)
+admin.site.register(ExchangeRate)
+admin.site.register(TransactionTombstone)
@@ -0,0 +1,380 @@
+"""Time-bucketed spending analytics.
+
+`spending_analytics` builds the data behind the analytics endpoint for one
+user and a set of list-page filters:
+
+- `series`: income, expense and net per day/week/month bucket, plus the
+  running balance at the end of each bucket;
+- `categories`: one series of per-bucket totals for every category;
+- `rolling`: for every day with activity, that day's spending and the
+  average daily spending over the trailing 30 calendar days.
+
+Each series is one grouped query. Monthly series over whole months are read
+from `MonthlyRollup` instead of the raw rows. Running balances and the
+rolling average are computed by the database with window functions where the
+backend supports them (`Window` over the grouped rows, a `RANGE` frame over a
+day number for the 30-day average). Backends without that support (Django
+does not allow offset `RANGE` frames on PostgreSQL, for example) fetch the
+grouped rows and compute the same numbers with vectorized NumPy cumulative
+sums, or plain Python when NumPy is not installed.
+
+Sums are fetched as integer cents and dates as ISO strings, skipping the
+per-value `Decimal`/`date` conversions, and every series is returned column-oriented
+(one list per key), which is what charting libraries consume and keeps the
+JSON small. Amounts are returned as numbers in units of the user's base
+currency: raw rows sum the stored `base_amount` (see `currency.py`).
+
+`aspending_analytics` is the async variant used by the ASGI views: the
+three grouped queries are awaited together with `asyncio.gather`, leaving
+the event loop free to serve other requests while they run.
+
+Buckets are always whole periods: `start_date` is moved back to the start
+of its week or month. Window functions need the rows before `start_date` too
+(the opening balance and the first 30-day window), so for `series` and
+`rolling` the earlier rows are read and dropped after the window is applied.
+"""
+
+import asyncio
+import bisect
+import datetime
+from itertools import accumulate
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.db.models import BigIntegerField, CharField, F, Func, IntegerField, Q, Sum, ValueRange, Window
+from django.db.models.functions import Cast, TruncMonth, TruncWeek
+
+from .cache import get_categories
+from .models import MonthlyRollup, Transaction
+from .rollups import whole_month_bounds
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is optional
+    np = None
+
+
+PERIODS = ('day', 'week', 'month')
+ROLLING_DAYS = 30
+
+
+class WindowSum(Func):
+    """`SUM(...)` usable over already grouped rows inside a `Window`.
+
+    `Sum` refuses to wrap other aggregates, but summing per-group aggregates
+    across a window frame is valid SQL and exactly what running totals need.
+    """
+    function = 'SUM'
+    window_compatible = True
+    output_field = BigIntegerField()
+
+
+class DayNumber(Func):
+    """Integer day number of a date, so `RANGE` frames can count days."""
+    output_field = IntegerField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='CAST(julianday(%(expressions)s) AS INTEGER)', **extra_context)
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="(%(expressions)s - DATE '1970-01-01')", **extra_context)
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='TO_DAYS(%(expressions)s)', **extra_context)
+
+
+class WeekStart(TruncWeek):
+    """`TruncWeek` using SQLite's own date() instead of a Python function."""
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.lhs)
+        return f"date({sql}, 'weekday 0', '-6 days')", params
+
+
+class MonthStart(TruncMonth):
+    """`TruncMonth` using SQLite's own date() instead of a Python function."""
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.lhs)
+        return f"date({sql}, 'start of month')", params
+
+
+def _cents_sum(field, **kwargs):
+    # Raw integer cents: CentsField would build a Decimal per value
+    return Sum(field, output_field=BigIntegerField(), **kwargs)
+
+
+def _iso(expression):
+    # 'YYYY-MM-DD' straight from the database, ready for JSON
+    return Cast(expression, CharField())
+
+
+def _cumsum(values):
+    """Cumulative sums of a list of ints (NumPy when available)."""
+    if np is None:
+        return list(accumulate(values))
+    return np.cumsum(np.array(values, dtype=np.int64)).tolist()
+
+
+def _units(cents):
+    """Convert a list of int cents to currency units (floats)."""
+    if np is None:
+        return [value / 100 for value in cents]
+    return (np.array(cents, dtype=np.int64) / 100).tolist()
+
+
+def _window_frames_supported():
+    return connection.features.supports_over_clause and connection.features.supports_frame_range_fixed_distance
+
+
+def bucket_start(date, period):
+    """Return the first day of the `period` bucket containing `date`."""
+    if period == 'week':
+        return date - datetime.timedelta(days=date.weekday())
+    if period == 'month':
+        return date.replace(day=1)
+    return date
+
+
+def _base_queryset(user, end=None, category_id=None):
+    qs = Transaction.objects.filter(user=user)
+    if end is not None:
+        qs = qs.filter(date__lte=end)
+    if category_id is not None:
+        qs = qs.filter(category_id=category_id)
+    return qs.order_by()
+
+
+def _source(user, period, start=None, end=None, category_id=None):
+    """Return `(queryset, date_field, amount_field, type_field)` to group.
+
+    Whole-month ranges by month use `MonthlyRollup`, everything else the raw
+    transactions. `start` only matters for choosing the source; callers apply
+    it themselves.
+    """
+    bounds = whole_month_bounds(start, end) if period == 'month' else None
+    if bounds is None:
+        return _base_queryset(user, end, category_id), 'date', 'base_amount', 'category__type'
+    qs = MonthlyRollup.objects.filter(user=user)
+    if bounds[1] is not None:
+        qs = qs.filter(month__lte=bounds[1])
+    if category_id is not None:
+        qs = qs.filter(category_id=category_id)
+    return qs.order_by(), 'month', 'total', 'type'
+
+
+def _with_bucket(qs, period, date_field):
+    if date_field == 'month':
+        # Rollup rows are already one per month
+        return qs.annotate(bucket=_iso('month'))
+    if period == 'week':
+        return qs.annotate(bucket=_iso(WeekStart('date')))
+    if period == 'month':
+        return qs.annotate(bucket=_iso(MonthStart('date')))
+    return qs.annotate(bucket=_iso('date'))
+
+
+def _balance_rows(user, period, start=None, end=None, category_id=None):
+    """Return `(queryset, windowed)` of per-bucket `(bucket, income, expense[, balance])`."""
+    qs, date_field, amount, type_field = _source(user, period, start, end, category_id)
+    rows = (
+        _with_bucket(qs, period, date_field)
+        .values('bucket')
+        .annotate(
+            income=_cents_sum(amount, filter=Q(**{type_field: 'income'}), default=0),
+            expense=_cents_sum(amount, filter=Q(**{type_field: 'expense'}), default=0),
+        )
+        .order_by('bucket')
+    )
+    if connection.features.supports_over_clause:
+        rows = rows.annotate(
+            balance=Window(WindowSum(F('income') - F('expense')), order_by=F('bucket').asc()),
+        )
+        return rows.values_list('bucket', 'income', 'expense', 'balance'), True
+    return rows.values_list('bucket', 'income', 'expense'), False
+
+
+def _balance_from_rows(rows, windowed, start=None):
+    if not windowed:
+        balances = _cumsum([income - expense for _bucket, income, expense in rows])
+        rows = [row + (balance,) for row, balance in zip(rows, balances)]
+
+    if start is not None:
+        start = start.isoformat()
+    series = {'bucket': [], 'income': [], 'expense': [], 'net': [], 'balance': []}
+    for bucket, income, expense, balance in rows:
+        if start is not None and bucket < start:
+            continue
+        series['bucket'].append(bucket)
+        series['income'].append(income)
+        series['expense'].append(expense)
+        series['net'].append(income - expense)
+        series['balance'].append(balance)
+    return series
+
+
+def balance_series(user, period, start=None, end=None, category_id=None):
+    """Return per-bucket income/expense/net and the running balance, in cents.
+
+    Buckets are ISO date strings.
+    """
+    rows, windowed = _balance_rows(user, period, start, end, category_id)
+    return _balance_from_rows(list(rows), windowed, start)
+
+
+def _category_rows(user, period, start=None, end=None, category_id=None):
+    qs, date_field, amount, _type_field = _source(user, period, start, end, category_id)
+    if start is not None:
+        qs = qs.filter(**{f'{date_field}__gte': start})
+    return (
+        _with_bucket(qs, period, date_field)
+        .values_list('category_id', 'bucket')
+        .annotate(total=_cents_sum(amount))
+        .order_by('category_id', 'bucket')
+    )
+
+
+def _category_from_rows(rows):
+    series = {}
+    for cat_id, bucket, total in rows:
+        buckets, totals = series.setdefault(cat_id, ([], []))
+        buckets.append(bucket)
+        totals.append(total)
+    return series
+
+
+def category_series(user, period, start=None, end=None, category_id=None):
+    """Return `{category_id: ([bucket, ...], [total_cents, ...])}`."""
+    return _category_from_rows(_category_rows(user, period, start, end, category_id))
+
+
+def _rolling_rows(user, end=None, category_id=None, days=ROLLING_DAYS):
+    """Return `(queryset, windowed)` of per-day `(day, expense[, window_total])`."""
+    rows = (
+        _base_queryset(user, end, category_id)
+        .values(day=_iso('date'))
+        .annotate(expense=_cents_sum('base_amount', filter=Q(category__type='expense'), default=0))
+        .order_by('day')
+    )
+    if _window_frames_supported():
+        rows = rows.annotate(
+            window_total=Window(
+                WindowSum('expense'),
+                order_by=DayNumber('date').asc(),
+                frame=ValueRange(start=-(days - 1), end=0),
+            ),
+        )
+        return rows.values_list('day', 'expense', 'window_total'), True
+    return rows.values_list('day', 'expense'), False
+
+
+def _rolling_from_rows(daily, windowed, start=None, days=ROLLING_DAYS):
+    if not windowed:
+        daily = [row + (total,) for row, total in zip(daily, _trailing_totals(daily, days))]
+
+    first = 0
+    if start is not None:
+        first = bisect.bisect_left([day for day, _expense, _total in daily], start.isoformat())
+    daily = daily[first:]
+    return (
+        [day for day, _expense, _total in daily],
+        [expense for _day, expense, _total in daily],
+        [total for _day, _expense, total in daily],
+    )
+
+
+def rolling_average(user, start=None, end=None, category_id=None, days=ROLLING_DAYS):
+    """Return `(dates, expense_cents, trailing_total_cents)` for days with activity.
+
+    Dates are ISO strings. `trailing_total_cents[i]` is the spending over the `days` calendar days
+    ending on (and including) `dates[i]`.
+    """
+    rows, windowed = _rolling_rows(user, end, category_id, days)
+    return _rolling_from_rows(list(rows), windowed, start, days)
+
+
+def _trailing_totals(daily, days):
+    """Sum of the expenses in the trailing `days`-day window of each row."""
+    if not daily:
+        return []
+    ordinals = [datetime.date.fromisoformat(day).toordinal() for day, _expense in daily]
+    offsets = [ordinal - ordinals[0] for ordinal in ordinals]
+    cumulative = _cumsum([expense for _day, expense in daily])
+    if np is not None:
+        # Index of the first row inside each row's window
+        positions = np.searchsorted(np.array(offsets), np.array(offsets) - days, side='right').tolist()
+    else:
+        positions = [bisect.bisect_right(offsets, offset - days) for offset in offsets]
+    return [
+        cumulative[index] - (cumulative[position - 1] if position else 0)
+        for index, position in enumerate(positions)
+    ]
+
+
+def _result(period, series, category_rows, rolling, all_categories):
+    names = {category.pk: (category.name, category.type) for category in all_categories}
+    categories = []
+    for cat_id, (buckets, totals) in category_rows.items():
+        name, category_type = names.get(cat_id, ('', ''))
+        categories.append({
+            'id': cat_id, 'name': name, 'type': category_type,
+            'bucket': buckets, 'total': _units(totals),
+        })
+    dates, expenses, trailing = rolling
+
+    return {
+        'period': period,
+        'series': {
+            'bucket': series['bucket'],
+            **{key: _units(series[key]) for key in ('income', 'expense', 'net', 'balance')},
+        },
+        'categories': categories,
+        'rolling': {
+            'date': dates,
+            'expense': _units(expenses),
+            'average': [round(total / ROLLING_DAYS / 100, 2) for total in trailing],
+        },
+    }
+
+
+def spending_analytics(user, period='month', start=None, end=None, category_id=None):
+    """Return all analytics series as a JSON-serializable dict.
+
+    `start`/`end` are dates or None; `period` is one of `PERIODS`.
+    """
+    if start is not None:
+        start = bucket_start(start, period)
+    return _result(
+        period,
+        balance_series(user, period, start, end, category_id),
+        category_series(user, period, start, end, category_id),
+        rolling_average(user, start, end, category_id),
+        get_categories(),
+    )
+
+
+async def _alist(queryset):
+    # `async for` over the queryset fetches all rows in one thread hop; unlike
+    # `aiterator()` it also works for plain `values_list` querysets
+    return [row async for row in queryset]
+
+
+async def aspending_analytics(user, period='month', start=None, end=None, category_id=None):
+    """Async `spending_analytics`: the three grouped queries run under one `gather`."""
+    if start is not None:
+        start = bucket_start(start, period)
+    balance_rows, balance_windowed = _balance_rows(user, period, start, end, category_id)
+    rolling_rows, rolling_windowed = _rolling_rows(user, end, category_id)
+    balance, categories, daily, all_categories = await asyncio.gather(
+        _alist(balance_rows),
+        _alist(_category_rows(user, period, start, end, category_id)),
+        _alist(rolling_rows),
+        sync_to_async(get_categories)(),
+    )
+    return _result(
+        period,
+        _balance_from_rows(balance, balance_windowed, start),
+        _category_from_rows(categories),
+        _rolling_from_rows(daily, rolling_windowed, start),
+        all_categories,
+    )
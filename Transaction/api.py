@@ -0,0 +1,145 @@
+"""JSON API for transactions (Django REST framework).
+
+`TransactionListAPIView` lists the authenticated user's transactions with
+cursor pagination, the same filters as the list page (`start_date`,
+`end_date`, `category`, full-text `q`, `duplicates`; malformed values answer
+400) and sparse fieldsets via `?fields=a,b,c`.
+
+Responses carry a weak ETag derived from the user's latest `updated_at`, row
+count and the request's query string. A matching `If-None-Match` is answered
+with 304 before any row is fetched or serialized, which makes polling cheap.
+
+`TransactionSyncAPIView` is the offline sync endpoint: GET returns the
+changes since a watermark, POST applies a batch of offline edits (see
+`sync.py`).
+"""
+
+import hashlib
+from dataclasses import asdict
+
+from django.db import IntegrityError
+from django.db.models import Count, Max
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import sync
+from .currency import base_currency
+from .models import Transaction
+from .pagination import FILTER_KEYS, ORDERING, invalid_filters
+from .serializers import FIELD_SOURCES, SyncUploadSerializer, TransactionSerializer
+from .views import filter_transactions
+
+
+class TransactionCursorPagination(CursorPagination):
+    """Keyset pagination matching the list page ordering."""
+    ordering = ORDERING
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+
+class TransactionListAPIView(generics.ListAPIView):
+    """GET /api/transactions/ — the user's transactions, newest first."""
+    serializer_class = TransactionSerializer
+    pagination_class = TransactionCursorPagination
+    performance_budget = {"queries": 3}
+
+    def get_fields(self):
+        """Return the requested sparse fieldset, or None for all fields."""
+        raw = self.request.query_params.get("fields")
+        if not raw:
+            return None
+        fields = [name.strip() for name in raw.split(",") if name.strip()]
+        unknown = [name for name in fields if name not in FIELD_SOURCES]
+        if unknown:
+            raise ValidationError({"fields": f"Unknown field(s): {', '.join(unknown)}."})
+        return fields
+
+    def get_queryset(self):
+        """User's filtered transactions, restricted to the requested columns."""
+        params = {key: self.request.query_params[key] for key in FILTER_KEYS if self.request.query_params.get(key)}
+        invalid = invalid_filters(params)
+        if invalid:
+            raise ValidationError({key: "Invalid filter value." for key in invalid})
+        qs = filter_transactions(Transaction.objects.filter(user=self.request.user), params, user_id=self.request.user.pk)
+        fields = self.get_fields()
+        if fields is None:
+            return qs.select_related("category")
+
+        # The cursor needs the ordering columns even if they are not returned
+        columns = {"id", "date"}
+        for name in fields:
+            columns.update(FIELD_SOURCES[name])
+        if any(column.startswith("category__") for column in columns):
+            qs = qs.select_related("category")
+        return qs.only(*columns)
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault("fields", self.get_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def get_etag(self):
+        """Weak ETag for the user's data as seen through this query string."""
+        state = (
+            Transaction.objects.filter(user=self.request.user)
+            .order_by()
+            .aggregate(latest=Max("updated_at"), count=Count("id"))
+        )
+        latest = state["latest"].isoformat() if state["latest"] else ""
+        key = f"{latest}:{state['count']}:{self.request.get_full_path()}"
+        return "W/" + quote_etag(hashlib.md5(key.encode()).hexdigest())
+
+    def list(self, request, *args, **kwargs):
+        """Answer 304 for a matching If-None-Match, otherwise list normally."""
+        etag = self.get_etag()
+        client_etags = parse_etags(request.headers.get("If-None-Match", ""))
+        # Weak comparison: ignore the W/ prefix on either side
+        if etag.removeprefix("W/") in {tag.removeprefix("W/") for tag in client_etags} or "*" in client_etags:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        response = super().list(request, *args, **kwargs)
+        response["ETag"] = etag
+        return response
+
+
+class TransactionSyncAPIView(APIView):
+    """GET/POST /api/sync/ — offline sync of the user's transactions.
+
+    GET `?watermark=<token>&limit=N` returns
+    `{"reset", "changed", "deleted", "watermark", "has_more"}`; clients
+    repeat with the returned watermark until `has_more` is false and keep
+    the last watermark for the next sync. POST
+    `{"upserts": [...], "deletes": [...]}` returns the `sync.SyncResult`.
+    """
+    performance_budget = {"queries": 18}
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get("limit") or 0)
+        except ValueError:
+            raise ValidationError({"limit": "Enter a whole number."})
+        try:
+            page = sync.changes(request.user.pk, request.query_params.get("watermark"), limit)
+        except ValueError as exc:
+            raise ValidationError({"watermark": str(exc)})
+        rows = TransactionSerializer(page.rows, many=True, fields=sync.FIELDS, context={"request": request})
+        return Response({
+            "reset": page.reset,
+            "changed": rows.data,
+            "deleted": page.deleted,
+            "watermark": page.watermark,
+            "has_more": page.has_more,
+        })
+
+    def post(self, request):
+        serializer = SyncUploadSerializer(data=request.data, context={"base_currency": base_currency(request.user.pk)})
+        serializer.is_valid(raise_exception=True)
+        try:
+            result = sync.apply_changes(request.user.pk, **serializer.validated_data)
+        except IntegrityError:
+            # The same client_id uploaded concurrently; the retry is idempotent
+            return Response({"detail": "Concurrent upload, please retry."}, status=status.HTTP_409_CONFLICT)
+        return Response(asdict(result))
@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class TransactionConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "Transaction"
+
+    def ready(self):
+        # Register signal receivers (cache invalidation etc.)
+        from . import signals  # noqa: F401
+        from .search import install_sqlite_triggers
+
+        # SQLite drops triggers when a migration rebuilds the table
+        post_migrate.connect(install_sqlite_triggers, sender=self, dispatch_uid="transaction_search_triggers")
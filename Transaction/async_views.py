@@ -0,0 +1,148 @@
+"""Async versions of the read-only transaction views, for ASGI deployments.
+
+The list, detail and analytics pages are the busiest read paths. Under a
+sync WSGI worker every request holds the whole worker while it waits on the
+database; these views await Django's async ORM (`aiterator`, `aaggregate`,
+`aget`) instead, so one ASGI worker keeps serving other requests meanwhile.
+The list page awaits its page of rows, summary totals and budgets together
+with `asyncio.gather`.
+
+They subclass the sync views and reuse their querysets, caching and context
+building, so both modes render identical pages. `urls.py` routes to them
+when `ASYNC_READ_VIEWS` is enabled (see SETUP_STEPS.md, "ASGI mode").
+
+Helpers that are sync only (the search ranking, budgets, the base currency
+and the category lookup) are called through `sync_to_async`.
+"""
+
+import asyncio
+import json
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, HttpResponseBadRequest
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from .analytics import PERIODS, aspending_analytics
+from .budgets import budget_status
+from .cache import USER_CACHE_TTL, get_categories, user_cache_key
+from .currency import base_currency
+from .models import Transaction
+from .pagination import akeyset_page
+from .rollups import amonth_range_totals
+from .search import search_page
+from .views import (
+    TransactionAnalyticsView, TransactionDetailView, TransactionListView, _analytics_etag, totals_aggregates,
+)
+
+
+class AsyncLoginRequiredMixin(LoginRequiredMixin):
+    """`LoginRequiredMixin` for async views.
+
+    The user is loaded with `request.auser()` and stored on the request, so
+    the rest of the view (and sync helpers called from it) can read
+    `request.user` without a lazy database lookup.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = await request.auser()
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
+        return await super(LoginRequiredMixin, self).dispatch(request, *args, **kwargs)
+
+
+class AsyncTransactionListView(AsyncLoginRequiredMixin, TransactionListView):
+    """Async `TransactionListView`: page, totals and budgets are awaited together."""
+
+    async def get(self, request, *args, **kwargs):
+        self.object_list = self.get_queryset()
+        params = self.get_filter_params()
+        page, totals, budgets, currency, _categories = await asyncio.gather(
+            self.aget_page(params),
+            self.aget_totals(self.object_list),
+            sync_to_async(budget_status)(request.user.pk, timezone.localdate().replace(day=1)),
+            sync_to_async(base_currency)(request.user.pk),
+            # Loads the category cache, so building the context needs no query
+            sync_to_async(get_categories)(),
+        )
+        return self.render_to_response(self.build_context(params, page, totals, budgets, currency))
+
+    async def aget_totals(self, queryset):
+        """Async `get_totals`."""
+        params = self.get_filter_params()
+        key = await sync_to_async(user_cache_key)(self.request.user.pk, 'totals', urlencode(sorted(params.items())))
+        totals = await cache.aget(key)
+        if totals is None:
+            totals = await self.acompute_totals(queryset, params)
+            await cache.aset(key, totals, USER_CACHE_TTL)
+        return totals
+
+    async def acompute_totals(self, queryset, params):
+        """Async `compute_totals`."""
+        totals = None
+        if not params.get('q') and not params.get('duplicates'):
+            totals = await amonth_range_totals(self.request.user, *self.totals_range(params))
+        if totals is not None:
+            return totals
+
+        totals = await queryset.order_by().aaggregate(**totals_aggregates())
+        return totals['income'], totals['expense']
+
+    async def aget_page(self, params):
+        """Async `get_page`."""
+        if params.get('q'):
+            return await sync_to_async(search_page)(
+                self.object_list, params['q'], self.request.user.pk, self._position or 0, self.page_size,
+            )
+        if params or self._position is not None:
+            return await akeyset_page(self.object_list, self._position, self.page_size)
+        key = await sync_to_async(user_cache_key)(self.request.user.pk, 'first-page', self.page_size)
+        page = await cache.aget(key)
+        if page is None:
+            page = await akeyset_page(self.object_list, None, self.page_size)
+            await cache.aset(key, page, USER_CACHE_TTL)
+        return page
+
+
+class AsyncTransactionDetailView(AsyncLoginRequiredMixin, TransactionDetailView):
+    """Async `TransactionDetailView`."""
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            self.object = await self.get_queryset().aget(pk=kwargs['pk'])
+        except Transaction.DoesNotExist:
+            raise Http404("No transaction found matching the query")
+        matches = await sync_to_async(self.get_duplicate_matches)(self.object)
+        return self.render_to_response(self.get_context_data(object=self.object, duplicate_matches=matches))
+
+
+@method_decorator(condition(etag_func=_analytics_etag), name='get')
+class AsyncTransactionAnalyticsView(AsyncLoginRequiredMixin, TransactionAnalyticsView):
+    """Async `TransactionAnalyticsView`; the series are read with `aspending_analytics`."""
+
+    async def get(self, request, *args, **kwargs):
+        """Return the analytics series as JSON, or 400 for bad parameters."""
+        period = request.GET.get('period', 'month')
+        if period not in PERIODS:
+            return HttpResponseBadRequest("Unsupported period.")
+        try:
+            start = self.parse_date('start_date')
+            end = self.parse_date('end_date')
+            category = request.GET.get('category')
+            category_id = int(category) if category else None
+        except ValueError:
+            return HttpResponseBadRequest("Invalid filter value.")
+
+        key = await sync_to_async(user_cache_key)(request.user.pk, 'analytics', urlencode(sorted(request.GET.items())))
+        content = await cache.aget(key)
+        if content is None:
+            content = json.dumps(await aspending_analytics(request.user, period, start, end, category_id))
+            await cache.aset(key, content, USER_CACHE_TTL)
+        response = HttpResponse(content, content_type='application/json')
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
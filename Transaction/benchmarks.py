@@ -0,0 +1,300 @@
+"""Synthetic data generation and endpoint benchmarks.
+
+`seed_transactions` creates users with realistic-looking histories: a fixed
+set of income/expense categories, per-category amount distributions, monthly
+salary/rent and randomly spread day-to-day spending. Rows are written with
+`bulk_create` and the monthly rollups are rebuilt afterwards (bulk inserts
+bypass the Transaction signals).
+
+`run_benchmarks` drives every page in `Transaction/urls.py` through the
+Django test client at several data sizes and reports p50/p95 latency, query
+counts and peak Python memory (tracemalloc) per endpoint. It is exposed as
+the `run_benchmarks` management command, which runs against a throwaway test
+database and can save/compare JSON results.
+
+`load_test` measures concurrent throughput instead: it sends requests from
+many client threads to an already running server (e.g. gunicorn/WSGI vs
+uvicorn/ASGI, see SETUP_STEPS.md) and reports requests per second and
+latency percentiles per endpoint. It is exposed as the `load_test`
+management command.
+"""
+
+import datetime
+import http.client
+import random
+import threading
+import time
+import tracemalloc
+from decimal import Decimal
+from importlib import import_module
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from .models import Category, MonthlyRollup, Transaction
+from .rollups import rebuild_rollups
+
+
+# name -> (type, share of rows, median amount, spread)
+CATEGORY_PROFILES = {
+    "Groceries": ("expense", 0.26, 45, 0.6),
+    "Dining": ("expense", 0.16, 25, 0.7),
+    "Transport": ("expense", 0.14, 15, 0.8),
+    "Shopping": ("expense", 0.10, 60, 1.0),
+    "Utilities": ("expense", 0.06, 90, 0.4),
+    "Entertainment": ("expense", 0.07, 30, 0.9),
+    "Health": ("expense", 0.04, 70, 1.0),
+    "Rent": ("expense", 0.05, 1200, 0.1),
+    "Salary": ("income", 0.05, 3500, 0.15),
+    "Freelance": ("income", 0.03, 600, 0.8),
+}
+
+DESCRIPTIONS = {
+    "Groceries": ["Whole Foods", "Trader Joe's", "Local market", "Costco run"],
+    "Dining": ["Lunch with team", "Pizza night", "Coffee", "Sushi dinner"],
+    "Transport": ["Metro card", "Uber", "Fuel", "Parking"],
+    "Shopping": ["Amazon order", "New shoes", "Books", "Electronics"],
+    "Utilities": ["Electricity bill", "Internet", "Water bill", "Phone plan"],
+    "Entertainment": ["Movie tickets", "Concert", "Streaming subscription", "Games"],
+    "Health": ["Pharmacy", "Dentist", "Gym membership", "Doctor visit"],
+    "Rent": ["Monthly rent"],
+    "Salary": ["Monthly salary"],
+    "Freelance": ["Client invoice", "Consulting"],
+}
+
+
+def ensure_categories():
+    """Create the benchmark categories if missing and return `{name: Category}`."""
+    categories = {}
+    for name, (category_type, *_rest) in CATEGORY_PROFILES.items():
+        categories[name], _ = Category.objects.get_or_create(name=name, defaults={"type": category_type})
+    return categories
+
+
+def _amount(rng, median, spread):
+    value = rng.lognormvariate(0, spread) * median
+    return max(Decimal("0.01"), Decimal(str(round(value, 2))))
+
+
+def generate_rows(rng, user, categories, count, years=3):
+    """Yield `count` unsaved Transactions for `user` spread over `years` years.
+
+    Recent dates are more likely than old ones, like in a real account.
+    """
+    today = timezone.localdate()
+    span = max(1, int(years * 365))
+    names = list(CATEGORY_PROFILES)
+    weights = [CATEGORY_PROFILES[name][1] for name in names]
+    for _ in range(count):
+        name = rng.choices(names, weights)[0]
+        _type, _share, median, spread = CATEGORY_PROFILES[name]
+        days_ago = int(span * rng.random() ** 1.5)
+        amount = _amount(rng, median, spread)
+        # `bulk_create` skips the signals; rows are in the default (base) currency
+        yield Transaction(
+            user=user,
+            amount=amount,
+            base_amount=amount,
+            category=categories[name],
+            date=today - datetime.timedelta(days=days_ago),
+            description=rng.choice(DESCRIPTIONS[name]),
+        )
+
+
+def seed_transactions(users, per_user, years=3, seed=0, prefix="bench_user", batch_size=5000):
+    """Create `users` users with `per_user` transactions each.
+
+    Existing users with the same generated usernames are reused. Returns the
+    list of users.
+    """
+    rng = random.Random(seed)
+    categories = ensure_categories()
+    created_users = []
+    for index in range(users):
+        user, created = User.objects.get_or_create(username=f"{prefix}_{index}")
+        if created:
+            user.set_unusable_password()
+            user.save(update_fields=["password"])
+        created_users.append(user)
+
+        batch = []
+        for row in generate_rows(rng, user, categories, per_user, years):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                Transaction.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Transaction.objects.bulk_create(batch)
+
+    rebuild_rollups()
+    cache.clear()
+    return created_users
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _endpoints(sample):
+    """Return `(name, method, url, data)` for every transaction page."""
+    month_start = sample.date.replace(day=1)
+    post_data = {
+        "transaction_type": "expense",
+        "amount": "12.34",
+        "category": Category.objects.filter(type="expense").values_list("pk", flat=True).first(),
+        "date": sample.date.isoformat(),
+        "description": "Benchmark entry",
+    }
+    return [
+        ("list", "get", reverse("list"), None),
+        ("list_filtered", "get", reverse("list"), {"start_date": (month_start + datetime.timedelta(days=3)).isoformat()}),
+        ("create_form", "get", reverse("create"), None),
+        ("create", "post", reverse("create"), post_data),
+        ("detail", "get", reverse("detail", args=[sample.pk]), None),
+        ("edit_form", "get", reverse("edit", args=[sample.pk]), None),
+        ("edit", "post", reverse("edit", args=[sample.pk]), post_data),
+        ("export", "get", reverse("export"), {"format": "csv"}),
+        ("api", "get", reverse("api-transactions"), None),
+    ]
+
+
+def _request(client, method, url, data):
+    response = getattr(client, method)(url, data or {}, secure=True)
+    if getattr(response, "streaming", False):
+        for _chunk in response.streaming_content:
+            pass
+    return response
+
+
+def run_benchmarks(sizes, repeat=20, warm=False, seed=0):
+    """Benchmark every endpoint at each per-user data size.
+
+    The database is expected to be disposable: each size starts by deleting
+    all transactions and seeding one user. Unless `warm` is set the cache is
+    cleared before every request so the database work is measured.
+    Returns a list of result dicts.
+    """
+    results = []
+    for size in sizes:
+        Transaction.objects.all().delete()
+        MonthlyRollup.objects.all().delete()
+        user = seed_transactions(1, size, seed=seed)[0]
+        client = Client()
+        client.force_login(user)
+        api_token, _ = Token.objects.get_or_create(user=user)
+        sample = Transaction.objects.filter(user=user).order_by("-date", "-id").first()
+
+        for name, method, url, data in _endpoints(sample):
+            if name == "api":
+                client.defaults["HTTP_AUTHORIZATION"] = f"Token {api_token.key}"
+            timings, queries, status = [], 0, None
+            for _ in range(repeat):
+                if not warm:
+                    cache.clear()
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    response = _request(client, method, url, data)
+                    timings.append((time.perf_counter() - start) * 1000)
+                queries = len(captured)
+                status = response.status_code
+
+            if not warm:
+                cache.clear()
+            tracemalloc.start()
+            _request(client, method, url, data)
+            _current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            client.defaults.pop("HTTP_AUTHORIZATION", None)
+
+            results.append({
+                "size": size,
+                "endpoint": name,
+                "status": status,
+                "p50_ms": round(_percentile(timings, 0.50), 3),
+                "p95_ms": round(_percentile(timings, 0.95), 3),
+                "queries": queries,
+                "peak_kib": round(peak / 1024, 1),
+            })
+    return results
+
+
+def session_cookie(user):
+    """Create a logged-in session for `user` and return its `Cookie` header value.
+
+    The session is stored with the configured session engine, so a server
+    sharing this database/cache accepts it.
+    """
+    store = import_module(settings.SESSION_ENGINE).SessionStore()
+    store[SESSION_KEY] = user._meta.pk.value_to_string(user)
+    store[BACKEND_SESSION_KEY] = "django.contrib.auth.backends.ModelBackend"
+    store[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    store.save()
+    return f"{settings.SESSION_COOKIE_NAME}={store.session_key}"
+
+
+def load_test(base_url, paths, cookie, concurrency=32, requests=2000):
+    """Send `requests` GETs per path to a running server from `concurrency` threads.
+
+    Every request opens its own connection, as requests forwarded by a load
+    balancer do (sync gunicorn workers would otherwise sit idle on kept-alive
+    client connections). Returns a list of result dicts (one per path) with
+    throughput and latency.
+    """
+    parts = urlsplit(base_url)
+    connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    headers = {"Cookie": cookie, "Connection": "close", "X-Forwarded-Proto": "https"}
+    results = []
+    for path in paths:
+        remaining = iter(range(requests))
+        lock = threading.Lock()
+        timings, errors = [], []
+
+        def worker():
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        break
+                conn = connection_class(parts.netloc, timeout=60)
+                start = time.perf_counter()
+                try:
+                    conn.request("GET", path, headers=headers)
+                    response = conn.getresponse()
+                    response.read()
+                    error = None if response.status == 200 else response.status
+                except (OSError, http.client.HTTPException) as exc:
+                    error = type(exc).__name__
+                finally:
+                    conn.close()
+                elapsed = (time.perf_counter() - start) * 1000
+                with lock:
+                    timings.append(elapsed)
+                    if error is not None:
+                        errors.append(error)
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+        results.append({
+            "path": path,
+            "requests": len(timings),
+            "errors": len(errors),
+            "rps": round(len(timings) / wall, 1),
+            "p50_ms": round(_percentile(timings, 0.50), 2),
+            "p95_ms": round(_percentile(timings, 0.95), 2),
+        })
+    return results
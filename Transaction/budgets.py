@@ -0,0 +1,129 @@
+"""Monthly category budgets.
+
+A `Budget` caps what a user may spend in one category per calendar month.
+The month's spending is the matching `MonthlyRollup` bucket: rollups are
+already updated atomically with `F()` expressions on every Transaction
+create, edit (moving the amount between the old and new buckets) and
+delete, so budgets need no counter of their own and never scan
+transactions.
+
+- `budget_status` reads all of a user's budgets with their spending for a
+  month in one query (one `Subquery` per row into the rollup unique index)
+  and caches the result under the user's cache version.
+- `check_thresholds` is called by `rollups.apply_delta`/`apply_deltas`
+  right after they add spending to buckets. One query reads the updated
+  totals of the touched buckets that have a budget; the spending before
+  the write is the total minus the added amount, so every threshold
+  crossed by the write is known without looking at other rows. Crossings
+  are recorded as `BudgetEvent`s, once per budget, month and threshold.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .cache import USER_CACHE_TTL, bump_user_version, get_categories, user_cache_key
+from .fields import CentsField
+from .models import Budget, BudgetEvent, MonthlyRollup
+
+
+# Alert thresholds, in percent of the budget limit
+THRESHOLDS = tuple(getattr(settings, "BUDGET_ALERT_THRESHOLDS", (80, 100)))
+
+
+def check_thresholds(deltas):
+    """Record a `BudgetEvent` for every threshold crossed by added spending.
+
+    `deltas` maps `(user_id, month, category_id)` to the amount (currency
+    units) just added to that rollup bucket; the bucket totals must already
+    include it. Non-positive amounts are ignored.
+    """
+    added = {key: amount for key, amount in deltas.items() if amount > 0}
+    if not added:
+        return
+    budget = Budget.objects.filter(user_id=OuterRef('user_id'), category_id=OuterRef('category_id'))
+    rows = (
+        MonthlyRollup.objects.filter(
+            user_id__in={key[0] for key in added},
+            month__in={key[1] for key in added},
+            category_id__in={key[2] for key in added},
+        )
+        .annotate(
+            budget_id=Subquery(budget.values('pk')[:1]),
+            limit=Subquery(budget.values('limit')[:1], output_field=CentsField()),
+        )
+        .filter(budget_id__isnull=False)
+        .values_list('user_id', 'month', 'category_id', 'budget_id', 'limit', 'total')
+    )
+    events = []
+    for user_id, month, category_id, budget_id, limit, total in rows:
+        amount = added.get((user_id, month, category_id))
+        if amount is None:
+            continue
+        before = total - amount
+        for threshold in THRESHOLDS:
+            if before < limit * threshold / 100 <= total:
+                events.append(BudgetEvent(budget_id=budget_id, month=month, threshold=threshold, spent=total))
+    if events:
+        BudgetEvent.objects.bulk_create(events, ignore_conflicts=True)
+
+
+def budget_status(user_id, month):
+    """Return the user's budgets with their spending in `month`.
+
+    `month` is the first day of a month. Returns a list of dicts with
+    `category`, `limit`, `spent`, `remaining`, `percent` and `over` keys,
+    ordered by category, cached per user.
+    """
+    key = user_cache_key(user_id, 'budgets', month.isoformat())
+    status = cache.get(key)
+    if status is not None:
+        return status
+
+    spent = MonthlyRollup.objects.filter(user_id=user_id, month=month, category_id=OuterRef('category_id'))
+    budgets = (
+        Budget.objects.filter(user_id=user_id)
+        .annotate(spent=Coalesce(Subquery(spent.values('total')[:1]), Value(0), output_field=CentsField()))
+        .order_by('category_id')
+        .values_list('category_id', 'limit', 'spent')
+    )
+    names = {category.pk: category.name for category in get_categories()}
+    status = []
+    for category_id, limit, spent in budgets:
+        status.append({
+            'category': names.get(category_id, ''),
+            'limit': limit,
+            'spent': spent,
+            'remaining': limit - spent,
+            'percent': min(100, int(spent * 100 / limit)) if limit else 100,
+            'over': spent > limit,
+        })
+    cache.set(key, status, USER_CACHE_TTL)
+    return status
+
+
+def save_limits(user, limits):
+    """Replace the user's budgets with `limits` (`{category_id: limit or None}`).
+
+    Categories mapped to None lose their budget. Writes in bulk and
+    invalidates the user's cached data once.
+    """
+    existing = {budget.category_id: budget for budget in Budget.objects.filter(user=user)}
+    created, changed, removed = [], [], []
+    for category_id, limit in limits.items():
+        budget = existing.get(category_id)
+        if limit is None:
+            if budget is not None:
+                removed.append(budget.pk)
+        elif budget is None:
+            created.append(Budget(user=user, category_id=category_id, limit=limit))
+        elif budget.limit != limit:
+            budget.limit = limit
+            changed.append(budget)
+    Budget.objects.bulk_create(created)
+    Budget.objects.bulk_update(changed, ['limit'])
+    if removed:
+        Budget.objects.filter(pk__in=removed).delete()
+    if created or changed or removed:
+        bump_user_version(user.pk)
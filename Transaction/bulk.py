@@ -0,0 +1,141 @@
+"""Bulk edits of many transactions at once.
+
+Used by the list page's bulk actions (`views.TransactionBulkView`) and by
+the sync upload (`sync.py`). Whatever the number of rows, an action costs a
+fixed number of queries:
+
+- ownership of selected ids is checked with one COUNT (`owned`);
+- `recategorize` reads the ids of the matching rows and their rollup
+  buckets (one grouped aggregate), and moves exactly those rows with a
+  single `UPDATE`;
+- `delete_transactions` reads the ids of the matching rows, removes exactly
+  those with one `DELETE` and writes their sync tombstones with one
+  `bulk_create`;
+- `clear_duplicate_flags` marks reviewed rows as not duplicates with a
+  single `UPDATE`.
+
+Like the other bulk writers this bypasses the Transaction signals, so the
+monthly rollups are updated with one `rollups.apply_deltas`, and the user's
+caches and category suggestion model are invalidated once per batch. Call
+inside a transaction.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import BigIntegerField, Count, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from . import rollups, suggest
+from .cache import bump_user_version
+from .models import Transaction, TransactionTombstone
+
+
+def owned(user_id, ids):
+    """Return a queryset of the transactions `ids`, or None unless `user_id` owns all of them."""
+    ids = set(ids)
+    queryset = Transaction.objects.filter(user_id=user_id, pk__in=ids)
+    if queryset.count() != len(ids):
+        return None
+    return queryset
+
+
+def bucket_totals(queryset):
+    """Return `{(user_id, month, category_id): [base currency cents, count]}` for `queryset`."""
+    rows = (
+        queryset.order_by()
+        .annotate(month=TruncMonth('date'))
+        .values_list('user_id', 'month', 'category_id')
+        .annotate(cents=Sum('base_amount', output_field=BigIntegerField()), count=Count('id'))
+    )
+    return {(user_id, month, category_id): [cents, count] for user_id, month, category_id, cents, count in rows}
+
+
+def _apply(deltas):
+    rollups.apply_deltas({
+        key: (Decimal(cents).scaleb(-2), count) for key, (cents, count) in deltas.items() if cents or count
+    })
+
+
+def recategorize(user_id, queryset, category_id, now=None):
+    """Move the transactions of `queryset` (owned by `user_id`) to `category_id`.
+
+    Returns the number of rows changed; rows already in the category are
+    left alone. As in `delete_transactions`, the matching ids are read and
+    locked first and only those rows are moved.
+    """
+    ids = list(queryset.exclude(category_id=category_id).order_by().select_for_update().values_list('id', flat=True))
+    if not ids:
+        return 0
+    queryset = Transaction.objects.filter(pk__in=ids)
+    moved = bucket_totals(queryset)
+    changed = queryset.update(category_id=category_id, updated_at=now or timezone.now())
+    deltas = defaultdict(lambda: [0, 0])
+    for (owner, month, old_category), (cents, count) in moved.items():
+        for key, sign in (((owner, month, old_category), -1), ((owner, month, category_id), 1)):
+            deltas[key][0] += sign * cents
+            deltas[key][1] += sign * count
+    _apply(deltas)
+    bump_user_version(user_id)
+    suggest.discard(user_id)
+    return changed
+
+
+def _delete_rows(ids):
+    """DELETE exactly the transactions `ids` and return how many went.
+
+    Raw SQL: `QuerySet.delete()` would load every row to send the signals,
+    which would write the tombstones and rollup deltas a second time.
+    """
+    table = connection.ops.quote_name(Transaction._meta.db_table)
+    batch_size = connection.ops.bulk_batch_size(['id'], ids) or len(ids)
+    deleted = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            cursor.execute(f"DELETE FROM {table} WHERE id IN ({', '.join(['%s'] * len(batch))})", batch)
+            deleted += cursor.rowcount
+    return deleted
+
+
+def delete_transactions(user_id, queryset, now=None, ids=None, deltas=None):
+    """Delete the transactions of `queryset` (owned by `user_id`), leaving tombstones.
+
+    The matching ids are read (and locked) first, and exactly those rows are
+    deleted, tombstoned and subtracted from the rollups, so a row inserted
+    meanwhile is left alone. Callers that already hold the rows may pass
+    their `ids` and rollup `deltas` (as returned by `bucket_totals`,
+    negated) to skip reading them. Returns the number of rows deleted.
+    """
+    if ids is None:
+        ids = list(queryset.order_by().select_for_update().values_list('id', flat=True))
+    ids = list(ids)
+    if not ids:
+        return 0
+    if deltas is None:
+        deltas = {
+            key: [-cents, -count]
+            for key, (cents, count) in bucket_totals(Transaction.objects.filter(pk__in=ids)).items()
+        }
+    deleted = _delete_rows(ids)
+    now = now or timezone.now()
+    TransactionTombstone.objects.bulk_create(
+        [TransactionTombstone(user_id=user_id, transaction_id=pk, deleted_at=now) for pk in ids]
+    )
+    _apply(deltas)
+    bump_user_version(user_id)
+    suggest.discard(user_id)
+    return deleted
+
+
+def clear_duplicate_flags(user_id, queryset, now=None):
+    """Clear `possible_duplicate` on the transactions of `queryset` (owned by `user_id`).
+
+    Returns the number of rows changed.
+    """
+    changed = queryset.filter(possible_duplicate=True).update(possible_duplicate=False, updated_at=now or timezone.now())
+    if changed:
+        bump_user_version(user_id)
+    return changed
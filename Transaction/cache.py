@@ -0,0 +1,118 @@
+"""Caching helpers for the Transaction app.
+
+Category lookup table
+---------------------
+Categories change rarely but are read on almost every request (filters,
+create/edit forms). Reads go through two layers:
+
+- a process-local copy with a short TTL, so most requests never leave the
+  worker process;
+- Django's cache framework (shared between workers when a shared backend is
+  configured) with a longer TTL.
+
+Both layers are cleared by `invalidate_categories`, which is connected to the
+Category save/delete signals in `signals.py`. Other worker processes pick up
+changes once their local copy expires.
+
+Per-user data
+-------------
+Derived per-user data (list page summary cards, the unfiltered first page)
+is cached under keys that embed a per-user version counter (`user_cache_key`).
+Any write to a user's transactions bumps the counter (`bump_user_version`),
+which makes every older entry unreachable; stale entries simply expire. A
+global generation, bumped on Category changes, is part of every key too,
+because cached rows embed category names and types.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Category
+
+
+CATEGORY_CACHE_KEY = "transaction:categories"
+CATEGORY_CACHE_TTL = getattr(settings, "CATEGORY_CACHE_TTL", 300)
+CATEGORY_LOCAL_TTL = getattr(settings, "CATEGORY_LOCAL_TTL", 30)
+
+USER_VERSION_KEY = "transaction:version:{}"
+CATEGORY_GENERATION_KEY = "transaction:category-generation"
+USER_CACHE_TTL = getattr(settings, "TRANSACTION_CACHE_TTL", 600)
+
+_local = {"expires": 0.0, "categories": None}
+_lock = threading.Lock()
+
+
+def get_categories():
+    """Return all categories as a tuple, ordered by primary key."""
+    now = time.monotonic()
+    categories = _local["categories"]
+    if categories is not None and _local["expires"] > now:
+        return categories
+
+    with _lock:
+        categories = cache.get(CATEGORY_CACHE_KEY)
+        if categories is None:
+            categories = tuple(Category.objects.order_by("pk"))
+            cache.set(CATEGORY_CACHE_KEY, categories, CATEGORY_CACHE_TTL)
+        _local["categories"] = categories
+        _local["expires"] = now + CATEGORY_LOCAL_TTL
+    return categories
+
+
+def get_categories_by_type(category_type):
+    """Return the cached categories whose `type` equals `category_type`."""
+    return [category for category in get_categories() if category.type == category_type]
+
+
+def get_category_choices():
+    """Return `(pk, name)` pairs suitable for a ChoiceField/ModelChoiceField."""
+    return [(category.pk, category.name) for category in get_categories()]
+
+
+def invalidate_categories(**kwargs):
+    """Drop both cache layers. Accepts signal kwargs so it can be a receiver."""
+    with _lock:
+        _local["categories"] = None
+        _local["expires"] = 0.0
+        cache.delete(CATEGORY_CACHE_KEY)
+    _bump(CATEGORY_GENERATION_KEY)
+
+
+def _initial_version():
+    # Time based, so a counter that was evicted never restarts below a value
+    # that is still referenced by live cache entries.
+    return time.time_ns() // 1000
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _initial_version(), None)
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_user_version(user_id):
+    """Invalidate every per-user cache entry of `user_id`.
+
+    Deferred until the current database transaction commits, so a concurrent
+    request can't cache pre-commit data under the new version.
+    """
+    transaction.on_commit(lambda: _bump(USER_VERSION_KEY.format(user_id)))
+
+
+def user_cache_key(user_id, *parts):
+    """Return a cache key for per-user data that changes with the user's version."""
+    versions = f"{_version(USER_VERSION_KEY.format(user_id))}.{_version(CATEGORY_GENERATION_KEY)}"
+    return ":".join(["transaction:user", str(user_id), versions, *map(str, parts)])
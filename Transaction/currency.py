@@ -0,0 +1,314 @@
+"""Currency conversion to each user's base currency.
+
+Every Transaction keeps its `amount` in its own `currency` and, next to it,
+`base_amount`: the amount converted to the owner's base currency
+(`Users.Profile.base_currency`, `settings.BASE_CURRENCY` without a profile)
+at the exchange rate of the transaction's date. List totals, rollups,
+budgets and analytics sum `base_amount`, so reads stay the same single
+aggregate queries; conversion only happens on writes:
+
+- a single save (the Transaction `pre_save` signal) uses `convert_amount`,
+  whose rate factor is memoized per (currency, base, day) in an LRU cache;
+- bulk writers (CSV import, the recurring scheduler, `reconvert`) call
+  `convert` once per batch: currency codes become integer indexes, NumPy
+  finds every row's rate in the per-currency rate arrays with one
+  `searchsorted` per currency and converts the whole batch in a few array
+  operations. Without NumPy it falls back to the memoized per-row factors.
+
+Rates come from the `ExchangeRate` table, loaded offline from a CSV file
+(`load_rates`, `manage.py load_fx_rates`) as units per one
+`settings.FX_REFERENCE_CURRENCY` (EUR for the ECB reference rates), so `x`
+in currency `A` is `x * rate(B) / rate(A)` in currency `B`, rounded half to
+even to whole cents. A day without a rate (weekends, holidays) uses the
+latest earlier one, days before the first rate the first one. Amounts
+already in the base currency are copied exactly.
+
+Each currency's rates are read once into sorted arrays kept in an LRU
+cache. Loading rates bumps a generation counter in Django's cache, which is
+part of every cache key here; other workers notice it within
+`FX_LOCAL_TTL` seconds, like the category cache. Stored `base_amount`s are
+recomputed by `reconvert`: for foreign-currency rows after new rates are
+loaded, and for all of a user's rows when their base currency changes.
+"""
+
+import bisect
+import csv
+import datetime
+import functools
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import BigIntegerField, ExpressionWrapper, F, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from Users.models import Profile
+
+from . import rollups
+from .cache import USER_CACHE_TTL, bump_user_version, user_cache_key
+from .fields import to_cents
+from .models import ExchangeRate, Transaction
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is optional
+    np = None
+
+
+GENERATION_KEY = "transaction:fx-generation"
+DEFAULT_BATCH_SIZE = 5000
+
+_local = {"generation": None, "expires": 0.0}
+
+
+def _generation():
+    """Return the rate generation, re-read from the shared cache every `FX_LOCAL_TTL` seconds."""
+    now = time.monotonic()
+    if _local["expires"] <= now:
+        generation = cache.get(GENERATION_KEY)
+        if generation is None:
+            # Time based, like the per-user versions in `cache.py`
+            cache.add(GENERATION_KEY, time.time_ns() // 1000, None)
+            generation = cache.get(GENERATION_KEY)
+        _local["generation"] = generation
+        _local["expires"] = now + settings.FX_LOCAL_TTL
+    return _local["generation"]
+
+
+def invalidate_rates(**kwargs):
+    """Drop the in-memory rates in every worker. Accepts signal kwargs so it can be a receiver."""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, time.time_ns() // 1000, None)
+    _local["expires"] = 0.0
+    _table.cache_clear()
+    _factor.cache_clear()
+    _currencies.cache_clear()
+
+
+@functools.lru_cache(maxsize=64)
+def _table(code, generation):
+    """Return `(days, rates)` for `code`: ascending day ordinals and their rates."""
+    if code == settings.FX_REFERENCE_CURRENCY:
+        days, rates = [1], [1.0]
+    else:
+        rows = list(ExchangeRate.objects.filter(currency=code).order_by("date").values_list("date", "rate"))
+        if not rows:
+            raise ValueError(f"No exchange rates for {code}.")
+        days = [day.toordinal() for day, _rate in rows]
+        rates = [rate for _day, rate in rows]
+    if np is None:
+        return days, rates
+    return np.array(days, dtype=np.int64), np.array(rates, dtype=np.float64)
+
+
+def _rate(code, ordinal, generation):
+    days, rates = _table(code, generation)
+    return float(rates[max(bisect.bisect_right(days, ordinal) - 1, 0)])
+
+
+@functools.lru_cache(maxsize=4096)
+def _factor(currency, base, ordinal, generation):
+    return _rate(base, ordinal, generation) / _rate(currency, ordinal, generation)
+
+
+def rate_factor(currency, base, date):
+    """Return the multiplier converting amounts in `currency` to `base` on `date`."""
+    if currency == base:
+        return 1.0
+    return _factor(currency, base, date.toordinal(), _generation())
+
+
+@functools.lru_cache(maxsize=4)
+def _currencies(generation):
+    codes = set(ExchangeRate.objects.order_by().values_list("currency", flat=True).distinct())
+    return tuple(sorted(codes | {settings.FX_REFERENCE_CURRENCY}))
+
+
+def currencies():
+    """Return the sorted codes that can be converted (the reference currency and every loaded one)."""
+    return _currencies(_generation())
+
+
+def convertible(base):
+    """Return the sorted codes that amounts can be entered in for a user with base currency `base`.
+
+    That is `base` itself, plus every convertible currency when `base` has
+    rates too. Without any loaded rates (a new install) only `base` is left.
+    """
+    codes = currencies()
+    if base not in codes:
+        return (base,)
+    return codes
+
+
+def _rates_for(code_ids, codes, ordinals, generation):
+    """Return the rate of `codes[code_ids[i]]` on day `ordinals[i]` for every `i` (NumPy arrays)."""
+    rates = np.empty(len(code_ids), dtype=np.float64)
+    for code_id, code in enumerate(codes):
+        mask = code_ids == code_id
+        if mask.any():
+            days, table = _table(code, generation)
+            rates[mask] = table[np.maximum(np.searchsorted(days, ordinals[mask], side="right") - 1, 0)]
+    return rates
+
+
+def convert(cents, currencies, dates, bases):
+    """Convert amounts to their base currencies; returns a list of int cents.
+
+    `cents` (ints), `currencies` (codes) and `dates` are parallel sequences;
+    `bases` is a single code or a parallel sequence of codes. Raises
+    ValueError for a currency without rates.
+    """
+    if isinstance(bases, str):
+        bases = [bases] * len(cents)
+    if np is None:
+        return [
+            amount if currency == base else round(amount * rate_factor(currency, base, date))
+            for amount, currency, date, base in zip(cents, currencies, dates, bases)
+        ]
+    # Codes become small integer indexes: comparing and masking NumPy string
+    # arrays costs more than the conversion itself
+    ids = {}
+    count = len(cents)
+    currency_ids = np.fromiter((ids.setdefault(code, len(ids)) for code in currencies), dtype=np.int64, count=count)
+    base_ids = np.fromiter((ids.setdefault(code, len(ids)) for code in bases), dtype=np.int64, count=count)
+    result = np.array(cents, dtype=np.int64)
+    foreign = np.flatnonzero(currency_ids != base_ids)
+    if not foreign.size:
+        return result.tolist()
+    generation = _generation()
+    codes = list(ids)
+    ordinals = np.fromiter((dates[index].toordinal() for index in foreign.tolist()), dtype=np.int64, count=foreign.size)
+    factors = (
+        _rates_for(base_ids[foreign], codes, ordinals, generation)
+        / _rates_for(currency_ids[foreign], codes, ordinals, generation)
+    )
+    result[foreign] = np.rint(result[foreign] * factors)
+    return result.tolist()
+
+
+def convert_amount(amount, currency, date, base):
+    """Return `amount` (currency units) in `currency` converted to `base` on `date`, as a Decimal."""
+    if isinstance(date, str):
+        date = datetime.date.fromisoformat(date)
+    cents = to_cents(amount)
+    if currency != base:
+        cents = round(cents * rate_factor(currency, base, date))
+    return Decimal(cents).scaleb(-2)
+
+
+def base_currency(user_id):
+    """Return the base currency of `user_id`, cached with the user's other data."""
+    key = user_cache_key(user_id, "base-currency")
+    code = cache.get(key)
+    if code is None:
+        code = base_currencies([user_id])[user_id]
+        cache.set(key, code, USER_CACHE_TTL)
+    return code
+
+
+def base_currencies(user_ids):
+    """Return `{user_id: base currency}` for `user_ids`, read with one query."""
+    codes = dict(Profile.objects.filter(user_id__in=user_ids).values_list("user_id", "base_currency"))
+    return {user_id: codes.get(user_id, settings.BASE_CURRENCY) for user_id in user_ids}
+
+
+def load_rates(lines):
+    """Upsert the rates of an ECB reference-rate CSV and return how many were written.
+
+    The layout is the one of the ECB's `eurofxref-hist.csv`: a header row
+    `Date,USD,JPY,...` and one row per day with the units of each currency
+    per one `FX_REFERENCE_CURRENCY`. Empty and `N/A` cells are skipped.
+    """
+    reader = csv.reader(lines)
+    header = [name.strip().upper() for name in next(reader, [])]
+    if not header or header[0] != "DATE":
+        raise ValueError("Expected a header row starting with 'Date'.")
+    rates = []
+    for row in reader:
+        if not row or not row[0].strip():
+            continue
+        day = datetime.date.fromisoformat(row[0].strip())
+        for code, value in zip(header[1:], row[1:]):
+            value = value.strip()
+            if code and value and value.upper() != "N/A":
+                rates.append(ExchangeRate(date=day, currency=code, rate=float(value)))
+    with transaction.atomic():
+        ExchangeRate.objects.bulk_create(
+            rates, batch_size=2000, update_conflicts=True, unique_fields=["currency", "date"], update_fields=["rate"],
+        )
+    invalidate_rates()
+    return len(rates)
+
+
+def _update_sql():
+    quote = connection.ops.quote_name
+    return f"UPDATE {quote(Transaction._meta.db_table)} SET base_amount = %s, updated_at = %s WHERE id = %s"
+
+
+def _reconvert_batch(cursor, batch, updated_at):
+    """Convert `batch` and write the base amounts that changed."""
+    ids, stored, cents, codes, dates, bases = zip(*batch)
+    # Unchanged rows are not rewritten, so sync clients don't download them again
+    cursor.executemany(_update_sql(), [
+        (amount, updated_at, pk)
+        for pk, old, amount in zip(ids, stored, convert(cents, codes, dates, bases))
+        if amount != old
+    ])
+
+
+def reconvert(user_ids=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Recompute stored `base_amount`s, then the affected users' rollups.
+
+    With `user_ids` every transaction of those users is recomputed (after a
+    base currency change); otherwise only the transactions that are not in
+    their owner's base currency (after rates were loaded). Foreign rows are
+    converted `batch_size` at a time with `convert` and written with one
+    `executemany` per batch; only rows whose base amount changed are
+    written (with a new `updated_at`). Returns the number of
+    foreign-currency transactions converted.
+    """
+    qs = Transaction.objects.order_by()
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        qs = qs.filter(user_id__in=user_ids)
+    converted, touched, batch = 0, set(user_ids or ()), []
+    now = timezone.now()
+    updated_at = connection.ops.adapt_datetimefield_value(now)
+    with transaction.atomic():
+        if user_ids is not None:
+            for user_id, code in base_currencies(user_ids).items():
+                qs.filter(user_id=user_id, currency=code).exclude(base_amount=F("amount")).update(
+                    base_amount=F("amount"), updated_at=now,
+                )
+        rows = (
+            qs.annotate(
+                base=Coalesce(F("user__profile__base_currency"), Value(settings.BASE_CURRENCY)),
+                # Raw cents: CentsField would build a Decimal per value
+                stored=ExpressionWrapper(F("base_amount"), output_field=BigIntegerField()),
+                cents=ExpressionWrapper(F("amount"), output_field=BigIntegerField()),
+            )
+            .filter(~Q(currency=F("base")))
+            .values_list("id", "stored", "cents", "currency", "date", "base", "user_id")
+        )
+        with connection.cursor() as cursor:
+            for *row, user_id in rows.iterator(chunk_size=batch_size):
+                batch.append(row)
+                touched.add(user_id)
+                if len(batch) >= batch_size:
+                    _reconvert_batch(cursor, batch, updated_at)
+                    converted += len(batch)
+                    batch = []
+            if batch:
+                _reconvert_batch(cursor, batch, updated_at)
+                converted += len(batch)
+        if touched:
+            rollups.rebuild_rollups(user_ids=sorted(touched))
+        for user_id in touched:
+            bump_user_version(user_id)
+    return converted
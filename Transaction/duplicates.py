@@ -0,0 +1,110 @@
+"""Duplicate transaction detection.
+
+Every transaction stores a `fingerprint`: a 64-bit hash of its owner, amount,
+currency and the normalized words of its description (lowercased, sorted,
+without punctuation), so "Coffee, Starbucks" and "starbucks coffee" match.
+The date is not hashed but kept next to it in the `(fingerprint, date)`
+index, which makes both checks a single index range scan however many rows
+the user has:
+
+- an exact duplicate has the same fingerprint on the same date (a double
+  submitted form, a statement imported twice);
+- a near duplicate has the same fingerprint within `DUPLICATE_WINDOW_DAYS`
+  (the same payment booked on the card date and on the settlement date).
+
+The create form asks for confirmation before saving an exact duplicate, and
+the importer skips rows that duplicate transactions stored before the import
+(one `IN` lookup per batch, see `match_batch`). Near duplicates are saved with
+`possible_duplicate` set, for review on the list page.
+
+The Transaction signals set the fingerprint on save; writers that bypass
+them (`importer.py`, `recurring.py`, `sync.py`) call `fingerprint`
+themselves.
+"""
+
+import datetime
+import hashlib
+import re
+
+from django.conf import settings
+
+from .fields import to_cents
+from .models import Transaction
+
+
+MAX_MATCHES = 5
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+def normalize(description):
+    """Return the sorted distinct lowercase words of `description`."""
+    return sorted(set(_WORD_RE.findall(description.lower())))
+
+
+def fingerprint(user_id, amount, currency, description):
+    """Return the signed 64-bit fingerprint of a transaction (fits a BigIntegerField)."""
+    key = f"{user_id}|{to_cents(amount)}|{currency}|{' '.join(normalize(description))}"
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big", signed=True)
+
+
+def window():
+    """Return the distance in days within which equal transactions are near duplicates."""
+    return datetime.timedelta(days=settings.DUPLICATE_WINDOW_DAYS)
+
+
+def find(user_id, fingerprint, date, exclude=None):
+    """Return up to `MAX_MATCHES` of `user_id`'s transactions matching `fingerprint` near `date`.
+
+    Exact matches (same date) come first. `exclude` is the id of the
+    transaction being checked, if it is already stored.
+    """
+    matches = Transaction.objects.filter(
+        fingerprint=fingerprint, date__range=(date - window(), date + window()), user_id=user_id,
+    )
+    if exclude is not None:
+        matches = matches.exclude(pk=exclude)
+    matches = sorted(matches.order_by('date', 'id')[:MAX_MATCHES * 2], key=lambda row: abs(row.date - date))
+    return matches[:MAX_MATCHES]
+
+
+def match_batch(user_id, keys, imported):
+    """Classify a batch of new rows given as `(fingerprint, date)` keys.
+
+    Returns one status per key: `"duplicate"` when a transaction stored
+    before the caller started has the same fingerprint and date, `"near"`
+    when a stored or earlier imported row matches within the window, else
+    None. `imported` maps fingerprints to the dates of the rows the caller
+    has inserted so far (they are already in the database); it is updated
+    with the keys that are not duplicates, which the caller must insert.
+    Issues one query.
+    """
+    if not keys:
+        return []
+    span = window()
+    dates = [date for _fingerprint, date in keys]
+    stored = {}
+    rows = Transaction.objects.filter(
+        fingerprint__in={fingerprint for fingerprint, _date in keys},
+        date__range=(min(dates) - span, max(dates) + span),
+        user_id=user_id,
+    ).values_list('fingerprint', 'date')
+    for fingerprint, date in rows:
+        stored.setdefault(fingerprint, []).append(date)
+    # What remains after taking out this import's own rows was there before it
+    for fingerprint, earlier in stored.items():
+        for date in imported.get(fingerprint, ()):
+            if date in earlier:
+                earlier.remove(date)
+
+    statuses = []
+    for fingerprint, date in keys:
+        before = stored.get(fingerprint, ())
+        if date in before:
+            statuses.append("duplicate")
+            continue
+        seen = imported.setdefault(fingerprint, [])
+        near = any(abs(other - date) <= span for other in before) or any(abs(other - date) <= span for other in seen)
+        statuses.append("near" if near else None)
+        seen.append(date)
+    return statuses
@@ -0,0 +1,62 @@
+"""Custom model fields for the Transaction app."""
+
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from django import forms
+from django.core import exceptions
+from django.db import models
+
+
+CENT = Decimal("0.01")
+
+
+def to_cents(value):
+    """Return `value` (currency units, any numeric or numeric string) as int cents.
+
+    Floats go through `str()` first so e.g. 0.1 becomes exactly 10 cents.
+    """
+    if isinstance(value, float):
+        value = str(value)
+    return int((Decimal(value) / CENT).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+class CentsField(models.BigIntegerField):
+    """Money amount stored as integer minor units (cents).
+
+    Python code, forms and templates see a `Decimal` with two places; the
+    database sees a BIGINT, so sums and comparisons are exact and cheap on
+    every backend. Values passed to queries (`amount__gt=5`, `Value(...)`)
+    are in currency units and converted on the way in. Aggregates such as
+    `Sum('amount')` keep this field as their output field and come back as
+    `Decimal` too.
+    """
+    description = "Money amount stored as integer cents"
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return Decimal(int(value)).scaleb(-2)
+
+    def to_python(self, value):
+        if value is None:
+            return value
+        try:
+            return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+        except InvalidOperation:
+            raise exceptions.ValidationError(
+                self.error_messages["invalid"], code="invalid", params={"value": value},
+            )
+
+    def get_prep_value(self, value):
+        if value is None or hasattr(value, "resolve_expression"):
+            return value
+        return to_cents(value)
+
+    def formfield(self, **kwargs):
+        # Skip IntegerField's formfield so users enter units, not cents
+        return models.Field.formfield(self, **{
+            "form_class": forms.DecimalField,
+            "max_digits": 17,
+            "decimal_places": 2,
+            **kwargs,
+        })
@@ -1,27 +1,67 @@
 """Forms used by the Transaction app.
 
-Provides `TransactionForm` used by Create/Update views and a small
-`CategoryForm` for potential category CRUD. Forms include validation for
-common domain rules (amount > 0, date not in the future).
+Provides `TransactionForm` used by Create/Update views, a small
+`CategoryForm` for potential category CRUD, `TransactionImportForm` for
+CSV uploads, `BudgetForm` for monthly category budgets and
+`TransactionBulkForm` for list page bulk actions. Domain rules (amount > 0, date not in the future, category type
+matches the transaction type) live in module-level validators so the CSV
+importer applies exactly the same checks.
 """
 
 from django import forms
+from django.conf import settings
+from django.template.defaultfilters import filesizeformat
 from django.utils import timezone
 
-from .models import Transaction, Category
+from .cache import get_categories, get_category_choices
+from .currency import base_currency, convertible
+from .duplicates import find as find_duplicates, fingerprint
+from .models import Transaction, Category, frequencies
+
+
+def validate_amount(amt):
+    """Shared amount rule used by `TransactionForm` and the CSV importer."""
+    if amt is not None and amt <= 0:
+        raise forms.ValidationError("Amount must be greater than zero.")
+    return amt
+
+
+def validate_date(date, today=None):
+    """Shared date rule used by `TransactionForm` and the CSV importer.
+
+    `today` may be passed by callers validating many rows at once.
+    """
+    if date and date > (today or timezone.localdate()):
+        raise forms.ValidationError("Date cannot be in the future.")
+    return date
+
+
+def validate_category_type(transaction_type, category_type):
+    """Raise if a category of `category_type` can't be used for `transaction_type`."""
+    if transaction_type and category_type and category_type != transaction_type:
+        raise forms.ValidationError(f"Please select a {transaction_type} category.")
 
 
 class TransactionFilterForm(forms.Form):
     """Simple filter form used on the transaction list page.
 
     Fields:
+    - q: optional full-text search over descriptions (see `search.py`)
     - start_date, end_date: optional date range
     - category: optional category id to filter by
+    - duplicates: only transactions flagged as possible duplicates
     """
+    q = forms.CharField(required=False, max_length=200, widget=forms.TextInput(attrs={"type": "search", "placeholder": "Search descriptions", "autocomplete": "off", "list": "search-suggestions", "class": "w-full px-4 py-2 border rounded"}))
     start_date = forms.DateField(required=False, widget=forms.DateInput(attrs={"type": "date", "class": "w-full px-4 py-2 border rounded"}))
     end_date = forms.DateField(required=False, widget=forms.DateInput(attrs={"type": "date", "class": "w-full px-4 py-2 border rounded"}))
-    category = forms.ModelChoiceField(queryset=Category.objects.all(), required=False, empty_label="All categories", widget=forms.Select(attrs={"class": "w-full px-4 py-2 border rounded"}))
+    category = forms.TypedChoiceField(coerce=int, required=False, empty_value=None, widget=forms.Select(attrs={"class": "w-full px-4 py-2 border rounded"}))
+    duplicates = forms.BooleanField(required=False, widget=forms.CheckboxInput(attrs={"class": "form-checkbox h-4 w-4 text-blue-600"}))
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Options come from the category cache, so rendering (and validating)
+        # a bound form needs no query either
+        self.fields['category'].choices = [("", "All categories")] + get_category_choices()
 
 
 class TransactionForm(forms.ModelForm):
@@ -29,14 +69,25 @@ class TransactionForm(forms.ModelForm):
 
     Inputs:
     - transaction_type: 'income' or 'expense' (used to filter categories)
-    - amount: float > 0
+    - amount: Decimal > 0 with at most two decimal places
+    - currency: code of the amount; choices are the user's base currency
+      (used when omitted) and the currencies that convert to it
     - category: FK to Category
     - date: date (not in the future)
     - image: optional ImageField
     - description: text
+    - repeat: optional frequency (create only); starts a `RecurringRule`
+      with this transaction as its first occurrence
+    - repeat_count, repeat_until: optional end of the repetition (create
+      only): the number of occurrences in total, or the last date
+    - allow_duplicate: confirms saving a new transaction identical to a
+      stored one on the same date (see `duplicates.py`)
 
     Output: cleaned_data matching Transaction fields. On save(), views set `user` on the instance.
-    Error modes: raises ValidationError for invalid amount or future date.
+    Error modes: raises ValidationError for invalid amount or future date,
+    and for an unconfirmed exact duplicate. A new transaction matching one
+    within `DUPLICATE_WINDOW_DAYS` is flagged `possible_duplicate`; the
+    matches are kept in `duplicate_matches` for the template.
     """
     
     # Add a non-model type field for filtering categories
@@ -48,13 +99,40 @@ class TransactionForm(forms.ModelForm):
         label="Transaction Type",
         widget=forms.RadioSelect(attrs={"class": "form-radio h-4 w-4 text-blue-600"})
     )
+    currency = forms.ChoiceField(
+        required=False,
+        label="Currency",
+        widget=forms.Select(attrs={"class": "mt-1 block w-full pl-3 pr-10 py-2 text-base border-gray-300 rounded-md"})
+    )
+    repeat = forms.ChoiceField(
+        choices=(("", "Does not repeat"),) + frequencies,
+        required=False,
+        label="Repeat",
+        widget=forms.Select(attrs={"class": "mt-1 block w-full pl-3 pr-10 py-2 text-base border-gray-300 rounded-md"})
+    )
+    repeat_count = forms.IntegerField(
+        required=False,
+        min_value=2,
+        label="Occurrences",
+        widget=forms.NumberInput(attrs={"min": "2", "placeholder": "No limit", "class": "mt-1 block w-full pl-3 pr-10 py-2 text-base border-gray-300 rounded-md"})
+    )
+    repeat_until = forms.DateField(
+        required=False,
+        label="Repeat until",
+        widget=forms.DateInput(attrs={"type": "date", "class": "mt-1 block w-full pl-3 pr-10 py-2 text-base border-gray-300 rounded-md"})
+    )
+    allow_duplicate = forms.BooleanField(
+        required=False,
+        label="Save anyway, this is a separate transaction",
+        widget=forms.CheckboxInput(attrs={"class": "form-checkbox h-4 w-4 text-blue-600"})
+    )
 
     class Meta:
         model = Transaction
-        fields = ["amount", "category", "date", "image", "description"]
+        fields = ["amount", "currency", "category", "date", "image", "description"]
         widgets = {
             "amount": forms.NumberInput(attrs={
-                "step": "1", "min": "0", "class": "focus:ring-blue-500 focus:border-blue-500 block w-full pl-3 pr-12 sm:text-sm border-gray-300 rounded-md"
+                "step": "0.01", "min": "0", "class": "focus:ring-blue-500 focus:border-blue-500 block w-full pl-3 pr-12 sm:text-sm border-gray-300 rounded-md"
             }),
             "category": forms.Select(attrs={"class": "mt-1 block w-full pl-3 pr-10 py-2 text-base border-gray-300 rounded-md"}),
             
@@ -76,12 +154,35 @@ class TransactionForm(forms.ModelForm):
         """
         super().__init__(*args, **kwargs)
         self.user = user
+        self.duplicate_matches = []
         
-        # Initialize transaction_type based on the category if we're editing an existing transaction
+        # Initialize transaction_type based on the category if we're editing an existing transaction.
+        # Look the type up in the category cache: `instance.category` would cost a query.
         instance = kwargs.get('instance')
-        if instance and instance.category:
-            self.initial['transaction_type'] = instance.category.type
+        if instance and instance.category_id:
+            for category in get_categories():
+                if category.pk == instance.category_id:
+                    self.initial['transaction_type'] = category.type
             
+        # Repeating is chosen when creating; existing rules are managed on their own page
+        if instance and instance.pk:
+            for name in ('repeat', 'repeat_count', 'repeat_until'):
+                del self.fields[name]
+
+        # Currencies convertible to the user's base currency (preselected for
+        # new transactions) and the currency of the transaction being edited
+        self.base_currency = base_currency(user.pk) if user is not None else settings.BASE_CURRENCY
+        codes = set(convertible(self.base_currency))
+        if instance and instance.pk:
+            codes.add(instance.currency)
+        elif 'currency' not in kwargs.get('initial', {}):
+            self.initial['currency'] = self.base_currency
+        self.fields['currency'].choices = [(code, code) for code in sorted(codes)]
+
+        # Render category options from the cache; validation still uses the queryset
+        field = self.fields['category']
+        field.choices = [("", field.empty_label)] + get_category_choices()
+
         # Add dynamic filtering of categories based on transaction type
         self.fields['category'].help_text = "Select a category matching the transaction type"
         
@@ -93,37 +194,77 @@ class TransactionForm(forms.ModelForm):
         transaction_type = cleaned_data.get('transaction_type')
         category = cleaned_data.get('category')
         
-        if transaction_type and category and category.type != transaction_type:
-            self.add_error('category', f"Please select a {transaction_type} category.")
-            
+        if category:
+            try:
+                validate_category_type(transaction_type, category.type)
+            except forms.ValidationError as exc:
+                self.add_error('category', exc)
+
+        self.check_repeat(cleaned_data)
+
+        if self.user is not None and self.instance.pk is None and not self.errors:
+            self.check_duplicates(cleaned_data)
         return cleaned_data
+
+    def check_repeat(self, cleaned_data):
+        """An end of repetition needs a frequency, and `repeat_until` can't precede the date."""
+        until = cleaned_data.get('repeat_until')
+        if not cleaned_data.get('repeat'):
+            if until or cleaned_data.get('repeat_count'):
+                self.add_error('repeat', "Choose how often the transaction repeats.")
+            return
+        date = cleaned_data.get('date')
+        if until and date and until < date:
+            self.add_error('repeat_until', "The last occurrence cannot be before the first one.")
+
+    def check_duplicates(self, cleaned_data):
+        """Look up stored transactions matching the new one (one indexed query).
+
+        An identical transaction on the same date (a resubmitted form) needs
+        `allow_duplicate`; a match a few days away only flags the new row.
+        """
+        date = cleaned_data['date']
+        self.instance.fingerprint = fingerprint(
+            self.user.pk, cleaned_data['amount'], cleaned_data['currency'], cleaned_data['description'],
+        )
+        self.duplicate_matches = find_duplicates(self.user.pk, self.instance.fingerprint, date)
+        exact = any(match.date == date for match in self.duplicate_matches)
+        if exact and not cleaned_data.get('allow_duplicate'):
+            self.add_error(None, forms.ValidationError(
+                "An identical transaction on this date already exists.", code="duplicate",
+            ))
+        # A confirmed exact duplicate was reviewed by the user already
+        self.instance.possible_duplicate = bool(self.duplicate_matches) and not exact
         
     def clean_amount(self):
-        amt = self.cleaned_data.get("amount")
-        if amt is None:
-            return amt
-        if amt <= 0:
-            raise forms.ValidationError("Amount must be greater than zero.")
-        return amt
+        return validate_amount(self.cleaned_data.get("amount"))
+
+    def clean_currency(self):
+        code = self.cleaned_data.get("currency") or self.base_currency
+        # An edited transaction may still be in a currency whose rates are gone
+        if code not in convertible(self.base_currency):
+            raise forms.ValidationError(f"No exchange rates to convert {code} to {self.base_currency}.")
+        return code
 
     def clean_date(self):
-        date = self.cleaned_data.get("date")
-        if date and date > timezone.localdate():
-            raise forms.ValidationError("Date cannot be in the future.")
-        return date
+        return validate_date(self.cleaned_data.get("date"))
 
     def clean_image(self):
-        """Validate uploaded image size to limit to 200 KB to reduce S3 costs.
+        """Validate uploaded image size against `RECEIPT_MAX_UPLOAD_SIZE`.
 
+        Uploads are downscaled and recompressed in the background before they
+        reach S3 (see `images.py`), so the limit only guards the staging area.
         Returns the file if valid or raises ValidationError otherwise.
         """
         image = self.cleaned_data.get('image')
         if image:
-            max_size = 200 * 1024  # 200 KB
+            max_size = settings.RECEIPT_MAX_UPLOAD_SIZE
             # Some storage backends provide size attribute on the file
             size = getattr(image, 'size', None)
             if size is not None and size > max_size:
-                raise forms.ValidationError("Image file too large (max 200 KB). Please compress or choose a smaller image.")
+                raise forms.ValidationError(
+                    f"Image file too large (max {filesizeformat(max_size)}). Please choose a smaller image."
+                )
         return image
 
 
@@ -140,3 +281,91 @@ class CategoryForm(forms.ModelForm):
             "name": forms.TextInput(attrs={"class": "input"}),
             "type": forms.Select(attrs={"class": "select"}),
         }
+
+
+class TransactionImportForm(forms.Form):
+    """Upload form for the bulk CSV import page.
+
+    The CSV needs a header row with `date`, `amount`, `category` and
+    `description` columns; an optional `type` column is cross-checked against
+    the category's type and an optional `currency` column gives the amount's
+    currency.
+    """
+    file = forms.FileField(
+        label="CSV file",
+        widget=forms.ClearableFileInput(attrs={"class": "block w-full text-sm text-gray-600 file-input", "accept": ".csv,text/csv"}),
+    )
+
+
+
+class BudgetForm(forms.Form):
+    """Monthly budget limits, one optional field per expense category.
+
+    Fields are named `budget_<category id>` and built from the category
+    cache. `limits()` returns `{category_id: limit or None}` for
+    `budgets.save_limits`; an empty field removes the category's budget.
+    """
+
+    def __init__(self, *args, initial_limits=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        initial_limits = initial_limits or {}
+        for category in get_categories():
+            if category.type != "expense":
+                continue
+            self.fields[f"budget_{category.pk}"] = forms.DecimalField(
+                label=category.name,
+                required=False,
+                max_digits=17,
+                decimal_places=2,
+                validators=[validate_amount],
+                initial=initial_limits.get(category.pk),
+                widget=forms.NumberInput(attrs={"step": "0.01", "min": "0", "placeholder": "No budget", "class": "w-full px-4 py-2 border rounded"}),
+            )
+
+    def limits(self):
+        return {
+            int(name.split("_", 1)[1]): value
+            for name, value in self.cleaned_data.items()
+        }
+
+
+class TransactionBulkForm(forms.Form):
+    """Bulk action on the list page.
+
+    Fields:
+    - action: `recategorize`, `delete` or `not_duplicate` (clears the
+      possible duplicate flag)
+    - scope: `selected` (the rows in `ids`) or `filter` (every row matching
+      the list filters, posted alongside as `start_date`, `end_date`,
+      `category`, `q` and `duplicates`)
+    - ids: ids of the selected transactions (checkboxes)
+    - new_category: target category of `recategorize`
+    """
+    ACTIONS = (("recategorize", "Change category"), ("delete", "Delete"), ("not_duplicate", "Not a duplicate"))
+    SCOPES = (("selected", "Selected transactions"), ("filter", "All transactions matching the filters"))
+    action = forms.ChoiceField(choices=ACTIONS, widget=forms.Select(attrs={"class": "px-4 py-2 border rounded"}))
+    scope = forms.ChoiceField(choices=SCOPES, initial="selected", widget=forms.Select(attrs={"class": "px-4 py-2 border rounded"}))
+    ids = forms.Field(required=False, widget=forms.MultipleHiddenInput)
+    new_category = forms.TypedChoiceField(
+        coerce=int, required=False, empty_value=None, label="New category",
+        widget=forms.Select(attrs={"class": "px-4 py-2 border rounded"}),
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Category options come from the cache, like the other list page forms
+        self.fields['new_category'].choices = [("", "New category")] + get_category_choices()
+
+    def clean_ids(self):
+        try:
+            return sorted({int(value) for value in self.cleaned_data.get("ids") or []})
+        except (TypeError, ValueError):
+            raise forms.ValidationError("Invalid selection.")
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get("scope") == "selected" and not cleaned_data.get("ids"):
+            raise forms.ValidationError("Select at least one transaction.")
+        if cleaned_data.get("action") == "recategorize" and not cleaned_data.get("new_category"):
+            self.add_error("new_category", "Choose the new category.")
+        return cleaned_data
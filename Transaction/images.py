@@ -0,0 +1,118 @@
+"""Background processing of receipt images.
+
+Uploads are no longer written to media storage inside the request. The view
+stages the raw file on local disk (`stage_upload`) and, once the database
+transaction commits, queues `process_receipt` on a small thread pool. The
+worker then:
+
+- downscales the image to at most `RECEIPT_MAX_DIMENSION` pixels and
+  recompresses it as WebP (JPEG when Pillow lacks WebP support);
+- writes a `RECEIPT_THUMBNAIL_SIZE` thumbnail for the list/detail pages;
+- stores both through the default media storage (Spaces in production) and
+  records them with a queryset `update()` so no Transaction signals fire
+  (the owner's cached list page is invalidated explicitly);
+- removes the staged file.
+
+Set `RECEIPT_PROCESS_SYNC = True` to run the worker inline (handy in tests
+and one-off scripts).
+"""
+
+import io
+import logging
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from .cache import bump_user_version
+from .models import Transaction
+
+
+logger = logging.getLogger(__name__)
+
+staging_storage = FileSystemStorage(location=settings.RECEIPT_STAGING_ROOT)
+
+_executor = ThreadPoolExecutor(max_workers=settings.RECEIPT_WORKERS, thread_name_prefix="receipts")
+
+
+def _output_format():
+    """Return `(PIL format, file extension)` for recompressed images."""
+    if features.check("webp"):
+        return "WEBP", "webp"
+    return "JPEG", "jpg"
+
+
+def stage_upload(upload):
+    """Write an uploaded file to the local staging area and return its name."""
+    ext = os.path.splitext(upload.name)[1].lower()
+    return staging_storage.save(f"{uuid.uuid4().hex}{ext}", upload)
+
+
+def enqueue_receipt(transaction_id, staged_name):
+    """Queue processing of a staged upload after the current transaction commits."""
+    def submit():
+        if getattr(settings, "RECEIPT_PROCESS_SYNC", False):
+            process_receipt(transaction_id, staged_name)
+        else:
+            _executor.submit(_run_job, transaction_id, staged_name)
+
+    transaction.on_commit(submit)
+
+
+def _run_job(transaction_id, staged_name):
+    """Thread pool entry point: isolate DB connections and log failures."""
+    close_old_connections()
+    try:
+        process_receipt(transaction_id, staged_name)
+    except Exception:
+        logger.exception("Receipt processing failed for transaction %s", transaction_id)
+    finally:
+        close_old_connections()
+
+
+def _encode(image, max_size, fmt):
+    """Return the bytes of `image` shrunk to fit `max_size`, encoded as `fmt`."""
+    copy = image.copy()
+    copy.thumbnail((max_size, max_size), Image.LANCZOS)
+    buffer = io.BytesIO()
+    copy.save(buffer, fmt, quality=settings.RECEIPT_QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+def process_receipt(transaction_id, staged_name):
+    """Resize, recompress and thumbnail one staged upload.
+
+    Does nothing (besides cleaning up the staged file) if the transaction was
+    deleted in the meantime.
+    """
+    try:
+        instance = Transaction.objects.only("pk", "user", "image", "thumbnail").filter(pk=transaction_id).first()
+        if instance is None:
+            return
+
+        fmt, ext = _output_format()
+        with staging_storage.open(staged_name, "rb") as fh:
+            image = ImageOps.exif_transpose(Image.open(fh))
+            image = image.convert("RGB")
+        full = _encode(image, settings.RECEIPT_MAX_DIMENSION, fmt)
+        thumb = _encode(image, settings.RECEIPT_THUMBNAIL_SIZE, fmt)
+
+        base = os.path.splitext(os.path.basename(staged_name))[0]
+        # FieldFile.save() renames in place, so remember the old names first
+        old_files = [(f.storage, f.name) for f in (instance.image, instance.thumbnail) if f]
+        instance.image.save(f"{base}.{ext}", ContentFile(full), save=False)
+        instance.thumbnail.save(f"{base}.{ext}", ContentFile(thumb), save=False)
+        Transaction.objects.filter(pk=transaction_id).update(
+            image=instance.image.name, thumbnail=instance.thumbnail.name, updated_at=timezone.now(),
+        )
+        bump_user_version(instance.user_id)
+        for storage, name in old_files:
+            storage.delete(name)
+    finally:
+        staging_storage.delete(staged_name)
@@ -0,0 +1,36 @@
+"""Import transactions for a user from a CSV file.
+
+Usage: python manage.py import_transactions <username> <path.csv> [--batch-size N]
+
+Uses the same validation and batched insert as the import page; rejected rows
+are reported with their line number.
+"""
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from Transaction.importer import DEFAULT_BATCH_SIZE, import_transactions
+
+
+class Command(BaseCommand):
+    help = "Bulk import transactions for a user from a CSV file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("path")
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Rows per bulk insert.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['username']}' does not exist.")
+
+        with open(options["path"], newline="", encoding="utf-8-sig") as fh:
+            result = import_transactions(user, fh, batch_size=options["batch_size"])
+
+        for line, message in result.errors:
+            self.stderr.write(f"line {line}: {message}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.created} rows ({result.flagged} possible duplicates), rejected {len(result.errors)}."
+        ))
@@ -0,0 +1,31 @@
+"""Load exchange rates from a CSV file and reconvert foreign-currency amounts.
+
+Usage: python manage.py load_fx_rates [path] [--batch-size N]
+
+The file uses the ECB reference-rate layout (`Date,USD,JPY,...`, rates per
+one FX_REFERENCE_CURRENCY), e.g. `eurofxref-hist.csv` downloaded from the
+ECB; it defaults to `settings.FX_RATES_FILE`. Existing rates of the same
+day are replaced. Nothing is fetched over the network.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from Transaction.currency import DEFAULT_BATCH_SIZE, load_rates, reconvert
+
+
+class Command(BaseCommand):
+    help = "Load exchange rates from a CSV file and reconvert transactions not in their owner's base currency."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", default=str(settings.FX_RATES_FILE), help="CSV file to load.")
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Transactions converted per batch.")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["path"], encoding="utf-8-sig", newline="") as lines:
+                loaded = load_rates(lines)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Could not load {options['path']}: {exc}")
+        converted = reconvert(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Loaded {loaded} rates; reconverted {converted} transactions."))
@@ -0,0 +1,63 @@
+"""Measure concurrent throughput of a running server on the read endpoints.
+
+Usage:
+    python manage.py load_test --username bench_user_0
+                               [--url http://127.0.0.1:8000]
+                               [--concurrency 32] [--requests 2000]
+                               [--endpoints list,detail,analytics]
+
+Start the server first (gunicorn for WSGI, uvicorn for ASGI, see
+SETUP_STEPS.md) against the same database; seed it with
+`seed_transactions`. A session for `--username` is created directly in the
+session store, so no password is needed. Prints requests per second and
+p50/p95 latency per endpoint; run it once per server mode to compare them.
+"""
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from Transaction.benchmarks import load_test, session_cookie
+from Transaction.models import Transaction
+
+
+class Command(BaseCommand):
+    help = "Load test the list/detail/analytics endpoints of a running server."
+
+    endpoints = ("list", "detail", "analytics")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--username", required=True, help="User whose pages are requested.")
+        parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL of the running server.")
+        parser.add_argument("--concurrency", type=int, default=32, help="Concurrent client connections.")
+        parser.add_argument("--requests", type=int, default=2000, help="Requests per endpoint.")
+        parser.add_argument("--endpoints", default=",".join(self.endpoints), help="Comma separated endpoints.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}.")
+        names = [name.strip() for name in options["endpoints"].split(",") if name.strip()]
+        unknown = set(names) - set(self.endpoints)
+        if unknown:
+            raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}.")
+        sample = Transaction.objects.filter(user=user).order_by("-date", "-id").first()
+        if sample is None and "detail" in names:
+            raise CommandError("The user has no transactions; seed some with seed_transactions.")
+        paths = {
+            "list": reverse("list"),
+            "detail": reverse("detail", args=[sample.pk]) if sample else None,
+            "analytics": reverse("analytics") + "?period=week",
+        }
+
+        results = load_test(
+            options["url"].rstrip("/"), [paths[name] for name in names], session_cookie(user),
+            concurrency=options["concurrency"], requests=options["requests"],
+        )
+        self.stdout.write(f"{'path':<24} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9}")
+        for row in results:
+            self.stdout.write(
+                f"{row['path']:<24} {row['requests']:>8} {row['errors']:>6} {row['rps']:>8.1f} "
+                f"{row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f}"
+            )
@@ -0,0 +1,36 @@
+"""Create the transactions of every recurring rule that is due.
+
+Usage: python manage.py materialize_recurring [--date YYYY-MM-DD] [--batch-size N]
+
+Meant to run from cron (e.g. hourly). Runs are idempotent, and a run after
+downtime catches up on every missed occurrence.
+"""
+
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Transaction.recurring import DEFAULT_BATCH_SIZE, materialize_due
+
+
+class Command(BaseCommand):
+    help = "Materialize due occurrences of recurring transactions for all users."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", help="Materialize occurrences up to this date (default: today).")
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Rules processed per transaction.")
+
+    def handle(self, *args, **options):
+        today = None
+        if options["date"]:
+            try:
+                today = datetime.date.fromisoformat(options["date"])
+            except ValueError:
+                raise CommandError("--date must be YYYY-MM-DD.")
+
+        result = materialize_due(today, batch_size=options["batch_size"])
+        if result.skipped:
+            self.stderr.write(f"Skipped {result.skipped} rules locked by a concurrent run.")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result.created} transactions from {result.rules} rules ({result.finished} finished)."
+        ))
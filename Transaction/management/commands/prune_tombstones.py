@@ -0,0 +1,19 @@
+"""Delete sync tombstones older than `SYNC_TOMBSTONE_DAYS`.
+
+Usage: python manage.py prune_tombstones
+
+Meant to run from cron (e.g. daily). Clients that have not synced within the
+retention period are sent a full copy on their next sync (see `sync.py`).
+"""
+
+from django.core.management.base import BaseCommand
+
+from Transaction.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = "Delete tombstones of deleted transactions that sync clients no longer need."
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} tombstones."))
@@ -0,0 +1,22 @@
+"""Rebuild the `MonthlyRollup` table from the raw Transaction rows.
+
+Usage: python manage.py rebuild_rollups [--batch-size N]
+
+Incremental maintenance normally keeps rollups current; run this after bulk
+data fixes or anything else that bypassed the Transaction signals.
+"""
+
+from django.core.management.base import BaseCommand
+
+from Transaction.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute monthly per-user/per-category rollups from transactions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Number of users rebuilt per transaction.")
+
+    def handle(self, *args, **options):
+        written = rebuild_rollups(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} rollup rows."))
@@ -0,0 +1,89 @@
+"""Benchmark every transaction endpoint at several data sizes.
+
+Usage:
+    python manage.py run_benchmarks [--sizes 100,1000,10000] [--repeat 20]
+                                    [--warm] [--output results.json]
+                                    [--compare previous.json]
+
+Runs against a throwaway test database (like `manage.py test`), so the
+configured database is never touched. Prints p50/p95 latency, query counts
+and peak memory per endpoint, optionally saves them as JSON and compares
+them with an earlier run.
+"""
+
+import json
+import logging
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from django.utils import timezone
+
+from Transaction.benchmarks import run_benchmarks
+
+
+class Command(BaseCommand):
+    help = "Benchmark the transaction endpoints on synthetic data and report latency/queries/memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="100,1000,10000", help="Comma separated transactions-per-user sizes.")
+        parser.add_argument("--repeat", type=int, default=20, help="Requests per endpoint and size.")
+        parser.add_argument("--warm", action="store_true", help="Keep caches between requests.")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed for the synthetic data.")
+        parser.add_argument("--output", help="Write results as JSON to this path.")
+        parser.add_argument("--compare", help="Earlier JSON results to compare p50 latency against.")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options["sizes"].split(",") if size.strip()]
+        except ValueError:
+            raise CommandError("--sizes must be a comma separated list of integers.")
+        baseline = None
+        if options["compare"]:
+            with open(options["compare"]) as fh:
+                baseline = {(row["size"], row["endpoint"]): row for row in json.load(fh)["results"]}
+
+        # Per-request timing lines would drown the report
+        logging.getLogger("mysite.performance").setLevel(logging.ERROR)
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            results = run_benchmarks(sizes, repeat=options["repeat"], warm=options["warm"], seed=options["seed"])
+            vendor = connection.vendor
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        self.report(results, baseline)
+        if options["output"]:
+            payload = {
+                "meta": {
+                    "created": timezone.now().isoformat(),
+                    "django": django.get_version(),
+                    "database": vendor,
+                    "repeat": options["repeat"],
+                    "warm": options["warm"],
+                },
+                "results": results,
+            }
+            with open(options["output"], "w") as fh:
+                json.dump(payload, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def report(self, results, baseline):
+        header = f"{'size':>8} {'endpoint':<14} {'status':>6} {'p50 ms':>9} {'p95 ms':>9} {'queries':>8} {'peak KiB':>9}"
+        if baseline:
+            header += f" {'p50 vs base':>12}"
+        self.stdout.write(header)
+        for row in results:
+            line = (
+                f"{row['size']:>8} {row['endpoint']:<14} {row['status']:>6} {row['p50_ms']:>9.2f} "
+                f"{row['p95_ms']:>9.2f} {row['queries']:>8} {row['peak_kib']:>9.1f}"
+            )
+            previous = (baseline or {}).get((row["size"], row["endpoint"]))
+            if previous and previous["p50_ms"]:
+                change = (row["p50_ms"] - previous["p50_ms"]) / previous["p50_ms"] * 100
+                line += f" {change:>+11.1f}%"
+            self.stdout.write(line)
@@ -0,0 +1,30 @@
+"""Seed the database with synthetic users and transactions.
+
+Usage: python manage.py seed_transactions --users N --per-user M [--years Y] [--seed S]
+
+Useful for local development and for profiling with realistic data volumes.
+"""
+
+from django.core.management.base import BaseCommand
+
+from Transaction.benchmarks import seed_transactions
+
+
+class Command(BaseCommand):
+    help = "Create N synthetic users with M transactions each (bulk inserted)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1, help="Number of users to create.")
+        parser.add_argument("--per-user", type=int, default=1000, help="Transactions per user.")
+        parser.add_argument("--years", type=float, default=3, help="Length of each user's history in years.")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed for reproducible data.")
+        parser.add_argument("--prefix", default="bench_user", help="Username prefix.")
+
+    def handle(self, *args, **options):
+        users = seed_transactions(
+            options["users"], options["per_user"], years=options["years"],
+            seed=options["seed"], prefix=options["prefix"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(users)} user(s) with {options['per_user']} transactions each."
+        ))
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+COVERING_INDEX = "txn_user_date_cover_idx"
+
+
+def create_covering_index(apps, schema_editor):
+    """Add an index-only-scan friendly index for the summary aggregates.
+
+    `INCLUDE` columns are a PostgreSQL feature; other backends rely on the
+    composite indexes declared on the model.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    table = apps.get_model("Transaction", "Transaction")._meta.db_table
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS "{COVERING_INDEX}" ON "{table}" '
+        '("user_id", "date") INCLUDE ("category_id", "amount")'
+    )
+
+
+def drop_covering_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS "{COVERING_INDEX}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Transaction", "0002_transaction_user"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["user", "-date", "-id"], name="txn_user_date_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["user", "category", "-date", "-id"], name="txn_user_cat_date_idx"
+            ),
+        ),
+        migrations.RunPython(create_covering_index, drop_covering_index),
+    ]
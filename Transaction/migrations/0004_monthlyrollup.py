@@ -0,0 +1,92 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_rollups(apps, schema_editor):
+    """Populate rollups for existing transactions, one user at a time."""
+    Transaction = apps.get_model("Transaction", "Transaction")
+    MonthlyRollup = apps.get_model("Transaction", "MonthlyRollup")
+    user_ids = Transaction.objects.order_by("user_id").values_list("user_id", flat=True).distinct()
+    for user_id in user_ids.iterator():
+        rows = (
+            Transaction.objects.filter(user_id=user_id)
+            .order_by()
+            .annotate(month=TruncMonth("date"))
+            .values("month", "category_id", "category__type")
+            .annotate(total=Sum("amount"), count=Count("id"))
+        )
+        MonthlyRollup.objects.bulk_create(
+            MonthlyRollup(
+                user_id=user_id,
+                month=row["month"],
+                category_id=row["category_id"],
+                type=row["category__type"],
+                total=row["total"],
+                count=row["count"],
+            )
+            for row in rows
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Transaction", "0003_transaction_list_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MonthlyRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("month", models.DateField()),
+                (
+                    "type",
+                    models.CharField(
+                        choices=[("income", "income"), ("expense", "expense")],
+                        max_length=10,
+                    ),
+                ),
+                ("total", models.FloatField(default=0)),
+                ("count", models.IntegerField(default=0)),
+                (
+                    "category",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="Transaction.category",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="monthly_rollups",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "month", "category"),
+                        name="rollup_user_month_cat_uniq",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
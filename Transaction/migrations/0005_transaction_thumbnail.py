@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Transaction", "0004_monthlyrollup"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="transaction",
+            name="thumbnail",
+            field=models.ImageField(
+                blank=True, editable=False, null=True, upload_to="images/thumbnails"
+            ),
+        ),
+    ]
@@ -0,0 +1,120 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:20
+
+import Transaction.fields
+from django.db import migrations, models, transaction
+from django.db.models import BigIntegerField, F, FloatField, Max, Min
+from django.db.models.functions import Cast, Round
+
+
+BATCH_SIZE = 10000
+
+COVERING_INDEX = "txn_user_date_cover_idx"
+
+
+def _in_batches(model, update):
+    """Apply `update` to `model` rows in primary key ranges of BATCH_SIZE.
+
+    Each range is its own short transaction, so the table is never locked
+    as a whole while large histories are converted.
+    """
+    bounds = model.objects.aggregate(low=Min("pk"), high=Max("pk"))
+    if bounds["low"] is None:
+        return
+    for start in range(bounds["low"], bounds["high"] + 1, BATCH_SIZE):
+        with transaction.atomic():
+            model.objects.filter(pk__gte=start, pk__lt=start + BATCH_SIZE).update(**update)
+
+
+def floats_to_cents(apps, schema_editor):
+    Transaction = apps.get_model("Transaction", "Transaction")
+    MonthlyRollup = apps.get_model("Transaction", "MonthlyRollup")
+    _in_batches(Transaction, {"amount_cents": Cast(Round(F("amount") * 100), BigIntegerField())})
+    _in_batches(MonthlyRollup, {"total_cents": Cast(Round(F("total") * 100), BigIntegerField())})
+
+
+def cents_to_floats(apps, schema_editor):
+    Transaction = apps.get_model("Transaction", "Transaction")
+    MonthlyRollup = apps.get_model("Transaction", "MonthlyRollup")
+    _in_batches(Transaction, {"amount": Cast(F("amount_cents"), FloatField()) / 100})
+    _in_batches(MonthlyRollup, {"total": Cast(F("total_cents"), FloatField()) / 100})
+
+
+def create_covering_index(apps, schema_editor):
+    """Recreate the PostgreSQL covering index dropped with the old column."""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    table = apps.get_model("Transaction", "Transaction")._meta.db_table
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS "{COVERING_INDEX}" ON "{table}" '
+        '("user_id", "date") INCLUDE ("category_id", "amount")'
+    )
+
+
+def drop_covering_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS "{COVERING_INDEX}"')
+
+
+class Migration(migrations.Migration):
+
+    # Conversion runs in per-batch transactions (see _in_batches)
+    atomic = False
+
+    dependencies = [
+        ("Transaction", "0005_transaction_thumbnail"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="transaction",
+            name="amount_cents",
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name="monthlyrollup",
+            name="total_cents",
+            field=models.BigIntegerField(null=True),
+        ),
+        # Nullable float columns let the migration be reversed cleanly
+        migrations.AlterField(
+            model_name="transaction",
+            name="amount",
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name="monthlyrollup",
+            name="total",
+            field=models.FloatField(default=0, null=True),
+        ),
+        migrations.RunPython(floats_to_cents, cents_to_floats),
+        migrations.RemoveField(
+            model_name="transaction",
+            name="amount",
+        ),
+        migrations.RemoveField(
+            model_name="monthlyrollup",
+            name="total",
+        ),
+        migrations.RenameField(
+            model_name="transaction",
+            old_name="amount_cents",
+            new_name="amount",
+        ),
+        migrations.RenameField(
+            model_name="monthlyrollup",
+            old_name="total_cents",
+            new_name="total",
+        ),
+        migrations.AlterField(
+            model_name="transaction",
+            name="amount",
+            field=Transaction.fields.CentsField(),
+        ),
+        migrations.AlterField(
+            model_name="monthlyrollup",
+            name="total",
+            field=Transaction.fields.CentsField(default=0),
+        ),
+        migrations.RunPython(create_covering_index, drop_covering_index),
+    ]
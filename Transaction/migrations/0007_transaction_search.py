@@ -0,0 +1,81 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+SEARCH_TABLE = "transaction_search"
+GIN_INDEX = "txn_description_search_idx"
+
+
+def create_search_index(apps, schema_editor):
+    """Create the full-text index over descriptions.
+
+    SQLite: a contentless FTS5 table filled from the existing rows, ranked by
+    bm25 over `description` only. Its sync triggers are installed by the
+    `post_migrate` handler (`search.install_sqlite_triggers`), which also
+    restores them after later migrations rebuild the Transaction table.
+    PostgreSQL: a GIN expression index matching the queries in `search.py`.
+    """
+    vendor = schema_editor.connection.vendor
+    table = apps.get_model("Transaction", "Transaction")._meta.db_table
+    if vendor == "sqlite":
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+            "description, owner, content='', "
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {SEARCH_TABLE}(rowid, description, owner) "
+            f'SELECT "id", "description", \'u\' || "user_id" FROM "{table}"'
+        )
+        schema_editor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rank) VALUES ('rank', 'bm25(1.0, 0.0)')")
+    elif vendor == "postgresql":
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{GIN_INDEX}" ON "{table}" '
+            "USING GIN (to_tsvector('simple', \"description\"))"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        for suffix in ("ai", "ad", "au"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+    elif vendor == "postgresql":
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{GIN_INDEX}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Transaction", "0006_amount_cents"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TransactionSearch",
+            fields=[
+                (
+                    "transaction",
+                    models.OneToOneField(
+                        db_column="rowid",
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        primary_key=True,
+                        related_name="search_entry",
+                        serialize=False,
+                        to="Transaction.transaction",
+                    ),
+                ),
+                ("description", models.TextField()),
+                ("owner", models.TextField()),
+                ("rank", models.FloatField()),
+            ],
+            options={
+                "db_table": "transaction_search",
+                "managed": False,
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:53
+
+import Transaction.fields
+import Users.models
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_base_amounts(apps, schema_editor):
+    # Existing transactions are all in the base currency
+    Transaction = apps.get_model("Transaction", "Transaction")
+    Transaction.objects.update(base_amount=F("amount"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Transaction", "0009_budget"),
+        ("Users", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recurringrule",
+            name="currency",
+            field=models.CharField(default=Users.models.default_currency, max_length=3),
+        ),
+        migrations.AddField(
+            model_name="transaction",
+            name="base_amount",
+            field=Transaction.fields.CentsField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="transaction",
+            name="currency",
+            field=models.CharField(default=Users.models.default_currency, max_length=3),
+        ),
+        migrations.RunPython(copy_base_amounts, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name="ExchangeRate",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("currency", models.CharField(max_length=3)),
+                ("rate", models.FloatField()),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("currency", "date"), name="fx_rate_currency_date_uniq"
+                    )
+                ],
+            },
+        ),
+    ]
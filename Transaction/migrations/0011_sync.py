@@ -0,0 +1,81 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_added_on(apps, schema_editor):
+    # Existing rows were last written (as far as we know) when they were added
+    Transaction = apps.get_model("Transaction", "Transaction")
+    Transaction.objects.update(updated_at=F("added_on"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Transaction", "0010_currency"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TransactionTombstone",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("transaction_id", models.BigIntegerField()),
+                ("deleted_at", models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name="transaction",
+            name="client_id",
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="transaction",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(copy_added_on, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["user", "updated_at", "id"], name="txn_user_updated_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="transaction",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("client_id__isnull", False)),
+                fields=("user", "client_id"),
+                name="txn_user_client_uniq",
+            ),
+        ),
+        migrations.AddField(
+            model_name="transactiontombstone",
+            name="user",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transactiontombstone",
+            index=models.Index(
+                fields=["user", "deleted_at", "transaction_id"],
+                name="tombstone_user_deleted_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:09
+
+import hashlib
+import re
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+def fingerprint(user_id, amount, currency, description):
+    # Frozen copy of duplicates.fingerprint as of this migration
+    cents = int((Decimal(amount) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    words = " ".join(sorted(set(_WORD_RE.findall(description.lower()))))
+    key = f"{user_id}|{cents}|{currency}|{words}"
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big", signed=True)
+
+
+def fill_fingerprints(apps, schema_editor):
+    # Batches by primary key; one executemany UPDATE per batch
+    Transaction = apps.get_model("Transaction", "Transaction")
+    connection = schema_editor.connection
+    quote = connection.ops.quote_name
+    sql = f"UPDATE {quote(Transaction._meta.db_table)} SET {quote('fingerprint')} = %s WHERE {quote('id')} = %s"
+    last = 0
+    with connection.cursor() as cursor:
+        while True:
+            rows = list(
+                Transaction.objects.filter(pk__gt=last).order_by("pk")
+                .values_list("pk", "user_id", "amount", "currency", "description")[:BATCH_SIZE]
+            )
+            if not rows:
+                break
+            cursor.executemany(sql, [
+                (fingerprint(user_id, amount, code, description), pk)
+                for pk, user_id, amount, code, description in rows
+            ])
+            last = rows[-1][0]
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Transaction", "0011_sync"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="transaction",
+            name="fingerprint",
+            field=models.BigIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="transaction",
+            name="possible_duplicate",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(fill_fingerprints, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["fingerprint", "date"], name="txn_fingerprint_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                condition=models.Q(("possible_duplicate", True)),
+                fields=["user", "-date", "-id"],
+                name="txn_user_dup_idx",
+            ),
+        ),
+    ]
@@ -1,8 +1,16 @@
 """Data models for the Transaction app.
 
-Contains two lightweight models:
+Contains eight lightweight models:
 - Category: a small lookup table for transaction categories
 - Transaction: stores a user's monetary entries with optional image and description
+- TransactionTombstone: a record of a deleted transaction for offline sync
+- ExchangeRate: daily reference exchange rates used for currency conversion
+- MonthlyRollup: precomputed per-user/month/category totals for fast summaries
+- RecurringRule: an RRULE-like schedule that repeats a transaction
+- Budget: a user's monthly spending limit for one category
+- BudgetEvent: a record of a budget crossing one of its alert thresholds
+
+plus `TransactionSearch`, an unmanaged mapping of the SQLite full-text index.
 
 All fields are simple Django fields; behaviour notes are kept on fields and
 the __str__ implementations.
@@ -10,8 +18,13 @@ the __str__ implementations.
 
 from django.db import models
 
+from Users.models import default_currency
+
+from .fields import CentsField
+
 
 account_types = (("income", "income"), ("expense", "expense"))
+frequencies = (("daily", "daily"), ("weekly", "weekly"), ("monthly", "monthly"), ("yearly", "yearly"))
 
 
 class Category(models.Model):
@@ -35,23 +48,56 @@ class Transaction(models.Model):
     Fields
     - user: ForeignKey to the auth user who owns the transaction
     - added_on: timestamp set when the row is created
-    - amount: float amount (positive numbers expected)
+    - updated_at: timestamp of the last write to the row (see `sync.py`)
+    - client_id: optional id chosen by an offline client for a row it
+      created, so a retried upload does not create it twice
+    - amount: Decimal amount with two places, stored as integer cents
+      (positive numbers expected)
+    - currency: ISO 4217 code of `amount`
+    - base_amount: `amount` converted to the owner's base currency at the
+      rate of `date`; derived on save (see `currency.py`)
     - category: FK to `Category`
     - date: the date the transaction applies to
-    - image: optional image (e.g., receipt)
+    - image: optional image (e.g., receipt), recompressed in the background
+    - thumbnail: small version of `image` generated with it (see `images.py`)
     - description: free-text description
+    - recurring_rule: the `RecurringRule` that generated the row, if any
+    - fingerprint: hash of the owner, amount, currency and description
+      words; derived on save (see `duplicates.py`)
+    - possible_duplicate: set when a matching transaction existed within a
+      few days when the row was saved, until the user reviews it
 
     Notes
     - `__str__` returns the first token of the description for brevity in lists.
     - Meta.ordering sorts by `-date` (most recent first).
+    - Meta.indexes cover the per-user list queries: date range + keyset
+      ordering, and category filter + keyset ordering.
+    - A rule materializes at most one transaction per date
+      (`txn_rule_date_uniq`), which guards against concurrent scheduler runs.
+    - Totals, rollups and analytics sum `base_amount`. Writers that bypass
+      the model signals must set it themselves (`currency.convert`).
+    - Writers that bypass `save()` must also set `updated_at`, or sync
+      clients miss the change; `txn_user_updated_idx` serves the delta query.
+    - `txn_fingerprint_date_idx` serves the duplicate checks and
+      `txn_user_dup_idx` (partial) the list of possible duplicates.
     """
     user = models.ForeignKey("auth.User", on_delete=models.CASCADE, related_name="transactions")
     added_on = models.DateTimeField(auto_now_add=True)
-    amount = models.FloatField()
+    updated_at = models.DateTimeField(auto_now=True)
+    client_id = models.UUIDField(null=True, blank=True, editable=False)
+    amount = CentsField()
+    currency = models.CharField(max_length=3, default=default_currency)
+    base_amount = CentsField(default=0, editable=False)
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     date = models.DateField()
     image = models.ImageField(upload_to="images", null=True, blank=True)
+    thumbnail = models.ImageField(upload_to="images/thumbnails", null=True, blank=True, editable=False)
     description = models.TextField()
+    recurring_rule = models.ForeignKey(
+        "RecurringRule", null=True, blank=True, editable=False, on_delete=models.SET_NULL, related_name="transactions",
+    )
+    fingerprint = models.BigIntegerField(null=True, editable=False)
+    possible_duplicate = models.BooleanField(default=False, editable=False)
 
     def __str__(self):
         """Short representation used in admin and lists."""
@@ -59,5 +105,242 @@ class Transaction(models.Model):
 
     class Meta:
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['user', '-date', '-id'], name='txn_user_date_id_idx'),
+            models.Index(fields=['user', 'category', '-date', '-id'], name='txn_user_cat_date_idx'),
+            models.Index(fields=['user', 'updated_at', 'id'], name='txn_user_updated_idx'),
+            models.Index(fields=['fingerprint', 'date'], name='txn_fingerprint_date_idx'),
+            models.Index(
+                fields=['user', '-date', '-id'], name='txn_user_dup_idx', condition=models.Q(possible_duplicate=True),
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['recurring_rule', 'date'], name='txn_rule_date_uniq'),
+            models.UniqueConstraint(
+                fields=['user', 'client_id'], name='txn_user_client_uniq', condition=models.Q(client_id__isnull=False),
+            ),
+        ]
+
+
+class TransactionTombstone(models.Model):
+    """A deleted transaction, kept so sync clients can drop their copy.
+
+    Fields
+    - user: owner of the deleted transaction
+    - transaction_id: primary key the transaction had
+    - deleted_at: when it was deleted
+
+    Notes
+    - Written by the Transaction `post_delete` signal and by bulk deletes
+      (see `sync.py`). The user FK has no database constraint so tombstones
+      can be written without locking the user row; they are pruned after
+      `settings.SYNC_TOMBSTONE_DAYS` (`manage.py prune_tombstones`).
+    """
+    user = models.ForeignKey("auth.User", on_delete=models.DO_NOTHING, db_constraint=False, related_name="+")
+    transaction_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField()
+
+    def __str__(self):
+        """Readable label used in admin."""
+        return f"{self.transaction_id} deleted {self.deleted_at:%Y-%m-%d %H:%M}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deleted_at', 'transaction_id'], name='tombstone_user_deleted_idx'),
+        ]
+
+
+class ExchangeRate(models.Model):
+    """Reference exchange rate of one currency on one day.
+
+    Fields
+    - date: day the rate was published for
+    - currency: ISO 4217 code
+    - rate: units of `currency` per one `settings.FX_REFERENCE_CURRENCY`
+
+    Notes
+    - Loaded from a CSV file by `manage.py load_fx_rates`; there is no
+      network access. A conversion on a day without a rate (weekends,
+      holidays) uses the latest earlier rate (see `currency.py`).
+    - The unique constraint's index serves the per-currency reads.
+    """
+    date = models.DateField()
+    currency = models.CharField(max_length=3)
+    rate = models.FloatField()
+
+    def __str__(self):
+        """Readable label used in admin."""
+        return f"{self.date} {self.currency} {self.rate}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['currency', 'date'], name='fx_rate_currency_date_uniq'),
+        ]
+
+
+class MonthlyRollup(models.Model):
+    """Per-user monthly totals for one category.
+
+    Fields
+    - user: owner of the summarized transactions
+    - month: first day of the summarized calendar month
+    - category: FK to `Category`
+    - type: copy of `category.type` so totals can be grouped without a join
+    - total: sum of `Transaction.base_amount` for the bucket (base currency)
+    - count: number of transactions in the bucket
+
+    Notes
+    - Rows are maintained incrementally by the Transaction signals in
+      `signals.py` (see `rollups.py`). Bulk operations that bypass signals
+      must call `rollups.apply_delta` themselves or be followed by
+      `manage.py rebuild_rollups`.
+    """
+    user = models.ForeignKey("auth.User", on_delete=models.CASCADE, related_name="monthly_rollups")
+    month = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    type = models.CharField(choices=account_types, max_length=10)
+    total = CentsField(default=0)
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        """Readable bucket label used in admin."""
+        return f"{self.month:%Y-%m} {self.category_id} {self.total}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month', 'category'], name='rollup_user_month_cat_uniq'),
+        ]
+
+
+class RecurringRule(models.Model):
+    """A transaction repeated on an RRULE-like schedule.
+
+    Fields
+    - user, amount, currency, category, description: copied to every occurrence
+    - frequency: `FREQ` (daily, weekly, monthly or yearly)
+    - interval: `INTERVAL`, number of periods between occurrences
+    - dtstart: `DTSTART`, date of the first occurrence
+    - until: `UNTIL`, optional last date (inclusive)
+    - count: `COUNT`, optional total number of occurrences
+    - occurrences: number of occurrences materialized so far
+    - next_date: date of the next occurrence to materialize, None once the
+      rule is exhausted
+
+    Notes
+    - Monthly and yearly occurrences keep the day of `dtstart`, moved to the
+      last day of shorter months (unlike RRULE, which skips those months).
+    - `next_date` is derived from the schedule and `occurrences` on save (see
+      `signals.py`) and advanced in bulk by `recurring.materialize_due`. The
+      partial index on it serves the scheduler's due query.
+    """
+    user = models.ForeignKey("auth.User", on_delete=models.CASCADE, related_name="recurring_rules")
+    amount = CentsField()
+    currency = models.CharField(max_length=3, default=default_currency)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    description = models.TextField()
+    frequency = models.CharField(choices=frequencies, default="monthly", max_length=10)
+    interval = models.PositiveSmallIntegerField(default=1)
+    dtstart = models.DateField()
+    until = models.DateField(null=True, blank=True)
+    count = models.PositiveIntegerField(null=True, blank=True)
+    occurrences = models.PositiveIntegerField(default=0)
+    next_date = models.DateField(null=True, blank=True, editable=False)
+
+    def __str__(self):
+        """RRULE-style summary used in admin."""
+        rule = f"FREQ={self.frequency.upper()};INTERVAL={self.interval}"
+        if self.count:
+            rule += f";COUNT={self.count}"
+        if self.until:
+            rule += f";UNTIL={self.until:%Y%m%d}"
+        return f"{self.description} ({rule})"
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['next_date'], name='recurring_next_date_idx', condition=models.Q(next_date__isnull=False),
+            ),
+        ]
 
 
+class Budget(models.Model):
+    """A monthly spending limit for one category.
+
+    Fields
+    - user: owner of the budget
+    - category: FK to the budgeted `Category`
+    - limit: amount that may be spent per calendar month
+
+    Notes
+    - Spending per month is not stored here: it is the matching
+      `MonthlyRollup.total`, which is already kept current with `F()`
+      updates on every Transaction create, edit and delete (see `budgets.py`).
+    """
+    user = models.ForeignKey("auth.User", on_delete=models.CASCADE, related_name="budgets")
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    limit = CentsField()
+
+    def __str__(self):
+        """Readable label used in admin."""
+        return f"{self.user_id} {self.category_id} {self.limit}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'category'], name='budget_user_cat_uniq'),
+        ]
+
+
+class BudgetEvent(models.Model):
+    """A budget's monthly spending crossing an alert threshold.
+
+    Fields
+    - budget: FK to the `Budget`
+    - month: first day of the month the spending belongs to
+    - threshold: crossed threshold, in percent of `budget.limit`
+    - spent: spending in the month right after the crossing
+    - created_on: when the crossing happened
+
+    Notes
+    - Recorded at most once per budget, month and threshold.
+    """
+    budget = models.ForeignKey(Budget, on_delete=models.CASCADE, related_name="events")
+    month = models.DateField()
+    threshold = models.PositiveSmallIntegerField()
+    spent = CentsField()
+    created_on = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        """Readable label used in admin."""
+        return f"{self.budget_id} {self.month:%Y-%m} {self.threshold}%"
+
+    class Meta:
+        ordering = ['-created_on']
+        constraints = [
+            models.UniqueConstraint(fields=['budget', 'month', 'threshold'], name='budget_event_uniq'),
+        ]
+
+
+class TransactionSearch(models.Model):
+    """Row of the SQLite FTS5 index over `Transaction.description`.
+
+    Unmanaged: the virtual table is created by a migration and kept in sync
+    by triggers (see `search.py`); it only exists on SQLite. Mapped so
+    searches can join it to Transaction and order by its `rank`.
+
+    Fields
+    - transaction: the indexed transaction (FTS5 `rowid`)
+    - description: indexed text (contentless table, reads return NULL)
+    - owner: `u<user id>` token used to scope searches to one user
+    - rank: FTS5 hidden rank column (bm25 over `description`), lower is better
+    """
+    transaction = models.OneToOneField(
+        Transaction, primary_key=True, db_column="rowid", on_delete=models.DO_NOTHING,
+        related_name="search_entry",
+    )
+    description = models.TextField()
+    owner = models.TextField()
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = "transaction_search"
@@ -0,0 +1,123 @@
+"""Keyset (cursor) pagination for the transaction list.
+
+The list is ordered by `(-date, -id)`, which extends `Transaction.Meta.ordering`
+with the primary key as a tie breaker. A page is fetched with a `WHERE`
+clause that starts right after the last row of the previous page, so the cost
+of a page does not depend on how far back the user has scrolled (unlike
+`OFFSET`, which has to walk over every skipped row).
+
+Cursors are opaque, URL-safe tokens that carry both the position of the last
+row shown and the active filters, so following a "next" link keeps the same
+filtered view without repeating the filter parameters in the URL.
+
+Search results (`q`) are ordered by relevance, which has no stable keyset,
+so their cursors carry a row offset instead (see `search.search_page`).
+"""
+
+import base64
+import binascii
+import datetime
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+
+
+ORDERING = ('-date', '-id')
+
+# Filter parameters that are carried inside a cursor.
+FILTER_KEYS = ('start_date', 'end_date', 'category', 'q', 'duplicates')
+
+# Ids and offsets must fit the database's 64-bit integers
+MAX_ID = 2 ** 63
+
+
+def invalid_filters(filters):
+    """Return the keys of `filters` whose values are malformed.
+
+    Dates must be `YYYY-MM-DD` and the category an id; the other filters
+    accept any string. Checked before the values reach a query, where they
+    would raise.
+    """
+    invalid = []
+    for key in ('start_date', 'end_date'):
+        if filters.get(key):
+            try:
+                if parse_date(filters[key]) is None:
+                    raise ValueError
+            except ValueError:
+                invalid.append(key)
+    if filters.get('category'):
+        try:
+            if not 0 < int(filters['category']) < MAX_ID:
+                raise ValueError
+        except ValueError:
+            invalid.append('category')
+    return invalid
+
+
+def encode_cursor(last, filters, offset=None):
+    """Return an opaque token pointing just after `last`.
+
+    Inputs:
+    - last: the last Transaction shown on the current page
+    - filters: dict of active filter parameters (strings), see FILTER_KEYS
+    - offset: for ranked (search) pages, the number of rows already shown;
+      `last` is ignored then
+    """
+    payload = {'f': {key: filters[key] for key in FILTER_KEYS if filters.get(key)}}
+    if offset is not None:
+        payload['o'] = offset
+    else:
+        payload['d'] = last.date.isoformat()
+        payload['i'] = last.pk
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Decode a token produced by `encode_cursor`.
+
+    Returns a `(position, filters)` tuple, where position is `(date, id)`
+    or an int offset for ranked pages, or None when the token is malformed
+    or carries invalid filters (see `invalid_filters`), so callers can fall
+    back to the first page.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        if 'o' in payload:
+            position = max(0, int(payload['o']))
+        else:
+            position = (datetime.date.fromisoformat(payload['d']), int(payload['i']))
+        filters = {key: str(value) for key, value in payload.get('f', {}).items() if key in FILTER_KEYS}
+    except (binascii.Error, ValueError, TypeError, KeyError, AttributeError):
+        return None
+    pk = position if isinstance(position, int) else position[1]
+    if not pk < MAX_ID or invalid_filters(filters):
+        return None
+    return position, filters
+
+
+def _keyset_queryset(queryset, position, page_size):
+    queryset = queryset.order_by(*ORDERING)
+    if position is not None:
+        date, pk = position
+        queryset = queryset.filter(Q(date__lt=date) | Q(date=date, id__lt=pk))
+    return queryset[:page_size + 1]
+
+
+def keyset_page(queryset, position, page_size):
+    """Return `(rows, has_next)` for the page following `position`.
+
+    `position` is a `(date, id)` tuple or None for the first page. One extra
+    row is fetched to learn whether another page exists without a COUNT query.
+    """
+    rows = list(_keyset_queryset(queryset, position, page_size))
+    return rows[:page_size], len(rows) > page_size
+
+
+async def akeyset_page(queryset, position, page_size):
+    """Async `keyset_page`, reading the rows with `aiterator()`."""
+    rows = [row async for row in _keyset_queryset(queryset, position, page_size).aiterator()]
+    return rows[:page_size], len(rows) > page_size
@@ -0,0 +1,253 @@
+"""Recurring transactions.
+
+A `RecurringRule` describes an RRULE-like schedule (`FREQ`, `INTERVAL`,
+`DTSTART`, `UNTIL`, `COUNT`). Occurrence `n` is computed directly from
+`dtstart` and `n`, never from the previous occurrence, so monthly rules
+starting on the 31st come back to the 31st after a short month.
+
+`materialize_due` creates the transactions of every rule whose `next_date`
+has been reached, for all users at once:
+
+- one query on the partial `next_date` index finds the due rules;
+- rules are processed in batches; each batch re-reads its rules (locked
+  with `SELECT ... FOR UPDATE SKIP LOCKED` where supported), converts
+  every missing occurrence up to the run date to its owner's base currency
+  with one `currency.convert` call, inserts them, advances the rules and
+  applies the monthly rollup deltas in bulk, all in one database transaction.
+
+Like the CSV importer, occurrences are inserted with one parameterized
+`executemany` rather than `bulk_create` (and rules advanced the same way
+rather than with `bulk_update`, whose per-row `CASE` SQLite evaluates in
+quadratic time): building and compiling a model instance per row cost
+far more than the database work.
+
+Users end a rule (`end_rule`) or delete it from the recurring page; the
+transactions it created are kept either way.
+
+Because `next_date` only moves forward in the same transaction as the
+inserts, running the scheduler again is a no-op, and a run after downtime
+catches up on every occurrence that was missed. The unique
+`(recurring_rule, date)` constraint on Transaction rejects duplicates if two
+runs ever overlap; the losing batch is rolled back and left to the next run.
+"""
+
+import calendar
+import datetime
+from collections import defaultdict
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import currency, duplicates, rollups, suggest
+from .cache import bump_user_version
+from .fields import to_cents
+from .models import RecurringRule, Transaction
+
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Columns read from each due rule
+RULE_FIELDS = (
+    'id', 'user_id', 'amount', 'currency', 'category_id', 'description',
+    'frequency', 'interval', 'dtstart', 'until', 'count', 'occurrences',
+)
+# Column order of the rows built by `_materialize_batch`
+INSERT_FIELDS = (
+    'user', 'added_on', 'updated_at', 'amount', 'currency', 'base_amount', 'category', 'date', 'description', 'recurring_rule',
+    'fingerprint', 'possible_duplicate',
+)
+# Unique constraint rejecting an occurrence that an overlapping run created
+RULE_DATE_CONSTRAINT = 'txn_rule_date_uniq'
+
+
+@dataclass
+class MaterializeResult:
+    """Outcome of a scheduler run.
+
+    - rules: number of due rules processed
+    - created: number of transactions inserted
+    - finished: number of rules exhausted by this run
+    - skipped: number of rules left for the next run (concurrent run)
+    """
+    rules: int = 0
+    created: int = 0
+    finished: int = 0
+    skipped: int = 0
+
+
+def _add_months(date, months):
+    months += date.month - 1
+    year, month = date.year + months // 12, months % 12 + 1
+    return date.replace(year=year, month=month, day=min(date.day, calendar.monthrange(year, month)[1]))
+
+
+def occurrence_date(rule, index):
+    """Return the date of occurrence `index` (0 = `dtstart`) of `rule`.
+
+    Returns None when the rule has no such occurrence (`count`/`until`
+    reached, or the date would be out of range).
+    """
+    if rule.count is not None and index >= rule.count:
+        return None
+    step = rule.interval * index
+    try:
+        if rule.frequency == 'daily':
+            date = rule.dtstart + datetime.timedelta(days=step)
+        elif rule.frequency == 'weekly':
+            date = rule.dtstart + datetime.timedelta(weeks=step)
+        elif rule.frequency == 'monthly':
+            date = _add_months(rule.dtstart, step)
+        else:
+            date = _add_months(rule.dtstart, 12 * step)
+    except (OverflowError, ValueError):
+        return None
+    if rule.until is not None and date > rule.until:
+        return None
+    return date
+
+
+def next_date(rule):
+    """Return the date of the first occurrence not materialized yet."""
+    return occurrence_date(rule, rule.occurrences)
+
+
+def pending_dates(rule, through):
+    """Return the dates of the missing occurrences up to `through` (inclusive).
+
+    `rule` may be a `RecurringRule` or any object with the same attributes.
+    """
+    dates = []
+    date = next_date(rule)
+    while date is not None and date <= through:
+        dates.append(date)
+        date = occurrence_date(rule, rule.occurrences + len(dates))
+    return dates
+
+
+def start_rule(instance, frequency, count=None, until=None):
+    """Create a rule repeating the unsaved Transaction `instance` every `frequency`.
+
+    `instance` becomes the first occurrence; the scheduler materializes the
+    following ones. `count` (occurrences in total, this one included) and
+    `until` (last date) optionally end the schedule.
+    """
+    rule = RecurringRule.objects.create(
+        user_id=instance.user_id, amount=instance.amount, currency=instance.currency, category_id=instance.category_id,
+        description=instance.description, frequency=frequency, dtstart=instance.date, count=count, until=until,
+        occurrences=1,
+    )
+    instance.recurring_rule = rule
+    return rule
+
+
+def end_rule(user_id, rule_id):
+    """Stop `user_id`'s rule `rule_id` after the occurrences materialized so far.
+
+    One UPDATE, so a concurrent scheduler run either materializes its batch
+    first or finds the rule exhausted. Returns False if the user has no
+    such rule.
+    """
+    return RecurringRule.objects.filter(pk=rule_id, user_id=user_id).update(
+        count=F('occurrences'), next_date=None,
+    ) > 0
+
+
+def _insert_sql():
+    """Return the parameterized INSERT used for materialized occurrences."""
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(Transaction._meta.get_field(name).column) for name in INSERT_FIELDS)
+    placeholders = ', '.join(['%s'] * len(INSERT_FIELDS))
+    return f"INSERT INTO {quote(Transaction._meta.db_table)} ({columns}) VALUES ({placeholders})"
+
+
+def _advance_sql():
+    """Return the parameterized UPDATE advancing one rule."""
+    quote = connection.ops.quote_name
+    return f"UPDATE {quote(RecurringRule._meta.db_table)} SET occurrences = %s, next_date = %s WHERE id = %s"
+
+
+def _materialize_batch(ids, today):
+    """Materialize one batch of rules; returns `(rules, created, finished)`."""
+    rules = RecurringRule.objects.filter(pk__in=ids, next_date__lte=today).values_list(*RULE_FIELDS, named=True)
+    if connection.features.has_select_for_update_skip_locked:
+        rules = rules.select_for_update(skip_locked=True)
+    ops = connection.ops
+    added_on = ops.adapt_datetimefield_value(timezone.now())
+    occurrences, advanced, users, finished = [], [], set(), 0
+    for rule in rules:
+        dates = pending_dates(rule, today)
+        occurrences.extend((rule, date) for date in dates)
+        count = rule.occurrences + len(dates)
+        following = occurrence_date(rule, count)
+        if following is None:
+            finished += 1
+        advanced.append((count, ops.adapt_datefield_value(following), rule.id))
+        users.add(rule.user_id)
+
+    # Raw inserts send no signals: base amounts, fingerprints, rollups and caches by hand.
+    # Occurrences are expected repeats, so they are never flagged as duplicates.
+    fingerprints = {
+        rule.id: duplicates.fingerprint(rule.user_id, rule.amount, rule.currency, rule.description)
+        for rule, _date in occurrences
+    }
+    bases = currency.base_currencies(users)
+    cents = [to_cents(rule.amount) for rule, _date in occurrences]
+    base_cents = currency.convert(
+        cents,
+        [rule.currency for rule, _date in occurrences],
+        [date for _rule, date in occurrences],
+        [bases[rule.user_id] for rule, _date in occurrences],
+    )
+    rows, deltas = [], defaultdict(lambda: [0, 0])
+    for (rule, date), amount, base_amount in zip(occurrences, cents, base_cents):
+        rows.append((rule.user_id, added_on, added_on, amount, rule.currency, base_amount, rule.category_id,
+                     ops.adapt_datefield_value(date), rule.description, rule.id, fingerprints[rule.id], False))
+        bucket = deltas[(rule.user_id, date.replace(day=1), rule.category_id)]
+        bucket[0] += base_amount
+        bucket[1] += 1
+    with connection.cursor() as cursor:
+        cursor.executemany(_insert_sql(), rows)
+        cursor.executemany(_advance_sql(), advanced)
+    rollups.apply_deltas({key: (Decimal(amount).scaleb(-2), count) for key, (amount, count) in deltas.items()})
+    for user_id in users:
+        bump_user_version(user_id)
+        suggest.discard(user_id)
+    return len(advanced), len(rows), finished
+
+
+def _is_occurrence_clash(exc):
+    """Whether `exc` is the `(recurring_rule, date)` violation of an overlapping run."""
+    message = str(exc)
+    # PostgreSQL and MySQL name the constraint, SQLite lists its columns
+    column = Transaction._meta.get_field('recurring_rule').column
+    return RULE_DATE_CONSTRAINT in message or f"{Transaction._meta.db_table}.{column}" in message
+
+
+def materialize_due(today=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Create the missing occurrences of every due rule up to `today`.
+
+    Returns a `MaterializeResult`.
+    """
+    today = today or timezone.localdate()
+    result = MaterializeResult()
+    due = list(
+        RecurringRule.objects.filter(next_date__lte=today).order_by().values_list('pk', flat=True)
+    )
+    for start in range(0, len(due), batch_size):
+        batch = due[start:start + batch_size]
+        try:
+            with transaction.atomic():
+                rules, created, finished = _materialize_batch(batch, today)
+        except IntegrityError as exc:
+            if not _is_occurrence_clash(exc):
+                raise
+            # Another run materialized some of these occurrences first
+            result.skipped += len(batch)
+            continue
+        result.rules += rules
+        result.created += created
+        result.finished += finished
+    return result
@@ -0,0 +1,288 @@
+"""Maintenance and queries for the `MonthlyRollup` table.
+
+`MonthlyRollup` keeps one row per (user, month, category) with the sum (in
+the user's base currency, i.e. of `base_amount`) and count of the matching
+transactions. Rows are updated incrementally from the
+Transaction signals (`apply_delta`) or in bulk by batch writers
+(`apply_deltas`), rebuilt in batches by the `rebuild_rollups` management
+command, and read by `month_range_totals` to answer summary totals for
+whole-month ranges without touching raw rows. The buckets double as the
+spending counters of category budgets: incremental updates check the
+budget thresholds (see `budgets.py`).
+"""
+
+import calendar
+import datetime
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Sum, Value
+from django.db.models.constants import OnConflict
+from django.db.models.functions import TruncMonth
+
+from . import budgets
+from .cache import get_categories
+from .fields import CentsField, to_cents
+from .models import MonthlyRollup, Transaction
+
+
+_amount_field = Transaction._meta.get_field('amount')
+
+
+def _as_date(value):
+    """Accept a date or an ISO string (as assigned by some callers)."""
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value)
+    return value
+
+
+def _category_type(category_id):
+    for category in get_categories():
+        if category.pk == category_id:
+            return category.type
+    return None
+
+
+def apply_delta(user_id, date, category_id, amount, count):
+    """Add `amount`/`count` (which may be negative) to one rollup bucket.
+
+    Added transactions go through one upsert (`_upsert`), which creates the
+    bucket on first use; other changes use an `F()` update. Either way
+    concurrent writers do not lose increments. `amount` is in units of the
+    user's base currency.
+    Added spending is checked against the user's budget for the category.
+    """
+    month = _as_date(date).replace(day=1)
+    _update_bucket(user_id, month, category_id, amount, count)
+    if amount > 0:
+        budgets.check_thresholds({(user_id, month, category_id): amount})
+
+
+def _update_bucket(user_id, month, category_id, amount, count):
+    if count > 0 and connection.features.supports_update_conflicts_with_target:
+        _upsert([(user_id, month, category_id, amount, count)])
+        return
+    bucket = MonthlyRollup.objects.filter(user_id=user_id, month=month, category_id=category_id)
+    delta = Value(amount, output_field=CentsField())
+    if bucket.update(total=F('total') + delta, count=F('count') + count):
+        if count < 0:
+            # Drop buckets that no longer summarize any transaction
+            bucket.filter(count__lte=0).delete()
+        return
+    if count <= 0:
+        # Nothing to subtract from (e.g. the rollup was removed by a cascade)
+        return
+    try:
+        with transaction.atomic():
+            MonthlyRollup.objects.create(
+                user_id=user_id, month=month, category_id=category_id,
+                type=_category_type(category_id) or 'expense', total=amount, count=count,
+            )
+    except IntegrityError:
+        # Another writer created the bucket first
+        bucket.update(total=F('total') + delta, count=F('count') + count)
+
+
+def _upsert(rows):
+    """Add `(user_id, month, category_id, amount, count)` rows to their buckets in one statement.
+
+    `INSERT ... ON CONFLICT DO UPDATE` creates missing buckets and
+    increments existing ones in place, so concurrent writers never lose
+    increments. Needs `supports_update_conflicts_with_target` (SQLite,
+    PostgreSQL).
+    """
+    ops = connection.ops
+    quote = ops.quote_name
+    table = quote(MonthlyRollup._meta.db_table)
+    types = {category.pk: category.type for category in get_categories()}
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {table} (user_id, month, category_id, type, total, count) VALUES (%s, %s, %s, %s, %s, %s) "
+            f"ON CONFLICT (user_id, month, category_id) DO UPDATE SET "
+            f"total = {table}.total + EXCLUDED.total, count = {table}.count + EXCLUDED.count",
+            [
+                (user_id, ops.adapt_datefield_value(month), category_id, types.get(category_id, 'expense'),
+                 to_cents(amount), count)
+                for user_id, month, category_id, amount, count in rows
+            ],
+        )
+
+
+def apply_deltas(deltas):
+    """Apply many bucket deltas at once.
+
+    `deltas` maps `(user_id, month, category_id)` to `(amount, count)`, with
+    `month` the first day of the month and `amount` in base currency units.
+    The batch counterpart of `apply_delta`, for writers that bypass the
+    signals: every bucket is created or incremented in place with one
+    `executemany` upsert (`_upsert`), or, on backends without it, created
+    empty with an INSERT that ignores existing rows and then incremented
+    with an UPDATE, so concurrent writers still never lose increments.
+    """
+    if not deltas:
+        return
+    if connection.features.supports_update_conflicts_with_target:
+        _upsert([key + value for key, value in deltas.items()])
+    else:
+        _insert_then_update(deltas)
+    if any(count < 0 for _amount, count in deltas.values()):
+        MonthlyRollup.objects.filter(user_id__in={key[0] for key in deltas}, count__lte=0).delete()
+    budgets.check_thresholds({key: amount for key, (amount, _count) in deltas.items()})
+
+
+def _insert_then_update(deltas):
+    ops = connection.ops
+    quote = ops.quote_name
+    table = quote(MonthlyRollup._meta.db_table)
+    types = {category.pk: category.type for category in get_categories()}
+    keys = [(user_id, ops.adapt_datefield_value(month), category_id) for user_id, month, category_id in deltas]
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"{ops.insert_statement(on_conflict=OnConflict.IGNORE)} {table} "
+            f"(user_id, month, category_id, type, total, count) VALUES (%s, %s, %s, %s, 0, 0) "
+            f"{ops.on_conflict_suffix_sql([], OnConflict.IGNORE, None, None)}",
+            [key + (types.get(key[2], 'expense'),) for key in keys],
+        )
+        cursor.executemany(
+            f"UPDATE {table} SET total = total + %s, count = count + %s "
+            f"WHERE user_id = %s AND month = %s AND category_id = %s",
+            [(to_cents(amount), count) + key for key, (amount, count) in zip(keys, deltas.values())],
+        )
+
+
+def record_change(previous, current):
+    """Move a transaction's contribution from `previous` to `current`.
+
+    Both arguments are `(user_id, date, category_id, amount)` tuples or None
+    (for creation and deletion respectively). An edit that stays in the same
+    bucket applies the difference as a single delta.
+    """
+    if previous == current:
+        return
+    if previous is not None and current is not None and _bucket(previous) == _bucket(current):
+        user_id, date, category_id, amount = current
+        apply_delta(user_id, date, category_id, amount - previous[3], 0)
+        return
+    if previous is not None:
+        user_id, date, category_id, amount = previous
+        apply_delta(user_id, date, category_id, -amount, -1)
+    if current is not None:
+        user_id, date, category_id, amount = current
+        apply_delta(user_id, date, category_id, amount, 1)
+
+
+def _bucket(key):
+    user_id, date, category_id, _amount = key
+    return user_id, _as_date(date).replace(day=1), category_id
+
+
+def rollup_key(instance):
+    """Return the rollup-relevant values of a Transaction instance (amount in base currency)."""
+    return (
+        instance.user_id, _as_date(instance.date), instance.category_id, _amount_field.to_python(instance.base_amount),
+    )
+
+
+def rebuild_rollups(batch_size=500, user_ids=None):
+    """Recompute rollup rows from the raw Transaction table.
+
+    Every user's rows by default, or only those of `user_ids`. Users are
+    processed `batch_size` at a time; each batch replaces its users' rows
+    with one grouped aggregate query and a `bulk_create`, inside its own
+    transaction, so readers never see a half-built table.
+    Returns the number of rollup rows written.
+    """
+    if user_ids is None:
+        user_ids = list(
+            Transaction.objects.order_by('user_id').values_list('user_id', flat=True).distinct()
+        )
+        # Users without any transaction left keep no rollups
+        MonthlyRollup.objects.filter(
+            ~Exists(Transaction.objects.filter(user_id=OuterRef('user_id')))
+        ).delete()
+    written = 0
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        rows = (
+            Transaction.objects.filter(user_id__in=batch)
+            .order_by()
+            .annotate(month=TruncMonth('date'))
+            .values('user_id', 'month', 'category_id', 'category__type')
+            .annotate(total=Sum('base_amount'), count=Count('id'))
+        )
+        with transaction.atomic():
+            MonthlyRollup.objects.filter(user_id__in=batch).delete()
+            created = MonthlyRollup.objects.bulk_create(
+                MonthlyRollup(
+                    user_id=row['user_id'], month=row['month'], category_id=row['category_id'],
+                    type=row['category__type'], total=row['total'], count=row['count'],
+                )
+                for row in rows
+            )
+        written += len(created)
+    return written
+
+
+def whole_month_bounds(start, end):
+    """Return `(first_month, last_month)` if `start`/`end` cover whole months.
+
+    Either bound may be None (open range). Returns None when a bound cuts a
+    month in half, in which case raw rows have to be aggregated instead.
+    """
+    if start is not None:
+        start = _as_date(start)
+        if start.day != 1:
+            return None
+    if end is not None:
+        end = _as_date(end)
+        if end.day != calendar.monthrange(end.year, end.month)[1]:
+            return None
+        end = end.replace(day=1)
+    return start, end
+
+
+def _month_range_queryset(user, start=None, end=None, category_id=None):
+    """Return the rollups covering `start`..`end`, or None if not answerable."""
+    try:
+        bounds = whole_month_bounds(start, end)
+    except ValueError:
+        return None
+    if bounds is None:
+        return None
+    first, last = bounds
+    qs = MonthlyRollup.objects.filter(user=user)
+    if first is not None:
+        qs = qs.filter(month__gte=first)
+    if last is not None:
+        qs = qs.filter(month__lte=last)
+    if category_id is not None:
+        qs = qs.filter(category_id=category_id)
+    return qs
+
+
+def _totals_aggregates():
+    return {
+        'income': Sum('total', filter=Q(type='income'), default=0),
+        'expense': Sum('total', filter=Q(type='expense'), default=0),
+    }
+
+
+def month_range_totals(user, start=None, end=None, category_id=None):
+    """Return `(income, expense)` from rollups, or None if not answerable.
+
+    `start`/`end` are dates or ISO strings; the range must cover whole
+    months (see `whole_month_bounds`).
+    """
+    qs = _month_range_queryset(user, start, end, category_id)
+    if qs is None:
+        return None
+    totals = qs.aggregate(**_totals_aggregates())
+    return totals['income'], totals['expense']
+
+
+async def amonth_range_totals(user, start=None, end=None, category_id=None):
+    """Async `month_range_totals`."""
+    qs = _month_range_queryset(user, start, end, category_id)
+    if qs is None:
+        return None
+    totals = await qs.aaggregate(**_totals_aggregates())
+    return totals['income'], totals['expense']
@@ -0,0 +1,178 @@
+"""Full-text search over `Transaction.description`.
+
+SQLite
+------
+A contentless FTS5 table (`transaction_search`, mapped by the unmanaged
+`TransactionSearch` model) indexes every description together with an
+`owner` token (`u<user id>`). Queries always include the owner token, so the
+index only walks the searching user's postings instead of every user's
+matches. Triggers on the Transaction table keep the index in step with every
+write path, including `bulk_create`, `update()` and the raw CSV importer.
+The triggers are (re)installed after every `migrate` because SQLite table
+rebuilds in later migrations drop them.
+
+PostgreSQL
+----------
+A GIN index on `to_tsvector('simple', description)` (created by migration
+0007) serves `@@` matches; results are ranked with `ts_rank`.
+
+Other backends fall back to `icontains` per term, unranked.
+
+On every backend the last term of the query is matched as a prefix, so
+results follow the text as the user types.
+
+`search_transactions` only filters (on SQLite through `id IN (SELECT rowid
+... MATCH ...)`, which the planner evaluates once from the index side, so
+counts and aggregates stay cheap); `search_page` returns a page ordered by
+relevance.
+"""
+
+import re
+
+from django.db import connection, connections
+from django.db.models import BooleanField, FloatField, Lookup, Q
+from django.db.models.expressions import RawSQL
+
+from .models import Transaction, TransactionSearch
+from .pagination import ORDERING
+
+
+SEARCH_TABLE = "transaction_search"
+MAX_TERMS = 8
+
+_TERM_RE = re.compile(r"[^\W_]+")
+
+
+class FullTextMatch(Lookup):
+    """`<fts table> MATCH <query>` for the FTS5 table behind a joined model."""
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        rhs, params = self.process_rhs(compiler, connection)
+        alias = compiler.quote_name_unless_alias(self.lhs.alias)
+        return f"{alias}.{connection.ops.quote_name(SEARCH_TABLE)} MATCH {rhs}", params
+
+
+TransactionSearch._meta.get_field("description").register_lookup(FullTextMatch)
+
+
+def search_terms(query):
+    """Split user input into at most `MAX_TERMS` lowercase word terms."""
+    return _TERM_RE.findall(query.lower())[:MAX_TERMS]
+
+
+def _fts5_query(terms, user_id):
+    phrases = [f'"{term}"' for term in terms]
+    phrases[-1] += "*"
+    expression = f"description : ({' '.join(phrases)})"
+    if user_id is not None:
+        expression = f"owner : u{user_id} AND {expression}"
+    return expression
+
+
+def _tsquery(terms):
+    return " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+
+
+def _document():
+    return f"to_tsvector('simple', \"{Transaction._meta.db_table}\".\"description\")"
+
+
+def search_transactions(queryset, query, user_id=None):
+    """Filter a Transaction queryset to rows matching `query`.
+
+    Pass the owner's `user_id` whenever the queryset is per user; on SQLite
+    it limits the index scan to that user's rows. A query without any word
+    returns the queryset unchanged.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset
+    vendor = connection.vendor
+    if vendor == "sqlite":
+        matches = TransactionSearch.objects.filter(description__match=_fts5_query(terms, user_id))
+        return queryset.filter(id__in=matches.values("transaction_id"))
+    if vendor == "postgresql":
+        return queryset.filter(
+            RawSQL(f"{_document()} @@ to_tsquery('simple', %s)", (_tsquery(terms),), output_field=BooleanField()),
+        )
+    condition = Q()
+    for term in terms:
+        condition &= Q(description__icontains=term)
+    return queryset.filter(condition)
+
+
+def search_page(queryset, query, user_id, offset, page_size):
+    """Return `(rows, has_next)` for one page of results ordered by relevance.
+
+    `queryset` must already be filtered by `search_transactions` with the
+    same query. Ties are broken by the list ordering (newest first).
+
+    On SQLite the FTS5 rank is only available while the FTS table is being
+    queried, and joining it to Transaction invites plans that re-run the
+    MATCH for every candidate row. So the user's ranks are read from the
+    index alone, the filtered ids are ordered in Python and only the page's
+    rows are fetched: three index-driven queries whatever the filters.
+    PostgreSQL orders by `ts_rank` in a single query.
+    """
+    terms = search_terms(query)
+    vendor = connection.vendor
+    if terms and vendor == "sqlite":
+        ranks = dict(
+            TransactionSearch.objects.filter(description__match=_fts5_query(terms, user_id))
+            .values_list("transaction_id", "rank")
+        )
+        candidates = sorted(
+            queryset.order_by().values_list("id", "date"),
+            key=lambda row: (ranks.get(row[0], 0.0), -row[1].toordinal(), -row[0]),
+        )
+        page_ids = [pk for pk, _date in candidates[offset:offset + page_size + 1]]
+        by_id = queryset.in_bulk(page_ids)
+        rows = [by_id[pk] for pk in page_ids if pk in by_id]
+        return rows[:page_size], len(rows) > page_size
+
+    if terms and vendor == "postgresql":
+        queryset = queryset.annotate(
+            search_rank=RawSQL(f"ts_rank({_document()}, to_tsquery('simple', %s))", (_tsquery(terms),), output_field=FloatField()),
+        ).order_by("-search_rank", *ORDERING)
+    else:
+        queryset = queryset.order_by(*ORDERING)
+    rows = list(queryset[offset:offset + page_size + 1])
+    return rows[:page_size], len(rows) > page_size
+
+
+def sqlite_trigger_sql(table):
+    """Return the statements creating the FTS5 sync triggers on `table`."""
+    owner_new = "'u' || new.user_id"
+    owner_old = "'u' || old.user_id"
+    delete_old = (
+        f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, description, owner) "
+        f"VALUES ('delete', old.id, old.description, {owner_old});"
+    )
+    insert_new = (
+        f"INSERT INTO {SEARCH_TABLE}(rowid, description, owner) "
+        f"VALUES (new.id, new.description, {owner_new});"
+    )
+    return [
+        f'CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ai AFTER INSERT ON "{table}" '
+        f"BEGIN {insert_new} END",
+        f'CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ad AFTER DELETE ON "{table}" '
+        f"BEGIN {delete_old} END",
+        f'CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_au AFTER UPDATE OF description, user_id ON "{table}" '
+        f"BEGIN {delete_old} {insert_new} END",
+    ]
+
+
+def install_sqlite_triggers(using="default", **kwargs):
+    """Create the FTS5 sync triggers if the search table exists.
+
+    Connected to `post_migrate`; accepts its keyword arguments.
+    """
+    conn = connections[using]
+    if conn.vendor != "sqlite":
+        return
+    with conn.cursor() as cursor:
+        if SEARCH_TABLE not in conn.introspection.table_names(cursor):
+            return
+        for statement in sqlite_trigger_sql(Transaction._meta.db_table):
+            cursor.execute(statement)
@@ -0,0 +1,109 @@
+"""Serializers for the transaction API.
+
+`TransactionSerializer` supports sparse fieldsets: pass `fields=[...]` to
+keep only those keys in the output. `FIELD_SOURCES` maps every public field
+to the model fields it reads so the API view can restrict the SQL with
+`.only()` to match.
+
+`SyncUploadSerializer` validates the offline edits uploaded to the sync
+endpoint (see `sync.py`) with the same rules as `TransactionForm`.
+"""
+
+from django.conf import settings
+from rest_framework import serializers
+
+from .cache import get_categories
+from .currency import convertible
+from .form import validate_amount, validate_category_type, validate_date
+from .models import Transaction
+
+
+# Public field name -> model fields needed to render it
+FIELD_SOURCES = {
+    "id": ("id",),
+    "date": ("date",),
+    "amount": ("amount",),
+    "currency": ("currency",),
+    "base_amount": ("base_amount",),
+    "category": ("category",),
+    "category_name": ("category__name",),
+    "type": ("category__type",),
+    "description": ("description",),
+    "image": ("image",),
+    "thumbnail": ("thumbnail",),
+    "added_on": ("added_on",),
+    "updated_at": ("updated_at",),
+    "client_id": ("client_id",),
+    "possible_duplicate": ("possible_duplicate",),
+}
+
+
+class TransactionSerializer(serializers.ModelSerializer):
+    """Read-only representation of a Transaction."""
+    category_name = serializers.CharField(source="category.name", read_only=True)
+    type = serializers.CharField(source="category.type", read_only=True)
+    amount = serializers.DecimalField(max_digits=17, decimal_places=2, read_only=True)
+    base_amount = serializers.DecimalField(max_digits=17, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = Transaction
+        fields = list(FIELD_SOURCES)
+        read_only_fields = fields
+
+    def __init__(self, *args, fields=None, **kwargs):
+        """Accept an optional iterable of field names to keep (sparse fieldset)."""
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class SyncUpsertSerializer(serializers.Serializer):
+    """One created (`client_id`) or edited (`id`) transaction of an upload.
+
+    `updated_at` is when the change was made on the client; `currency`
+    defaults to the user's base currency (`context["base_currency"]`).
+    """
+    id = serializers.IntegerField(required=False, min_value=1)
+    client_id = serializers.UUIDField(required=False)
+    amount = serializers.DecimalField(max_digits=17, decimal_places=2, validators=[validate_amount])
+    currency = serializers.CharField(max_length=3, required=False)
+    category = serializers.IntegerField()
+    date = serializers.DateField(validators=[validate_date])
+    description = serializers.CharField(allow_blank=True, trim_whitespace=False)
+    type = serializers.ChoiceField(choices=("income", "expense"), required=False)
+    updated_at = serializers.DateTimeField()
+
+    def validate_currency(self, value):
+        value = value.upper()
+        base = self.context.get("base_currency") or settings.BASE_CURRENCY
+        if value not in convertible(base):
+            raise serializers.ValidationError(f"No exchange rates to convert {value} to {base}.")
+        return value
+
+    def validate(self, attrs):
+        if attrs.get("id") is None and attrs.get("client_id") is None:
+            raise serializers.ValidationError("Give the id of an edited transaction or the client_id of a new one.")
+        types = {category.pk: category.type for category in get_categories()}
+        if attrs["category"] not in types:
+            raise serializers.ValidationError({"category": "Unknown category."})
+        validate_category_type(attrs.pop("type", None), types[attrs["category"]])
+        attrs.setdefault("currency", self.context.get("base_currency") or settings.BASE_CURRENCY)
+        return attrs
+
+
+class SyncDeleteSerializer(serializers.Serializer):
+    """One transaction deleted on the client at `deleted_at`."""
+    id = serializers.IntegerField(min_value=1)
+    deleted_at = serializers.DateTimeField()
+
+
+class SyncUploadSerializer(serializers.Serializer):
+    """A batch of offline edits: `{"upserts": [...], "deletes": [...]}`."""
+    upserts = SyncUpsertSerializer(many=True, required=False, default=list)
+    deletes = SyncDeleteSerializer(many=True, required=False, default=list)
+
+    def validate(self, attrs):
+        if len(attrs["upserts"]) + len(attrs["deletes"]) > settings.SYNC_MAX_UPLOAD:
+            raise serializers.ValidationError(f"Upload at most {settings.SYNC_MAX_UPLOAD} changes at a time.")
+        return attrs
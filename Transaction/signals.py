@@ -0,0 +1,126 @@
+"""Signal receivers for the Transaction app.
+
+Connected from `TransactionConfig.ready`. Receivers are kept small and only
+keep derived data (caches, rollups) in step with the source tables.
+"""
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from Users.models import Profile
+
+from . import currency, duplicates, recurring, rollups, suggest
+from .cache import bump_user_version, invalidate_categories
+from .models import Budget, Category, ExchangeRate, MonthlyRollup, RecurringRule, Transaction, TransactionTombstone
+
+
+@receiver(post_save, sender=Category, dispatch_uid="category_cache_on_save")
+@receiver(post_delete, sender=Category, dispatch_uid="category_cache_on_delete")
+def category_changed(sender, **kwargs):
+    """Clear the category cache whenever a Category is saved or deleted."""
+    invalidate_categories()
+
+
+@receiver(post_save, sender=Category, dispatch_uid="category_rollup_type")
+def category_type_changed(sender, instance, created, **kwargs):
+    """Keep the denormalized `MonthlyRollup.type` in step with the category."""
+    if not created:
+        MonthlyRollup.objects.filter(category=instance).exclude(type=instance.type).update(type=instance.type)
+
+
+@receiver(pre_save, sender=Transaction, dispatch_uid="transaction_rollup_snapshot")
+def transaction_snapshot(sender, instance, raw=False, **kwargs):
+    """Remember the stored values of an edited transaction before it is saved."""
+    instance._rollup_previous = None
+    instance._suggest_previous = None
+    if raw or instance.pk is None:
+        return
+    previous = (
+        Transaction.objects.filter(pk=instance.pk)
+        .values_list('user_id', 'date', 'category_id', 'base_amount', 'description')
+        .first()
+    )
+    if previous is not None:
+        user_id, date, category_id, amount, description = previous
+        instance._rollup_previous = (user_id, date, category_id, amount)
+        instance._suggest_previous = (category_id, description)
+
+
+@receiver(pre_save, sender=Transaction, dispatch_uid="transaction_base_amount")
+def transaction_base_amount(sender, instance, raw=False, **kwargs):
+    """Derive `base_amount` from the amount, currency and date (see `currency.py`)."""
+    if raw:
+        return
+    instance.base_amount = currency.convert_amount(
+        instance.amount, instance.currency, instance.date, currency.base_currency(instance.user_id),
+    )
+
+
+@receiver(pre_save, sender=Transaction, dispatch_uid="transaction_fingerprint")
+def transaction_fingerprint(sender, instance, raw=False, **kwargs):
+    """Derive the duplicate detection `fingerprint` (see `duplicates.py`)."""
+    if raw:
+        return
+    instance.fingerprint = duplicates.fingerprint(
+        instance.user_id, instance.amount, instance.currency, instance.description,
+    )
+
+
+@receiver(post_save, sender=Transaction, dispatch_uid="transaction_rollup_on_save")
+def transaction_saved(sender, instance, raw=False, **kwargs):
+    """Update monthly rollups and the category suggestions; invalidate the owner's cached list data."""
+    if raw:
+        return
+    rollups.record_change(getattr(instance, '_rollup_previous', None), rollups.rollup_key(instance))
+    suggest.learn(
+        instance.user_id, getattr(instance, '_suggest_previous', None), (instance.category_id, instance.description),
+    )
+    bump_user_version(instance.user_id)
+
+
+@receiver(post_delete, sender=Transaction, dispatch_uid="transaction_rollup_on_delete")
+def transaction_deleted(sender, instance, **kwargs):
+    """Remove the transaction from its rollup bucket and the owner's caches; leave a sync tombstone."""
+    rollups.record_change(rollups.rollup_key(instance), None)
+    suggest.learn(instance.user_id, (instance.category_id, instance.description), None)
+    TransactionTombstone.objects.create(user_id=instance.user_id, transaction_id=instance.pk, deleted_at=timezone.now())
+    bump_user_version(instance.user_id)
+
+
+@receiver(pre_save, sender=RecurringRule, dispatch_uid="recurring_rule_next_date")
+def recurring_rule_scheduled(sender, instance, raw=False, **kwargs):
+    """Derive `next_date` from the rule's schedule and materialized count."""
+    instance.next_date = recurring.next_date(instance)
+
+
+@receiver(post_save, sender=Budget, dispatch_uid="budget_cache_on_save")
+@receiver(post_delete, sender=Budget, dispatch_uid="budget_cache_on_delete")
+def budget_changed(sender, instance, **kwargs):
+    """Invalidate the owner's cached budget status."""
+    bump_user_version(instance.user_id)
+
+
+@receiver(post_save, sender=ExchangeRate, dispatch_uid="exchange_rate_on_save")
+@receiver(post_delete, sender=ExchangeRate, dispatch_uid="exchange_rate_on_delete")
+def exchange_rate_changed(sender, **kwargs):
+    """Drop the in-memory rate tables (stored amounts are reconverted by `load_fx_rates`)."""
+    currency.invalidate_rates()
+
+
+@receiver(pre_save, sender=Profile, dispatch_uid="profile_base_currency_snapshot")
+def profile_snapshot(sender, instance, raw=False, **kwargs):
+    """Remember the stored base currency of an edited profile."""
+    instance._previous_base_currency = (
+        Profile.objects.filter(user_id=instance.user_id).values_list('base_currency', flat=True).first()
+        or settings.BASE_CURRENCY
+    )
+
+
+@receiver(post_save, sender=Profile, dispatch_uid="profile_base_currency_changed")
+def profile_saved(sender, instance, raw=False, **kwargs):
+    """Reconvert the user's transactions when their base currency changes."""
+    if raw or instance.base_currency == getattr(instance, '_previous_base_currency', None):
+        return
+    currency.reconvert([instance.user_id])
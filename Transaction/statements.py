@@ -0,0 +1,360 @@
+"""Monthly statements as streamed HTML or PDF documents.
+
+A statement lists one user's transactions of one calendar month, page by
+page, after a summary of per-category subtotals. It is produced without
+holding the month in memory:
+
+- the subtotals (and so the number of rows and pages) come from a single
+  query on the month's `MonthlyRollup` buckets;
+- rows are read with `values_list(...).iterator(chunk_size=...)` and
+  rendered page by page as they arrive;
+- amounts are in the user's base currency (`base_amount`), like the
+  rollups; foreign currency rows also show their original amount;
+- the document is a generator of chunks for a `StreamingHttpResponse`.
+  PDFs are written by the small `_PdfWriter` below (text only, standard
+  fonts), which only needs the current page in memory.
+
+Statements of closed months are cached on the default media storage under a
+content address. `statement_digest` hashes one aggregate over the month's
+rows (count, newest `updated_at`, amount sums) and the user's newest
+tombstone, plus category names, the base currency and `STATEMENT_VERSION`:
+any create, edit or delete changes it without reading the rows. The stored
+file is reused until then, and simply no longer found afterwards. Other
+versions of the same month and format are deleted once a new one is
+stored. The current month is never cached.
+"""
+
+import hashlib
+import html
+import tempfile
+from datetime import date
+from decimal import Decimal
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db.models import Count, Max, Sum
+
+from .cache import get_categories
+from .currency import base_currency
+from .models import MonthlyRollup, Transaction, TransactionTombstone
+
+
+# Bump when the layout changes, so cached statements are regenerated
+STATEMENT_VERSION = 2
+CACHE_DIR = "statements"
+FORMATS = {"html": "text/html; charset=utf-8", "pdf": "application/pdf"}
+CHUNK_SIZE = 1000
+ROWS_PER_PAGE = 50
+ROW_FIELDS = ("id", "date", "category_id", "amount", "currency", "base_amount", "description")
+
+
+def month_bounds(month):
+    """Return the first day of `month` and of the month after it."""
+    start = month.replace(day=1)
+    following = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start, following
+
+
+def is_closed(month, today):
+    """True when `month` ended before `today`, so its statement may be cached."""
+    return month_bounds(month)[1] <= today
+
+
+def _rows(user, month):
+    start, following = month_bounds(month)
+    return (
+        Transaction.objects.filter(user=user, date__gte=start, date__lt=following)
+        .order_by("date", "id")
+        .values_list(*ROW_FIELDS)
+    )
+
+
+def category_subtotals(user, month):
+    """Return `[(category_id, type, total, count)]` for the month from its rollups."""
+    return list(
+        MonthlyRollup.objects.filter(user=user, month=month.replace(day=1), count__gt=0)
+        .order_by("type", "category_id")
+        .values_list("category_id", "type", "total", "count")
+    )
+
+
+def statement_digest(user, month, statement_format):
+    """Return the content address of a statement: a hash of the state of everything shown on it.
+
+    Two queries whatever the number of rows: an aggregate on the user's
+    date index for the month and the newest tombstone (deletes).
+    """
+    start, following = month_bounds(month)
+    rows = (
+        Transaction.objects.filter(user=user, date__gte=start, date__lt=following)
+        .order_by()
+        .aggregate(count=Count("id"), latest=Max("updated_at"), amount=Sum("amount"), base_amount=Sum("base_amount"))
+    )
+    deleted = (
+        TransactionTombstone.objects.filter(user=user)
+        .order_by("-deleted_at", "-transaction_id")
+        .values_list("deleted_at", "transaction_id")
+        .first()
+    )
+    digest = hashlib.sha256(
+        f"{STATEMENT_VERSION}:{statement_format}:{user.pk}:{month:%Y-%m}:{base_currency(user.pk)}".encode()
+    )
+    for category in get_categories():
+        digest.update(f"|c{category.pk}:{category.name}:{category.type}".encode())
+    latest = rows["latest"].isoformat() if rows["latest"] else ""
+    digest.update(f"|{rows['count']}:{latest}:{rows['amount']}:{rows['base_amount']}|{deleted!r}".encode())
+    return digest.hexdigest()
+
+
+def _cache_prefix(user, month):
+    return f"{CACHE_DIR}/{user.pk}/{month:%Y-%m}"
+
+
+def cached_statement(user, month, statement_format):
+    """Return `(name, exists)` for the storage name of the month's statement."""
+    name = f"{_cache_prefix(user, month)}/{statement_digest(user, month, statement_format)}.{statement_format}"
+    return name, default_storage.exists(name)
+
+
+def _store(name, chunks):
+    """Pass `chunks` through while spooling them, then save them as `name`.
+
+    Nothing is stored if the consumer stops early (client disconnected).
+    Other versions of the statement are deleted after the save, so a
+    concurrent request storing the same digest can't lose its file; the
+    storage gives the second copy another name, and that copy is dropped.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=4 * 1024 * 1024) as spool:
+        for chunk in chunks:
+            yield chunk
+            spool.write(chunk)
+        spool.seek(0)
+        saved = default_storage.save(name, File(spool))
+    if saved != name:
+        default_storage.delete(saved)
+    prefix, filename = name.rsplit("/", 1)
+    digest, extension = filename.rsplit(".", 1)
+    try:
+        _dirs, files = default_storage.listdir(prefix)
+    except FileNotFoundError:
+        files = []
+    for other in files:
+        if other.endswith(f".{extension}") and not other.startswith(digest):
+            default_storage.delete(f"{prefix}/{other}")
+
+
+def _pages(user, month, names, base, page_size):
+    """Yield `(number, rows)` per page; rows are `(date, category, description, amount)`.
+
+    Amounts are in the base currency `base`; the description of a foreign
+    currency row ends with its original amount.
+    """
+    page = []
+    number = 1
+    for _pk, day, category_id, amount, code, base_amount, description in _rows(user, month).iterator(
+        chunk_size=CHUNK_SIZE,
+    ):
+        name, category_type = names.get(category_id, ("", ""))
+        if code != base:
+            description = f"{description} ({amount:.2f} {code})"
+        page.append((day, name, description, base_amount if category_type == "income" else -base_amount))
+        if len(page) == page_size:
+            yield number, page
+            page = []
+            number += 1
+    if page or number == 1:
+        yield number, page
+
+
+def _summary(user, month):
+    names = {category.pk: (category.name, category.type) for category in get_categories()}
+    subtotals = [
+        (names.get(category_id, ("", ""))[0], category_type, total, count)
+        for category_id, category_type, total, count in category_subtotals(user, month)
+    ]
+    income = sum((total for _name, kind, total, _count in subtotals if kind == "income"), Decimal(0))
+    expense = sum((total for _name, kind, total, _count in subtotals if kind == "expense"), Decimal(0))
+    rows = sum(count for *_rest, count in subtotals)
+    return names, subtotals, income, expense, max(1, -(-rows // ROWS_PER_PAGE))
+
+
+def generate_statement(user, month, statement_format):
+    """Return an iterator of byte chunks with the month's statement."""
+    names, subtotals, income, expense, page_count = _summary(user, month)
+    base = base_currency(user.pk)
+    pages = _pages(user, month, names, base, ROWS_PER_PAGE)
+    render = _html_statement if statement_format == "html" else _pdf_statement
+    title = f"Statement {month:%B %Y} - {user.get_username()} ({base})"
+    return render(title, subtotals, income, expense, pages, page_count)
+
+
+def statement_chunks(user, month, statement_format, today):
+    """Return `(chunks, cached_name)` for the statement, using the cache when possible.
+
+    `cached_name` is the storage name of a ready statement (and `chunks` is
+    None) when one exists; otherwise the statement is generated, and stored
+    on the way through for closed months.
+    """
+    if not is_closed(month, today):
+        return generate_statement(user, month, statement_format), None
+    name, exists = cached_statement(user, month, statement_format)
+    if exists:
+        return None, name
+    return _store(name, generate_statement(user, month, statement_format)), None
+
+
+# HTML ------------------------------------------------------------------------
+
+_HTML_HEAD = """<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><title>{title}</title>
+<style>
+body {{ font-family: Helvetica, Arial, sans-serif; font-size: 12px; color: #111; margin: 2em; }}
+table {{ width: 100%; border-collapse: collapse; margin-bottom: 1em; }}
+th, td {{ padding: 3px 6px; border-bottom: 1px solid #ddd; text-align: left; }}
+td.amount, th.amount {{ text-align: right; font-family: monospace; }}
+section.page {{ page-break-after: always; }}
+footer {{ color: #666; font-size: 10px; }}
+</style></head><body>
+"""
+
+
+def _html_statement(title, subtotals, income, expense, pages, page_count):
+    escape = html.escape
+    parts = [_HTML_HEAD.format(title=escape(title)), f"<h1>{escape(title)}</h1>\n"]
+    parts.append(
+        "<table><tr><th>Category</th><th>Type</th><th class=\"amount\">Transactions</th>"
+        "<th class=\"amount\">Subtotal</th></tr>\n"
+    )
+    for name, category_type, total, count in subtotals:
+        parts.append(
+            f"<tr><td>{escape(name)}</td><td>{category_type}</td>"
+            f"<td class=\"amount\">{count}</td><td class=\"amount\">{total:.2f}</td></tr>\n"
+        )
+    parts.append(
+        f"<tr><th colspan=\"3\">Income</th><th class=\"amount\">{income:.2f}</th></tr>\n"
+        f"<tr><th colspan=\"3\">Expense</th><th class=\"amount\">{expense:.2f}</th></tr>\n"
+        f"<tr><th colspan=\"3\">Net</th><th class=\"amount\">{income - expense:.2f}</th></tr></table>\n"
+    )
+    yield "".join(parts).encode()
+
+    for number, rows in pages:
+        parts = [
+            "<section class=\"page\"><table><tr><th>Date</th><th>Category</th><th>Description</th>"
+            "<th class=\"amount\">Amount</th></tr>\n"
+        ]
+        for day, name, description, amount in rows:
+            parts.append(
+                f"<tr><td>{day:%Y-%m-%d}</td><td>{escape(name)}</td><td>{escape(description)}</td>"
+                f"<td class=\"amount\">{amount:.2f}</td></tr>\n"
+            )
+        parts.append(f"</table><footer>Page {number} of {page_count}</footer></section>\n")
+        yield "".join(parts).encode()
+    yield b"</body></html>\n"
+
+
+# PDF -------------------------------------------------------------------------
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 in points
+MARGIN = 50
+FONT_SIZE = 9
+LEADING = 12
+
+
+def _pdf_text(value):
+    """Encode `value` as a PDF literal string (WinAnsi, unsupported characters as '?')."""
+    raw = str(value).encode("cp1252", "replace")
+    return b"(" + raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+class _PdfWriter:
+    """Write a text-only PDF one page at a time.
+
+    Objects 1-4 are the catalog, page tree and the two fonts; every page
+    adds a content stream and a page object. The page tree is written last,
+    once every page is known, followed by the cross-reference table.
+    """
+
+    def __init__(self):
+        self.offset = 0
+        self.offsets = {}
+        self.pages = []
+        self.next_id = 5
+
+    def _object(self, number, body):
+        self.offsets[number] = self.offset
+        data = b"%d 0 obj\n" % number + body + b"\nendobj\n"
+        self.offset += len(data)
+        return data
+
+    def start(self):
+        header = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+        self.offset = len(header)
+        return header + b"".join([
+            self._object(1, b"<< /Type /Catalog /Pages 2 0 R >>"),
+            self._object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"),
+            self._object(4, b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>"),
+        ])
+
+    def page(self, lines):
+        """Return the bytes of one page; `lines` are `(x, y, font, text, right_aligned)`."""
+        ops = [b"BT"]
+        for x, y, font, text, right in lines:
+            if right:
+                # Courier glyphs are 0.6 em wide, so right alignment needs no metrics
+                x -= len(str(text)) * FONT_SIZE * 0.6
+            ops.append(b"/F%d %d Tf 1 0 0 1 %.2f %.2f Tm %s Tj" % (font, FONT_SIZE, x, y, _pdf_text(text)))
+        ops.append(b"ET")
+        stream = b"\n".join(ops)
+        content_id, page_id = self.next_id, self.next_id + 1
+        self.next_id += 2
+        self.pages.append(page_id)
+        return self._object(content_id, b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream") + self._object(
+            page_id,
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> >>" % (PAGE_WIDTH, PAGE_HEIGHT, content_id),
+        )
+
+    def finish(self):
+        kids = b" ".join(b"%d 0 R" % page_id for page_id in self.pages)
+        data = self._object(2, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self.pages)))
+        xref = [b"xref\n0 %d\n" % self.next_id, b"0000000000 65535 f \n"]
+        xref += [b"%010d 00000 n \n" % self.offsets[number] for number in range(1, self.next_id)]
+        trailer = b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (self.next_id, self.offset)
+        return data + b"".join(xref) + trailer
+
+
+def _pdf_statement(title, subtotals, income, expense, pages, page_count):
+    writer = _PdfWriter()
+    yield writer.start()
+    top = PAGE_HEIGHT - MARGIN
+    right = PAGE_WIDTH - MARGIN
+
+    lines = [(MARGIN, top, 1, title, False)]
+    y = top - 2 * LEADING
+    for name, category_type, total, count in subtotals:
+        lines += [
+            (MARGIN, y, 1, name, False), (MARGIN + 200, y, 1, category_type, False),
+            (MARGIN + 330, y, 2, count, True), (right, y, 2, f"{total:.2f}", True),
+        ]
+        y -= LEADING
+    y -= LEADING
+    for label, value in (("Income", income), ("Expense", expense), ("Net", income - expense)):
+        lines += [(MARGIN, y, 1, label, False), (right, y, 2, f"{value:.2f}", True)]
+        y -= LEADING
+    yield writer.page(lines)
+
+    for number, rows in pages:
+        y = top
+        lines = [
+            (MARGIN, y, 1, "Date", False), (MARGIN + 70, y, 1, "Category", False),
+            (MARGIN + 170, y, 1, "Description", False), (right, y, 2, "Amount", True),
+        ]
+        for day, name, description, amount in rows:
+            y -= LEADING
+            lines += [
+                (MARGIN, y, 2, f"{day:%Y-%m-%d}", False), (MARGIN + 70, y, 1, name[:18], False),
+                (MARGIN + 170, y, 1, description[:60], False), (right, y, 2, f"{amount:.2f}", True),
+            ]
+        lines.append((MARGIN, MARGIN / 2, 1, f"Page {number} of {page_count}", False))
+        yield writer.page(lines)
+    yield writer.finish()
@@ -0,0 +1,210 @@
+"""Category suggestions from description text.
+
+Each user gets a small multinomial naive Bayes model over the words of their
+own descriptions: for every category, how many of the user's transactions
+it has and how often each word occurs in their descriptions (once per
+transaction). `suggest` scores the categories for the words typed so far
+with add-one smoothing and returns the most likely ones, so repeated
+merchants ("Starbucks", "Shell") get their usual category preselected.
+
+A model is compact and array-backed: the vocabulary maps each word to a row
+and every category column is an `array('I')` of per-row counts, next to the
+per-category word and transaction totals. A prediction only touches the rows
+of the typed words, a few dozen float operations, well under a millisecond.
+
+Models live in this process, in an LRU keyed by user that keeps at most
+`SUGGEST_CACHE_USERS` of them. A model is built on first use from the user's
+`SUGGEST_HISTORY` most recent transactions (one query) and then kept current
+incrementally: the Transaction signals `learn` every save and delete once it
+commits. Bulk writers `discard` the user's model instead, and models expire
+after `SUGGEST_MODEL_TTL` seconds so changes made in other processes are
+picked up.
+"""
+
+import math
+import re
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+from .cache import get_categories
+from .models import Transaction
+
+
+MAX_TOKENS = 16
+SMOOTHING = 1.0
+
+# Words of two or more letters; numbers (store ids, dates) carry no signal
+_TOKEN_RE = re.compile(r"[^\W\d_]{2,}")
+
+_models = OrderedDict()  # user_id -> (CategoryModel, expires)
+_lock = threading.Lock()
+
+
+def tokens(description):
+    """Return the distinct lowercase words of `description` used as features."""
+    return list(dict.fromkeys(_TOKEN_RE.findall(description.lower())))[:MAX_TOKENS]
+
+
+class CategoryModel:
+    """Word counts per category of one user's transactions."""
+    __slots__ = ("vocabulary", "categories", "columns", "counts", "totals", "documents")
+
+    def __init__(self):
+        self.vocabulary = {}  # word -> row
+        self.categories = []  # column -> category id
+        self.columns = {}  # category id -> column
+        self.counts = []  # column -> array of per-row word counts
+        self.totals = array("I")  # column -> number of counted words
+        self.documents = array("I")  # column -> number of transactions
+
+    def _column(self, category_id):
+        column = self.columns.get(category_id)
+        if column is None:
+            column = self.columns[category_id] = len(self.categories)
+            self.categories.append(category_id)
+            self.counts.append(array("I", bytes(4 * len(self.vocabulary))))
+            self.totals.append(0)
+            self.documents.append(0)
+        return column
+
+    def _row(self, word):
+        row = self.vocabulary.get(word)
+        if row is None:
+            row = self.vocabulary[word] = len(self.vocabulary)
+            for counts in self.counts:
+                counts.append(0)
+        return row
+
+    def learn(self, description, category_id, weight=1):
+        """Count (`weight=1`) or uncount (`weight=-1`) one transaction."""
+        column = self._column(category_id)
+        counts = self.counts[column]
+        for word in tokens(description):
+            row = self._row(word) if weight > 0 else self.vocabulary.get(word)
+            # Uncounting a transaction older than the history the model was built from
+            if row is None or counts[row] + weight < 0:
+                continue
+            counts[row] += weight
+            self.totals[column] += weight
+        self.documents[column] = max(self.documents[column] + weight, 0)
+
+    def predict(self, description, allowed=None, limit=3):
+        """Return up to `limit` `(category_id, probability)` pairs, most likely first.
+
+        `allowed` optionally restricts the candidate category ids. Only
+        categories that were used with at least one of the words are
+        candidates, so unknown words give an empty list.
+        """
+        rows = [self.vocabulary[word] for word in tokens(description) if word in self.vocabulary]
+        if not rows:
+            return []
+        documents = sum(self.documents)
+        smoothed_vocabulary = SMOOTHING * len(self.vocabulary)
+        log = math.log
+        scores = []
+        for column, category_id in enumerate(self.categories):
+            count = self.documents[column]
+            if not count or (allowed is not None and category_id not in allowed):
+                continue
+            counts = self.counts[column]
+            hits = [counts[row] for row in rows]
+            if not any(hits):
+                # None of the words was ever used with this category: not a suggestion
+                continue
+            score = log(count / documents) - len(rows) * log(self.totals[column] + smoothed_vocabulary)
+            for hit in hits:
+                score += log(hit + SMOOTHING)
+            scores.append((score, category_id))
+        if not scores:
+            return []
+        best = max(score for score, _category_id in scores)
+        weights = [(math.exp(score - best), category_id) for score, category_id in scores]
+        total = sum(weight for weight, _category_id in weights)
+        weights.sort(reverse=True)
+        return [(category_id, weight / total) for weight, category_id in weights[:limit]]
+
+
+def build_model(user_id):
+    """Train a model on `user_id`'s `SUGGEST_HISTORY` most recent transactions."""
+    model = CategoryModel()
+    rows = (
+        Transaction.objects.filter(user_id=user_id)
+        .order_by('-date', '-id')
+        .values_list('category_id', 'description')[:settings.SUGGEST_HISTORY]
+    )
+    for category_id, description in rows:
+        model.learn(description, category_id)
+    return model
+
+
+def get_model(user_id):
+    """Return `user_id`'s model from the LRU, building it on a miss."""
+    now = time.monotonic()
+    with _lock:
+        entry = _models.get(user_id)
+        if entry is not None and entry[1] > now:
+            _models.move_to_end(user_id)
+            return entry[0]
+    model = build_model(user_id)
+    with _lock:
+        _models[user_id] = (model, now + settings.SUGGEST_MODEL_TTL)
+        _models.move_to_end(user_id)
+        while len(_models) > settings.SUGGEST_CACHE_USERS:
+            _models.popitem(last=False)
+    return model
+
+
+def _learn(user_id, previous, current):
+    with _lock:
+        entry = _models.get(user_id)
+        if entry is None:
+            return
+        model = entry[0]
+        if previous is not None:
+            model.learn(previous[1], previous[0], weight=-1)
+        if current is not None:
+            model.learn(current[1], current[0])
+
+
+def learn(user_id, previous, current):
+    """Move one transaction in `user_id`'s model, if it is loaded.
+
+    `previous` and `current` are `(category_id, description)` or None (for
+    creation and deletion). Applied once the current database transaction
+    commits.
+    """
+    if previous != current:
+        transaction.on_commit(lambda: _learn(user_id, previous, current))
+
+
+def _discard(user_id):
+    with _lock:
+        _models.pop(user_id, None)
+
+
+def discard(user_id):
+    """Drop `user_id`'s model once the current database transaction commits (after bulk writes)."""
+    transaction.on_commit(lambda: _discard(user_id))
+
+
+def suggest(user_id, description, category_type=None, limit=3):
+    """Return up to `limit` `(Category, probability)` suggestions for `description`.
+
+    `category_type` (`income` or `expense`) restricts the suggestions to
+    categories of that type.
+    """
+    categories = {
+        category.pk: category for category in get_categories()
+        if category_type is None or category.type == category_type
+    }
+    if not tokens(description) or not categories:
+        return []
+    return [
+        (categories[category_id], probability)
+        for category_id, probability in get_model(user_id).predict(description, categories, limit)
+    ]
@@ -0,0 +1,308 @@
+"""Offline-first sync of a user's transactions.
+
+Clients keep a local copy of their transactions and exchange only changes
+with the server (`api.TransactionSyncAPIView`):
+
+- Download: `changes` returns the rows created or edited and the ids of the
+  rows deleted since a watermark, in pages. Every write sets
+  `Transaction.updated_at` and every delete leaves a `TransactionTombstone`,
+  so a delta is two keyset queries over `(updated_at, id)` and
+  `(deleted_at, transaction_id)` (both indexed per user), merged in that
+  order; its cost grows with the number of changes, not with the size of
+  the user's history. Without a watermark (or with one older than the
+  tombstone retention) the client gets every row and must replace its copy
+  (`reset`).
+- Upload: `apply_changes` applies a batch of offline edits with
+  last-write-wins. Creates are keyed by a client-chosen `client_id`, so a
+  retried upload never creates a row twice. Edits and deletes carry the
+  time they were made on the client; a row written on the server after that
+  is kept and reported as a conflict. The whole batch is written with one
+  `bulk_create`, one `bulk_update` and one DELETE (`bulk.py`), and the
+  rollups and the user's caches are updated once. Offline creates are not
+  checked for duplicates (`duplicates.py`), but get their fingerprint.
+
+Watermarks are opaque, URL-safe tokens like the list cursors (see
+`pagination.py`). Transactions commit in a different order than their
+`updated_at` timestamps, so the watermark of a delta's last page is set
+`SYNC_SETTLE_SECONDS` in the past and the next delta re-sends the most recent
+changes: clients apply changes as upserts by id, so repeats are harmless, and
+a slow commit is not skipped.
+"""
+
+import base64
+import binascii
+import datetime
+import json
+from collections import defaultdict
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BigIntegerField, ExpressionWrapper, F, Q
+from django.utils import timezone
+
+from . import bulk, currency, duplicates, rollups, suggest
+from .cache import bump_user_version
+from .fields import to_cents
+from .models import Transaction, TransactionTombstone
+
+
+# Fields sent for every changed row (see `serializers.FIELD_SOURCES`)
+FIELDS = (
+    "id", "client_id", "date", "amount", "currency", "base_amount", "category", "description",
+    "image", "thumbnail", "updated_at", "possible_duplicate",
+)
+# Fields an upload may change
+UPDATE_FIELDS = ("amount", "currency", "base_amount", "category", "date", "description", "fingerprint", "updated_at")
+
+
+@dataclass
+class SyncPage:
+    """One page of changes.
+
+    - rows: created or edited transactions, oldest change first
+    - deleted: ids of deleted transactions
+    - watermark: token for the next page (or the next sync)
+    - has_more: whether another page follows right away
+    - reset: the client must drop its copy and keep only what follows
+    """
+    rows: list
+    deleted: list
+    watermark: str
+    has_more: bool
+    reset: bool
+
+
+@dataclass
+class SyncResult:
+    """Outcome of an upload.
+
+    - created: `{client_id: id}` for every create, including repeated ones
+    - updated: ids of the edited rows
+    - deleted: ids of the deleted (or already gone) rows
+    - conflicts: `{"id", "reason"}` for edits and deletes that were not
+      applied: `stale` (changed on the server after the client's change)
+      or `missing` (no such transaction)
+    """
+    created: dict = field(default_factory=dict)
+    updated: list = field(default_factory=list)
+    deleted: list = field(default_factory=list)
+    conflicts: list = field(default_factory=list)
+
+
+def _micros(value):
+    return int(value.timestamp()) * 1_000_000 + value.microsecond
+
+
+def _from_micros(value):
+    return datetime.datetime.fromtimestamp(value // 1_000_000, datetime.UTC).replace(microsecond=value % 1_000_000)
+
+
+def encode_watermark(position, floor):
+    """Return a token for the change after `position` (`(datetime, id)`).
+
+    `floor` is the time since which the client has seen every deletion.
+    """
+    payload = {"t": _micros(position[0]), "i": position[1], "f": _micros(floor)}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_watermark(token):
+    """Decode a token produced by `encode_watermark` into `(position, floor)`.
+
+    Raises ValueError when the token is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        return (_from_micros(int(payload["t"])), int(payload["i"])), _from_micros(int(payload["f"]))
+    except (binascii.Error, ValueError, TypeError, KeyError, OverflowError, OSError):
+        raise ValueError("Invalid watermark.")
+
+
+def _after(position, time_field, id_field):
+    """Q object matching keys strictly after `position`."""
+    moment, pk = position
+    # The redundant `>=` lets the index seek to `moment` instead of scanning the OR
+    return Q(**{f"{time_field}__gte": moment}) & (
+        Q(**{f"{time_field}__gt": moment}) | Q(**{time_field: moment, f"{id_field}__gt": pk})
+    )
+
+
+def changes(user_id, watermark=None, limit=None, now=None):
+    """Return the `SyncPage` of `user_id`'s changes after `watermark`.
+
+    Raises ValueError for a malformed watermark.
+    """
+    now = now or timezone.now()
+    settled = now - datetime.timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+    limit = max(1, min(limit or settings.SYNC_PAGE_SIZE, settings.SYNC_PAGE_SIZE))
+    position, floor, reset = None, settled, True
+    if watermark:
+        position, floor = decode_watermark(watermark)
+        reset = False
+        if floor < now - datetime.timedelta(days=settings.SYNC_TOMBSTONE_DAYS):
+            # Tombstones this old are pruned: start over
+            position, floor, reset = None, settled, True
+
+    rows = Transaction.objects.filter(user_id=user_id)
+    tombstones = TransactionTombstone.objects.filter(user_id=user_id, deleted_at__gt=floor)
+    if position is not None:
+        rows = rows.filter(_after(position, "updated_at", "id"))
+        tombstones = tombstones.filter(_after(position, "deleted_at", "transaction_id"))
+    rows = rows.order_by("updated_at", "id").only(*FIELDS)
+    tombstones = tombstones.order_by("deleted_at", "transaction_id").values_list("deleted_at", "transaction_id")
+
+    merged = sorted(
+        [((row.updated_at, row.pk), row) for row in rows[:limit + 1]]
+        + [(key, None) for key in tombstones[:limit + 1]],
+        key=lambda item: item[0],
+    )
+    has_more = len(merged) > limit
+    merged = merged[:limit]
+    if has_more:
+        position = merged[-1][0]
+    else:
+        # Re-read the last SYNC_SETTLE_SECONDS next time (see the module docstring)
+        position = min(merged[-1][0] if merged else (position or (settled, 0)), (settled, 0))
+        floor = max(floor, settled)
+    return SyncPage(
+        rows=[row for _key, row in merged if row is not None],
+        deleted=[key[1] for key, row in merged if row is None],
+        watermark=encode_watermark(position, floor),
+        has_more=has_more,
+        reset=reset,
+    )
+
+
+def _base_cents(items, base):
+    return currency.convert(
+        [to_cents(item["amount"]) for item in items],
+        [item["currency"] for item in items],
+        [item["date"] for item in items],
+        base,
+    )
+
+
+def _create(user_id, items, base, result, deltas):
+    """Insert the new rows of `items` (keyed by client id) and fill `result.created`."""
+    known = dict(
+        Transaction.objects.filter(user_id=user_id, client_id__in=[item["client_id"] for item in items])
+        .values_list("client_id", "id")
+    )
+    new = {}
+    for item in items:
+        if item["client_id"] not in known:
+            new[item["client_id"]] = item
+    items = list(new.values())
+    created = [
+        Transaction(
+            user_id=user_id, client_id=item["client_id"], amount=item["amount"], currency=item["currency"],
+            base_amount=Decimal(cents).scaleb(-2), category_id=item["category"], date=item["date"],
+            description=item["description"],
+            fingerprint=duplicates.fingerprint(user_id, item["amount"], item["currency"], item["description"]),
+        )
+        for item, cents in zip(items, _base_cents(items, base))
+    ]
+    Transaction.objects.bulk_create(created)
+    for row in created:
+        known[row.client_id] = row.pk
+        bucket = deltas[(user_id, row.date.replace(day=1), row.category_id)]
+        bucket[0] += to_cents(row.base_amount)
+        bucket[1] += 1
+    result.created = {str(client_id): pk for client_id, pk in known.items()}
+
+
+def _update(user_id, items, base, now, result, deltas):
+    """Apply the edits in `items` (keyed by id) that are newer than the stored rows."""
+    rows = Transaction.objects.filter(user_id=user_id, pk__in=items).only(*UPDATE_FIELDS)
+    found, winners = set(), []
+    for row in rows:
+        found.add(row.pk)
+        item = items[row.pk]
+        if row.updated_at > min(item["updated_at"], now):
+            result.conflicts.append({"id": row.pk, "reason": "stale"})
+            continue
+        bucket = deltas[(user_id, row.date.replace(day=1), row.category_id)]
+        bucket[0] -= to_cents(row.base_amount)
+        bucket[1] -= 1
+        row.amount, row.currency, row.category_id = item["amount"], item["currency"], item["category"]
+        row.date, row.description, row.updated_at = item["date"], item["description"], now
+        row.fingerprint = duplicates.fingerprint(user_id, row.amount, row.currency, row.description)
+        winners.append(row)
+    result.conflicts.extend({"id": pk, "reason": "missing"} for pk in items if pk not in found)
+    base_cents = _base_cents([items[row.pk] for row in winners], base)
+    for row, cents in zip(winners, base_cents):
+        row.base_amount = Decimal(cents).scaleb(-2)
+        bucket = deltas[(user_id, row.date.replace(day=1), row.category_id)]
+        bucket[0] += cents
+        bucket[1] += 1
+    Transaction.objects.bulk_update(winners, UPDATE_FIELDS)
+    result.updated = sorted(row.pk for row in winners)
+
+
+def _delete(user_id, items, now, result):
+    """Delete the rows in `items` (`{id: deleted_at}`) not edited since."""
+    rows = (
+        Transaction.objects.filter(user_id=user_id, pk__in=items)
+        .annotate(cents=ExpressionWrapper(F("base_amount"), output_field=BigIntegerField()))
+        .values_list("id", "updated_at", "date", "category_id", "cents")
+    )
+    doomed, stale, deltas = [], set(), defaultdict(lambda: [0, 0])
+    for pk, updated_at, date, category_id, cents in rows:
+        if updated_at > min(items[pk], now):
+            stale.add(pk)
+            result.conflicts.append({"id": pk, "reason": "stale"})
+        else:
+            doomed.append(pk)
+            bucket = deltas[(user_id, date.replace(day=1), category_id)]
+            bucket[0] -= cents
+            bucket[1] -= 1
+    if doomed:
+        bulk.delete_transactions(
+            user_id, Transaction.objects.filter(user_id=user_id, pk__in=doomed), now, ids=doomed, deltas=deltas,
+        )
+    # Rows that are already gone count as deleted, so retries succeed
+    result.deleted = sorted(pk for pk in items if pk not in stale)
+
+
+def apply_changes(user_id, upserts, deletes, now=None):
+    """Apply an upload of validated offline edits and return a `SyncResult`.
+
+    `upserts` are dicts with `amount`, `currency`, `category` (id), `date`,
+    `description`, `updated_at` (client edit time) and either `id` (edit)
+    or `client_id` (create); `deletes` are dicts with `id` and `deleted_at`.
+    Edits and deletes are applied when their time is at least the stored
+    row's `updated_at` (times in the future count as now).
+    """
+    now = now or timezone.now()
+    result = SyncResult()
+    base = currency.base_currency(user_id)
+    creates = [item for item in upserts if item.get("id") is None]
+    updates = {item["id"]: item for item in upserts if item.get("id") is not None}
+    removals = {item["id"]: item["deleted_at"] for item in deletes}
+    # (user_id, month, category_id) -> [base currency cents, count]
+    deltas = defaultdict(lambda: [0, 0])
+    with transaction.atomic():
+        if creates:
+            _create(user_id, creates, base, result, deltas)
+        if updates:
+            _update(user_id, updates, base, now, result, deltas)
+        if removals:
+            _delete(user_id, removals, now, result)
+        rollups.apply_deltas({
+            key: (Decimal(cents).scaleb(-2), count) for key, (cents, count) in deltas.items() if cents or count
+        })
+        if deltas:
+            bump_user_version(user_id)
+            suggest.discard(user_id)
+    return result
+
+
+def prune_tombstones(now=None):
+    """Delete tombstones older than `SYNC_TOMBSTONE_DAYS`; returns how many."""
+    cutoff = (now or timezone.now()) - datetime.timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+    deleted, _counts = TransactionTombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
@@ -1,3 +1,1973 @@
-from django.test import TestCase
+"""Tests for the Transaction app.
 
-# Create your tests here.
+Page tests derive from `PageTestCase`, which renders templates with the plain
+static files storage (the manifest storage needs `collectstatic`) and the
+tailwind template tags that `base.html` loads, and turns on
+`PERFORMANCE_BUDGET_RAISE` so safe requests over their view's budget fail.
+
+The `*BudgetTests` classes request every view declaring a
+`performance_budget` in its most expensive case (cold caches, a write that
+opens a new rollup month and crosses a budget threshold, ...), so each
+budget is the measured worst case. Unsafe requests are not failed by the
+middleware once they have committed; `assertWithinBudget` checks them.
+"""
+
+import base64
+import contextlib
+import datetime
+import importlib
+import io
+import json
+import os
+import random
+import tempfile
+import tracemalloc
+import uuid
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.db.models.signals import post_init
+from django.test import TestCase, TransactionTestCase, modify_settings, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, resolve, reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from mysite import urls as project_urls
+
+from . import analytics, budgets, bulk, currency, images, rollups, suggest, sync
+from . import urls as transaction_urls
+from .benchmarks import ensure_categories, generate_rows
+from .cache import get_categories, invalidate_categories
+from .currency import invalidate_rates, load_rates
+from .duplicates import fingerprint
+from .importer import import_transactions
+from .models import Budget, BudgetEvent, Category, MonthlyRollup, RecurringRule, Transaction, TransactionTombstone
+from .pagination import ORDERING
+from .recurring import materialize_due
+from .rollups import rebuild_rollups
+from .search import search_transactions
+from .serializers import SyncUpsertSerializer
+from .statements import _cache_prefix, _store, cached_statement, statement_digest
+from .suggest import discard as discard_suggestions
+from .views import TransactionListView
+
+
+def rollup_rows():
+    """Return the stored rollups as `{(user_id, month, category_id): (total, count)}`."""
+    return {
+        (row.user_id, row.month, row.category_id): (row.total, row.count) for row in MonthlyRollup.objects.all()
+    }
+
+
+def aggregated_rollups():
+    """Return the rollups aggregated afresh from the transactions, like `rollup_rows`."""
+    rows = (
+        Transaction.objects.order_by()
+        .annotate(month=TruncMonth("date"))
+        .values_list("user_id", "month", "category_id")
+        .annotate(total=Sum("base_amount"), count=Count("id"))
+    )
+    return {(user_id, month, category_id): (total, count) for user_id, month, category_id, total, count in rows}
+
+
+@modify_settings(INSTALLED_APPS={"append": "tailwind"})
+@override_settings(
+    PERFORMANCE_BUDGET_RAISE=True,
+    STORAGES={
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    },
+)
+class PageTestCase(TestCase):
+    """Base class for tests that request pages as a logged-in user.
+
+    Cached data (per-user pages and totals, categories, exchange rates,
+    category suggestion models) is dropped before every test, in the shared
+    cache and in this process, since the database is rolled back after it.
+    Media files (statements, receipts) go to a temporary MEDIA_ROOT.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        media_root = cls.enterClassContext(tempfile.TemporaryDirectory())
+        cls.enterClassContext(override_settings(MEDIA_ROOT=media_root))
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categories = ensure_categories()
+        cls.user = User.objects.create_user(username="alice", password="x")
+
+    def setUp(self):
+        self.clear_caches()
+        self.client.force_login(self.user)
+
+    def clear_caches(self):
+        cache.clear()
+        invalidate_categories()
+        invalidate_rates()
+        with self.captureOnCommitCallbacks(execute=True):
+            discard_suggestions(self.user.pk)
+
+    def transaction_form(self, **overrides):
+        """Return POST data of the create form for a valid expense."""
+        return {
+            "transaction_type": "expense", "amount": "12.50", "currency": "USD",
+            "category": self.categories["Groceries"].pk, "date": str(timezone.localdate()),
+            "description": "Weekly shop", **overrides,
+        }
+
+    def assertWithinBudget(self, response):
+        """Assert the request stayed within its view's `performance_budget`.
+
+        Streaming bodies are consumed first, since their queries run while
+        they stream. Returns the number of queries.
+        """
+        if response.streaming:
+            b"".join(response.streaming_content)
+        state = response.wsgi_request._performance
+        self.assertIsNotNone(state["budget"], f"{state['view']} has no performance budget")
+        for key, limit in state["budget"].items():
+            self.assertLessEqual(state["metrics"][key], limit, f"{state['view']} {key}")
+        return state["metrics"]["queries"]
+
+
+class RecurringMaterializeTests(TestCase):
+    """`recurring.materialize_due` inserts the missing occurrences in bulk."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = ensure_categories()["Rent"]
+        cls.user = User.objects.create_user(username="alice", password="x")
+
+    def make_rule(self):
+        return RecurringRule.objects.create(
+            user=self.user, amount=Decimal("950.00"), currency="USD", category=self.category,
+            description="Rent", frequency="monthly", dtstart=datetime.date(2026, 1, 15),
+        )
+
+    def test_materializes_missed_occurrences_once(self):
+        rule = self.make_rule()
+        result = materialize_due(today=datetime.date(2026, 4, 20))
+        self.assertEqual((result.rules, result.created, result.skipped), (1, 4, 0))
+        rows = Transaction.objects.filter(recurring_rule=rule).order_by("date")
+        self.assertEqual(
+            [row.date for row in rows],
+            [datetime.date(2026, month, 15) for month in (1, 2, 3, 4)],
+        )
+        expected = fingerprint(self.user.pk, Decimal("950.00"), "USD", "Rent")
+        self.assertTrue(all(row.fingerprint == expected and not row.possible_duplicate for row in rows))
+
+        again = materialize_due(today=datetime.date(2026, 4, 20))
+        self.assertEqual((again.created, again.skipped), (0, 0))
+
+    def test_occurrence_created_by_overlapping_run_is_skipped(self):
+        rule = self.make_rule()
+        Transaction.objects.create(
+            user=self.user, amount=rule.amount, currency="USD", category=self.category,
+            date=rule.dtstart, description="Rent", recurring_rule=rule,
+        )
+        result = materialize_due(today=datetime.date(2026, 2, 20))
+        self.assertEqual((result.created, result.skipped), (0, 1))
+
+
+class MigrationTestCase(TransactionTestCase):
+    """Runs the Transaction migrations from `migrate_from` to `migrate_to`.
+
+    `setUp` migrates the database back to `migrate_from`; tests create rows
+    with the historical models of `self.old_apps`, then call `migrate()`,
+    which returns the models as of `migrate_to`. The database is migrated
+    forward again afterwards.
+    """
+    migrate_from = None
+    migrate_to = None
+
+    def setUp(self):
+        super().setUp()
+        self.old_apps = self.migrate_to_node(self.migrate_from)
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+        super().tearDown()
+
+    def migrate_to_node(self, name):
+        target = [("Transaction", name)]
+        executor = MigrationExecutor(connection)
+        executor.migrate(target)
+        return executor.loader.project_state(target).apps
+
+    def migrate(self):
+        return self.migrate_to_node(self.migrate_to)
+
+
+class AmountCentsMigrationTests(MigrationTestCase):
+    """0006 turns float amounts and rollup totals into exact integer cents, and back."""
+    migrate_from = "0005_transaction_thumbnail"
+    migrate_to = "0006_amount_cents"
+
+    amounts = [0.1 + 0.2, 19.99, 1.005, 1234567.89, 0.01, 99999999.99]
+
+    def setUp(self):
+        super().setUp()
+        User = self.old_apps.get_model("auth", "User")
+        Category = self.old_apps.get_model("Transaction", "Category")
+        Transaction = self.old_apps.get_model("Transaction", "Transaction")
+        MonthlyRollup = self.old_apps.get_model("Transaction", "MonthlyRollup")
+        self.user = User.objects.create(username="alice")
+        category = Category.objects.create(name="Dining", type="expense")
+        for amount in self.amounts:
+            Transaction.objects.create(
+                user=self.user, category=category, amount=amount, date=datetime.date(2026, 1, 5), description="Row",
+            )
+        MonthlyRollup.objects.create(
+            user=self.user, category=category, month=datetime.date(2026, 1, 1), type="expense",
+            total=sum(self.amounts), count=len(self.amounts),
+        )
+
+    def test_amounts_become_exact_cents(self):
+        apps = self.migrate()
+        Transaction = apps.get_model("Transaction", "Transaction")
+        MonthlyRollup = apps.get_model("Transaction", "MonthlyRollup")
+        self.assertEqual(
+            list(Transaction.objects.order_by("pk").values_list("amount", flat=True)),
+            [Decimal("0.30"), Decimal("19.99"), Decimal("1.00"), Decimal("1234567.89"), Decimal("0.01"),
+             Decimal("99999999.99")],
+        )
+        self.assertEqual(MonthlyRollup.objects.get().total, Decimal("101234589.18"))
+
+    def test_reverse_restores_the_floats(self):
+        self.migrate()
+        Transaction = self.migrate_to_node(self.migrate_from).get_model("Transaction", "Transaction")
+        self.assertEqual(
+            list(Transaction.objects.order_by("pk").values_list("amount", flat=True)),
+            [0.3, 19.99, 1.0, 1234567.89, 0.01, 99999999.99],
+        )
+
+
+class FingerprintMigrationTests(MigrationTestCase):
+    migrate_from = "0011_sync"
+    migrate_to = "0012_duplicates"
+
+    def test_existing_rows_get_the_current_fingerprint(self):
+        User = self.old_apps.get_model("auth", "User")
+        Category = self.old_apps.get_model("Transaction", "Category")
+        Transaction = self.old_apps.get_model("Transaction", "Transaction")
+        user = User.objects.create(username="alice")
+        category = Category.objects.create(name="Dining", type="expense")
+        rows = [
+            ("4.50", "USD", "Coffee, Starbucks"), ("4.50", "USD", "starbucks coffee"), ("19.99", "EUR", "Dinner"),
+        ]
+        for amount, code, description in rows:
+            Transaction.objects.create(
+                user=user, category=category, amount=Decimal(amount), currency=code, base_amount=Decimal(amount),
+                date=datetime.date(2026, 1, 5), description=description,
+            )
+
+        Transaction = self.migrate().get_model("Transaction", "Transaction")
+        self.assertEqual(
+            list(Transaction.objects.order_by("pk").values_list("fingerprint", flat=True)),
+            [fingerprint(user.pk, Decimal(amount), code, description) for amount, code, description in rows],
+        )
+
+
+class CurrencyTests(PageTestCase):
+    """Only currencies convertible to the user's base currency are accepted."""
+
+    def load_eur_rates(self):
+        load_rates(io.StringIO("Date,USD\n2026-01-02,1.25\n"))
+
+    def test_new_install_offers_only_the_base_currency(self):
+        response = self.client.get(reverse("create"), secure=True)
+        self.assertEqual([code for code, _label in response.context["form"].fields["currency"].choices], ["USD"])
+
+        response = self.client.post(reverse("create"), self.transaction_form(currency="EUR"), secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("currency", response.context["form"].errors)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_loaded_rates_convert_to_the_base_currency(self):
+        self.load_eur_rates()
+        response = self.client.post(
+            reverse("create"), self.transaction_form(currency="EUR", amount="100.00"), secure=True,
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Transaction.objects.get().base_amount, Decimal("125.00"))
+
+    def test_import_and_sync_reject_unconvertible_currencies(self):
+        result = import_transactions(self.user, io.StringIO(
+            "date,amount,category,description,currency\n2026-01-05,10,Groceries,Market,EUR\n"
+        ))
+        self.assertEqual(result.created, 0)
+        self.assertEqual(result.errors, [(2, "No exchange rates to convert EUR to USD.")])
+
+        serializer = SyncUpsertSerializer(
+            data={
+                "client_id": "7d7c2f6e-8a55-4c8e-9d0e-1f1f1f1f1f1f", "amount": "10.00", "currency": "EUR",
+                "category": self.categories["Groceries"].pk, "date": "2026-01-05", "description": "Market",
+                "updated_at": "2026-01-05T10:00:00Z",
+            },
+            context={"base_currency": "USD"},
+        )
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("currency", serializer.errors)
+
+
+class CategoryCacheTests(PageTestCase):
+    """Categories are read from the cache until a Category is saved or deleted."""
+
+    def choices(self):
+        response = self.client.get(reverse("create"), secure=True)
+        return dict(response.context["form"].fields["category"].choices)
+
+    def test_repeated_reads_need_no_query(self):
+        get_categories()
+        with self.assertNumQueries(0):
+            self.assertEqual(len(get_categories()), len(self.categories))
+
+    def test_save_is_seen_at_once(self):
+        self.assertNotIn("Travel", self.choices().values())
+        travel = Category.objects.create(name="Travel", type="expense")
+        self.assertIn(travel, get_categories())
+        self.assertEqual(self.choices()[travel.pk], "Travel")
+
+        travel.name = "Trips"
+        travel.save()
+        self.assertEqual(self.choices()[travel.pk], "Trips")
+
+    def test_delete_is_seen_at_once(self):
+        travel = Category.objects.create(name="Travel", type="expense")
+        self.assertIn(travel.pk, self.choices())
+        pk = travel.pk
+        travel.delete()
+        self.assertNotIn(pk, [category.pk for category in get_categories()])
+        self.assertNotIn(pk, self.choices())
+
+    def test_cached_list_page_shows_renamed_categories(self):
+        Transaction.objects.create(
+            user=self.user, amount=Decimal("4.20"), category=self.categories["Dining"],
+            date=datetime.date(2025, 5, 1), description="Lunch",
+        )
+        self.assertContains(self.client.get(reverse("list"), secure=True), "Dining")
+        dining = Category.objects.get(pk=self.categories["Dining"].pk)
+        dining.name = "Eating out"
+        dining.save()
+        response = self.client.get(reverse("list"), secure=True)
+        self.assertContains(response, "Eating out")
+        self.assertNotContains(response, ">Dining<")
+
+
+@skipUnless(currency.np is not None, "needs NumPy")
+class ConversionTests(TestCase):
+    """The NumPy batch conversion and the pure Python fallback agree to the cent."""
+
+    @classmethod
+    def setUpTestData(cls):
+        load_rates(io.StringIO(
+            "Date,USD,JPY,GBP\n"
+            "2026-01-02,1.0321,162.35,0.83215\n"
+            "2026-01-05,1.0299,161.9,N/A\n"
+            "2026-01-09,1.0345,163.07,0.83399\n"
+        ))
+
+    def setUp(self):
+        invalidate_rates()
+        self.addCleanup(invalidate_rates)
+
+    def convert_without_numpy(self, *args):
+        invalidate_rates()
+        with mock.patch.object(currency, "np", None):
+            result = currency.convert(*args)
+        invalidate_rates()
+        return result
+
+    def test_paths_agree(self):
+        rng = random.Random(7)
+        codes = ["EUR", "USD", "JPY", "GBP"]
+        count = 500
+        cents = [rng.randrange(1, 10**9) for _ in range(count)]
+        codes_in = [rng.choice(codes) for _ in range(count)]
+        dates = [datetime.date(2025, 12, 20) + datetime.timedelta(days=rng.randrange(30)) for _ in range(count)]
+        for bases in ("USD", [rng.choice(codes) for _ in range(count)]):
+            with self.subTest(bases=bases if isinstance(bases, str) else "mixed"):
+                fast = currency.convert(cents, codes_in, dates, bases)
+                self.assertEqual(fast, self.convert_without_numpy(cents, codes_in, dates, bases))
+                self.assertTrue(all(type(value) is int for value in fast))
+
+    def test_known_values(self):
+        args = (
+            [10000, 10000, 10000, 10000, 12345],
+            ["EUR", "EUR", "GBP", "USD", "USD"],
+            [datetime.date(2025, 12, 31)] + [datetime.date(2026, 1, 6)] * 2 + [datetime.date(2026, 1, 9)] * 2,
+            "USD",
+        )
+        # Before the first rate the first one applies; GBP has no rate on the
+        # 5th, so the 6th uses the 2nd; amounts in the base currency are copied
+        expected = [10321, 10299, round(10000 * 1.0299 / 0.83215), 10000, 12345]
+        self.assertEqual(currency.convert(*args), expected)
+        self.assertEqual(self.convert_without_numpy(*args), expected)
+
+    def test_missing_rates_raise_on_both_paths(self):
+        args = ([100], ["CHF"], [datetime.date(2026, 1, 5)], "USD")
+        with self.assertRaises(ValueError):
+            currency.convert(*args)
+        with self.assertRaises(ValueError):
+            self.convert_without_numpy(*args)
+
+
+class ImportTests(PageTestCase):
+    """CSV rows are validated like the create form; rejected rows are reported, not fatal."""
+
+    def test_invalid_amounts_are_reported_per_row(self):
+        result = import_transactions(self.user, io.StringIO(
+            "date,amount,category,description\n"
+            "2026-01-05,100000000000000000000,Groceries,Too much\n"
+            "2026-01-05,1.005,Groceries,Fraction\n"
+            "2026-01-05,abc,Groceries,Text\n"
+            "2026-01-05,12.50,Groceries,Market\n"
+        ))
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.errors, [
+            (2, "Ensure that there are no more than 17 digits in total."),
+            (3, "Ensure that there are no more than 2 decimal places."),
+            (4, "Enter a number."),
+        ])
+        self.assertEqual(Transaction.objects.get().amount, Decimal("12.50"))
+
+    def test_rollups_are_applied_in_one_batch(self):
+        with mock.patch.object(rollups, "apply_deltas", wraps=rollups.apply_deltas) as apply_deltas:
+            result = import_transactions(self.user, io.StringIO(
+                "date,amount,category,description\n"
+                "2026-01-05,12.50,Groceries,Market\n"
+                "2026-01-09,7.25,Groceries,Bakery\n"
+                "2026-02-01,30.00,Dining,Dinner\n"
+            ))
+        self.assertEqual(result.created, 3)
+        apply_deltas.assert_called_once()
+        self.assertEqual(rollup_rows(), aggregated_rollups())
+
+
+class RollupTests(PageTestCase):
+    """Incremental rollup updates agree with a fresh aggregate after every kind of edit."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other = User.objects.create_user(username="bob", password="x")
+        for user in (cls.user, cls.other):
+            for day, category in ((3, "Groceries"), (17, "Groceries"), (9, "Dining")):
+                Transaction.objects.create(
+                    user=user, amount=Decimal(f"{day}.25"), category=cls.categories[category],
+                    date=datetime.date(2025, 5, day), description=f"Row {day}",
+                )
+        cls.sample = Transaction.objects.filter(user=cls.user).earliest("date")
+
+    def edit(self, **overrides):
+        data = self.transaction_form(**{
+            "amount": str(self.sample.amount), "category": self.sample.category_id, "date": str(self.sample.date),
+            "description": self.sample.description, **overrides,
+        })
+        response = self.client.post(reverse("edit", args=[self.sample.pk]), data, secure=True)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(rollup_rows(), aggregated_rollups())
+
+    def test_initial_rows(self):
+        self.assertEqual(rollup_rows(), aggregated_rollups())
+
+    def test_date_within_the_month(self):
+        self.edit(date="2025-05-28")
+
+    def test_date_into_another_month(self):
+        self.edit(date="2025-04-30")
+        self.assertEqual(rollup_rows()[(self.user.pk, datetime.date(2025, 4, 1), self.sample.category_id)][1], 1)
+
+    def test_amount(self):
+        self.edit(amount="1000.01")
+
+    def test_category(self):
+        self.edit(category=self.categories["Dining"].pk)
+
+    def test_amount_category_and_month_at_once(self):
+        self.edit(amount="0.01", category=self.categories["Dining"].pk, date="2025-06-01")
+
+    def test_model_save_with_a_string_date(self):
+        self.sample.date = "2025-07-04"
+        self.sample.save()
+        self.assertEqual(rollup_rows(), aggregated_rollups())
+
+    def test_delete_empties_the_bucket(self):
+        for row in Transaction.objects.filter(user=self.user, category=self.categories["Dining"]):
+            response = self.client.post(reverse("delete", args=[row.pk]), secure=True)
+            self.assertEqual(response.status_code, 302)
+        self.assertEqual(rollup_rows(), aggregated_rollups())
+
+    def test_rebuild_matches(self):
+        self.edit(date="2025-04-30", amount="2.00")
+        MonthlyRollup.objects.all().delete()
+        rebuild_rollups()
+        self.assertEqual(rollup_rows(), aggregated_rollups())
+
+
+class BudgetThresholdTests(PageTestCase):
+    """Every write that adds spending records the budget thresholds it crosses, once per month."""
+
+    month = datetime.date(2025, 5, 1)
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.budget = Budget.objects.create(user=cls.user, category=cls.categories["Groceries"], limit=Decimal("100.00"))
+        cls.row = Transaction.objects.create(
+            user=cls.user, amount=Decimal("50.00"), category=cls.categories["Groceries"],
+            date=datetime.date(2025, 5, 10), description="Market",
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.enterContext(mock.patch.object(budgets, "THRESHOLDS", (80, 100)))
+
+    def events(self, month=None):
+        return sorted(
+            BudgetEvent.objects.filter(budget=self.budget, month=month or self.month).values_list("threshold", "spent"),
+        )
+
+    def edit(self, **overrides):
+        data = self.transaction_form(**{
+            "amount": str(self.row.amount), "category": self.row.category_id, "date": str(self.row.date),
+            "description": self.row.description, **overrides,
+        })
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("edit", args=[self.row.pk]), data, secure=True)
+        self.assertEqual(response.status_code, 302)
+        self.row.refresh_from_db()
+
+    def status(self):
+        (status,) = budgets.budget_status(self.user.pk, self.month)
+        return status["spent"], status["over"]
+
+    def test_update_crosses_each_threshold_once(self):
+        self.assertEqual(self.events(), [])
+        self.edit(amount="85.00")
+        self.assertEqual(self.events(), [(80, Decimal("85.00"))])
+        self.edit(amount="120.00")
+        self.assertEqual(self.events(), [(80, Decimal("85.00")), (100, Decimal("120.00"))])
+        self.assertEqual(self.status(), (Decimal("120.00"), True))
+        # Dropping below and crossing again in the same month adds nothing
+        self.edit(amount="10.00")
+        self.edit(amount="99.00")
+        self.assertEqual(len(self.events()), 2)
+
+    def test_update_moving_spending_into_the_month(self):
+        dining = Transaction.objects.create(
+            user=self.user, amount=Decimal("40.00"), category=self.categories["Dining"],
+            date=datetime.date(2025, 5, 2), description="Dinner",
+        )
+        self.assertEqual(self.events(), [])
+        self.row, row = dining, self.row
+        self.edit(category=self.categories["Groceries"].pk)
+        self.assertEqual(self.events(), [(80, Decimal("90.00"))])
+
+        self.row = row
+        self.edit(date="2025-06-03", amount="100.00")
+        self.assertEqual(self.events(datetime.date(2025, 6, 1)), [(80, Decimal("100.00")), (100, Decimal("100.00"))])
+
+    def test_delete_records_nothing_and_frees_the_budget(self):
+        self.edit(amount="105.00")
+        self.assertEqual(self.status(), (Decimal("105.00"), True))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("delete", args=[self.row.pk]), secure=True)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.status(), (Decimal("0"), False))
+        self.assertEqual(len(self.events()), 2)
+
+    def test_batch_writes(self):
+        result = import_transactions(self.user, io.StringIO(
+            "date,amount,category,description\n2025-05-11,20,Groceries,Bakery\n2025-05-12,15,Groceries,Deli\n"
+        ))
+        self.assertEqual(result.created, 2)
+        self.assertEqual(self.events(), [(80, Decimal("85.00"))])
+
+        Transaction.objects.create(
+            user=self.user, amount=Decimal("30.00"), category=self.categories["Dining"],
+            date=datetime.date(2025, 5, 20), description="Dinner",
+        )
+        response = self.client.post(reverse("bulk"), {
+            "action": "recategorize", "scope": "filter", "category": self.categories["Dining"].pk,
+            "new_category": self.categories["Groceries"].pk,
+        }, secure=True)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.events(), [(80, Decimal("85.00")), (100, Decimal("115.00"))])
+
+    def test_other_categories_and_users_do_not_count(self):
+        other = User.objects.create_user(username="bob", password="x")
+        Transaction.objects.create(
+            user=other, amount=Decimal("500.00"), category=self.categories["Groceries"],
+            date=datetime.date(2025, 5, 3), description="Market",
+        )
+        Transaction.objects.create(
+            user=self.user, amount=Decimal("500.00"), category=self.categories["Dining"],
+            date=datetime.date(2025, 5, 3), description="Dinner",
+        )
+        self.assertEqual(self.events(), [])
+
+
+class CategorySuggestTests(PageTestCase):
+    """Category suggestions learned from the user's own descriptions."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other = User.objects.create_user(username="bob", password="x")
+        history = [
+            ("Starbucks latte", "Dining"), ("Starbucks", "Dining"), ("Starbucks 1234 coffee", "Dining"),
+            ("Starbucks beans", "Groceries"), ("Shell fuel", "Transport"), ("Shell", "Transport"),
+            ("Whole Foods", "Groceries"), ("Monthly salary", "Salary"),
+        ]
+        for day, (description, category) in enumerate(history, start=1):
+            Transaction.objects.create(
+                user=cls.user, amount=Decimal("5.00"), category=cls.categories[category],
+                date=datetime.date(2025, 5, day), description=description,
+            )
+        Transaction.objects.create(
+            user=cls.other, amount=Decimal("5.00"), category=cls.categories["Health"],
+            date=datetime.date(2025, 5, 1), description="Netflix",
+        )
+
+    def suggest(self, description, category_type=None):
+        return [
+            (category.name, probability)
+            for category, probability in suggest.suggest(self.user.pk, description, category_type)
+        ]
+
+    def names(self, description, category_type=None):
+        return [name for name, _probability in self.suggest(description, category_type)]
+
+    def test_probabilities(self):
+        model = suggest.CategoryModel()
+        model.learn("coffee shop", 1)
+        model.learn("coffee beans", 2)
+        model.learn("Coffee", 1)
+        # Column 1: P = 2/3 * (2+1)/(3+3); column 2: P = 1/3 * (1+1)/(2+3)
+        (first, p1), (second, p2) = model.predict("coffee")
+        self.assertEqual((first, second), (1, 2))
+        self.assertAlmostEqual(p1, 5 / 7)
+        self.assertAlmostEqual(p2, 2 / 7)
+        self.assertEqual(model.predict("tea"), [])
+
+    def test_trained_suggestions(self):
+        suggestions = self.suggest("starbucks")
+        self.assertEqual([name for name, _probability in suggestions], ["Dining", "Groceries"])
+        self.assertGreater(suggestions[0][1], 0.5)
+        self.assertAlmostEqual(sum(probability for _name, probability in suggestions), 1)
+        self.assertEqual(self.names("whole foods beans"), ["Groceries"])
+        self.assertEqual(self.names("SHELL station 42"), ["Transport"])
+        self.assertEqual(self.names("salary", "expense"), [])
+        self.assertEqual(self.names("salary", "income"), ["Salary"])
+        # Unknown words, numbers and other users' data suggest nothing
+        self.assertEqual(self.names("netflix 1234"), [])
+
+    def test_model_follows_single_writes_without_a_query(self):
+        self.names("starbucks")
+        with self.captureOnCommitCallbacks(execute=True):
+            row = Transaction.objects.create(
+                user=self.user, amount=Decimal("9.00"), category=self.categories["Entertainment"],
+                date=datetime.date(2025, 5, 20), description="Netflix",
+            )
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names("netflix"), ["Entertainment"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            row.category = self.categories["Shopping"]
+            row.save()
+        self.assertEqual(self.names("netflix"), ["Shopping"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            row.delete()
+        self.assertEqual(self.names("netflix"), [])
+
+    def test_batch_writes_rebuild_the_model(self):
+        self.names("starbucks")
+        with self.captureOnCommitCallbacks(execute=True):
+            import_transactions(self.user, io.StringIO(
+                "date,amount,category,description\n" + "2025-05-21,4,Groceries,Starbucks beans\n" * 4
+            ))
+        self.assertEqual(self.names("starbucks"), ["Groceries", "Dining"])
+
+    def test_view(self):
+        response = self.client.get(reverse("category-suggest"), {"description": "shell", "type": "expense"}, secure=True)
+        self.assertEqual(response.json(), {"suggestions": [
+            {"id": self.categories["Transport"].pk, "name": "Transport", "type": "expense", "probability": 1.0},
+        ]})
+        response = self.client.get(reverse("category-suggest"), {"description": ""}, secure=True)
+        self.assertEqual(response.json(), {"suggestions": []})
+
+
+@override_settings(RECEIPT_PROCESS_SYNC=True)
+class ReceiptPipelineTests(PageTestCase):
+    """Uploads are staged, then recompressed and thumbnailed into media storage."""
+
+    def setUp(self):
+        super().setUp()
+        staging_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(mock.patch.object(images, "staging_storage", FileSystemStorage(location=staging_root)))
+        self.staging_root = staging_root
+
+    def upload(self, size=(3200, 2400), name="receipt.jpg"):
+        buffer = io.BytesIO()
+        Image.new("RGB", size, (200, 120, 40)).save(buffer, "JPEG")
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/jpeg")
+
+    def stored_size(self, field):
+        with default_storage.open(field.name, "rb") as fh:
+            return Image.open(fh).size
+
+    def test_upload_is_resized_thumbnailed_and_unstaged(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("create"), self.transaction_form(image=self.upload()), secure=True)
+        self.assertEqual(response.status_code, 302)
+
+        row = Transaction.objects.get()
+        self.assertTrue(row.image.name.startswith("images/"))
+        self.assertTrue(row.thumbnail.name.startswith("images/thumbnails/"))
+        self.assertEqual(max(self.stored_size(row.image)), settings.RECEIPT_MAX_DIMENSION)
+        self.assertEqual(max(self.stored_size(row.thumbnail)), settings.RECEIPT_THUMBNAIL_SIZE)
+        self.assertEqual(os.listdir(self.staging_root), [])
+
+    def test_replaced_upload_deletes_the_previous_files(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("create"), self.transaction_form(image=self.upload()), secure=True)
+        first = Transaction.objects.get()
+        old_names = [first.image.name, first.thumbnail.name]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("edit", args=[first.pk]), self.transaction_form(image=self.upload((800, 600), "new.jpg")),
+                secure=True,
+            )
+        self.assertEqual(response.status_code, 302)
+        row = Transaction.objects.get()
+        self.assertEqual(self.stored_size(row.image), (800, 600))
+        self.assertNotIn(row.image.name, old_names)
+        self.assertFalse(any(default_storage.exists(name) for name in old_names))
+        self.assertEqual(os.listdir(self.staging_root), [])
+
+
+class RecurringRulePageTests(PageTestCase):
+    """Users start rules from the create form and end or delete them on their own page."""
+
+    def create_repeating(self, **overrides):
+        data = self.transaction_form(date="2026-01-15", repeat="monthly", **overrides)
+        return self.client.post(reverse("create"), data, secure=True)
+
+    def test_create_form_sets_the_end_of_the_schedule(self):
+        self.assertEqual(self.create_repeating(repeat_count="3").status_code, 302)
+        rule = RecurringRule.objects.get()
+        self.assertEqual((rule.count, rule.until, rule.occurrences), (3, None, 1))
+        materialize_due(today=datetime.date(2026, 12, 31))
+        self.assertEqual(rule.transactions.count(), 3)
+
+        response = self.create_repeating(repeat_until="2026-01-01", description="Gym")
+        self.assertIn("repeat_until", response.context["form"].errors)
+        response = self.client.post(
+            reverse("create"), self.transaction_form(repeat_count="3", description="Gym"), secure=True,
+        )
+        self.assertIn("repeat", response.context["form"].errors)
+
+    def test_page_lists_only_the_users_rules(self):
+        self.create_repeating()
+        other = User.objects.create_user(username="bob", password="x")
+        RecurringRule.objects.create(
+            user=other, amount=Decimal("5.00"), category=self.categories["Dining"], description="Coffee",
+            frequency="daily", dtstart=datetime.date(2026, 1, 1),
+        )
+        response = self.client.get(reverse("recurring"), secure=True)
+        self.assertEqual([rule.description for rule in response.context["rules"]], ["Weekly shop"])
+        self.assertWithinBudget(response)
+
+    def test_end_stops_further_occurrences(self):
+        self.create_repeating()
+        rule = RecurringRule.objects.get()
+        response = self.client.post(reverse("recurring-end", args=[rule.pk]), secure=True)
+        self.assertRedirects(response, reverse("recurring"), fetch_redirect_response=False)
+        self.assertWithinBudget(response)
+        rule.refresh_from_db()
+        self.assertEqual((rule.next_date, rule.count), (None, 1))
+        self.assertEqual(materialize_due(today=datetime.date(2026, 12, 31)).created, 0)
+
+    def test_delete_keeps_the_created_transactions(self):
+        self.create_repeating()
+        rule = RecurringRule.objects.get()
+        response = self.client.post(reverse("recurring-delete", args=[rule.pk]), secure=True)
+        self.assertRedirects(response, reverse("recurring"), fetch_redirect_response=False)
+        self.assertWithinBudget(response)
+        self.assertFalse(RecurringRule.objects.exists())
+        self.assertIsNone(Transaction.objects.get().recurring_rule_id)
+
+    def test_other_users_rules_are_not_found(self):
+        other = User.objects.create_user(username="bob", password="x")
+        rule = RecurringRule.objects.create(
+            user=other, amount=Decimal("5.00"), category=self.categories["Dining"], description="Coffee",
+            frequency="daily", dtstart=datetime.date(2026, 1, 1),
+        )
+        for name in ("recurring-end", "recurring-delete"):
+            with self.subTest(name):
+                self.assertEqual(self.client.post(reverse(name, args=[rule.pk]), secure=True).status_code, 404)
+        rule.refresh_from_db()
+        self.assertIsNotNone(rule.next_date)
+
+
+class ViewBudgetTestCase(PageTestCase):
+    """Page tests over a few hundred seeded transactions and a Groceries budget."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        rows = list(generate_rows(random.Random(0), cls.user, cls.categories, 300))
+        for row in rows:
+            row.fingerprint = fingerprint(cls.user.pk, row.amount, row.currency, row.description)
+        Transaction.objects.bulk_create(rows)
+        rebuild_rollups()
+        Budget.objects.create(user=cls.user, category=cls.categories["Groceries"], limit=Decimal("10.00"))
+        load_rates(io.StringIO("Date,USD\n2015-01-02,1.25\n"))
+        cls.sample = Transaction.objects.filter(user=cls.user).latest("date", "id")
+
+
+class TransactionListBudgetTests(ViewBudgetTestCase):
+
+    def test_first_page(self):
+        self.assertWithinBudget(self.client.get(reverse("list"), secure=True))
+
+    def test_filtered_partial_month(self):
+        start = self.sample.date.replace(day=1) + datetime.timedelta(days=3)
+        response = self.client.get(
+            reverse("list"), {"start_date": start, "category": self.categories["Dining"].pk}, secure=True,
+        )
+        self.assertWithinBudget(response)
+
+    def test_search(self):
+        self.assertWithinBudget(self.client.get(reverse("list"), {"q": "coffee"}, secure=True))
+
+    def test_next_page(self):
+        cursor = self.client.get(reverse("list"), secure=True).context["next_cursor"]
+        self.clear_caches()
+        self.assertWithinBudget(self.client.get(reverse("list"), {"cursor": cursor}, secure=True))
+
+
+@skipUnless(connection.vendor == "sqlite", "FTS5 index")
+class SearchTests(PageTestCase):
+    """Description search: ranked, owner-scoped, prefix matched, and kept in step with every write."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other = User.objects.create_user(username="bob", password="x")
+        cls.rows = {}
+        for description, category, day in (
+            ("Coffee", "Dining", 3),
+            ("Coffee beans and filters for the office kitchen", "Groceries", 5),
+            ("Coffee with coffee cake", "Dining", 9),
+            ("Costco run", "Groceries", 12),
+            ("Pizza night", "Dining", 20),
+        ):
+            cls.rows[description] = Transaction.objects.create(
+                user=cls.user, amount=Decimal("5.00"), category=cls.categories[category],
+                date=datetime.date(2025, 5, day), description=description,
+            )
+        Transaction.objects.create(
+            user=cls.other, amount=Decimal("5.00"), category=cls.categories["Dining"],
+            date=datetime.date(2025, 5, 1), description="Coffee",
+        )
+
+    def search(self, query, **filters):
+        response = self.client.get(reverse("list"), {"q": query, **filters}, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return [row.description for row in response.context["object_list"]]
+
+    def test_best_matches_first(self):
+        self.assertEqual(self.search("coffee"), [
+            "Coffee with coffee cake", "Coffee", "Coffee beans and filters for the office kitchen",
+        ])
+
+    def test_last_term_is_a_prefix(self):
+        self.assertEqual(sorted(self.search("co")), [
+            "Coffee", "Coffee beans and filters for the office kitchen", "Coffee with coffee cake", "Costco run",
+        ])
+        self.assertEqual(self.search("coffee ca"), ["Coffee with coffee cake"])
+        # Only the last term is a prefix
+        self.assertEqual(self.search("cof cake"), [])
+
+    def test_combines_with_the_filters(self):
+        filters = {"category": self.categories["Dining"].pk, "start_date": "2025-05-04"}
+        self.assertEqual(self.search("coffee", **filters), ["Coffee with coffee cake"])
+
+    def test_only_the_users_rows(self):
+        ids = {row.pk for row in self.rows.values()}
+        found = search_transactions(Transaction.objects.all(), "coffee", user_id=self.user.pk)
+        self.assertTrue(set(found.values_list("pk", flat=True)) <= ids)
+        self.assertEqual(found.count(), 3)
+
+    def test_index_follows_writes(self):
+        Transaction.objects.filter(pk=self.rows["Pizza night"].pk).update(description="Pizza and coffee")
+        self.rows["Coffee"].delete()
+        Transaction.objects.bulk_create([Transaction(
+            user=self.user, amount=Decimal("1.00"), base_amount=Decimal("1.00"), category=self.categories["Dining"],
+            date=datetime.date(2025, 5, 25), description="Iced coffee",
+        )])
+        self.assertEqual(sorted(self.search("coffee")), [
+            "Coffee beans and filters for the office kitchen", "Coffee with coffee cake", "Iced coffee",
+            "Pizza and coffee",
+        ])
+        self.assertEqual(self.search("pizza night"), [])
+
+    def test_suggestions(self):
+        response = self.client.get(reverse("search-suggest"), {"q": "coffee ca"}, secure=True)
+        self.assertEqual(response.json(), {"suggestions": ["Coffee with coffee cake"]})
+        response = self.client.get(reverse("search-suggest"), {"q": "!!"}, secure=True)
+        self.assertEqual(response.json(), {"suggestions": []})
+
+
+class ListCacheTests(ViewBudgetTestCase):
+    """Repeat views of the list page reuse the cached totals and first page until a write."""
+
+    tables = (Transaction._meta.db_table, MonthlyRollup._meta.db_table)
+
+    def data_queries(self, *args):
+        """Request the list page; return it and the queries that read transactions or rollups."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("list"), *args, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return response, [query["sql"] for query in queries if any(table in query["sql"] for table in self.tables)]
+
+    def test_repeat_view_runs_no_aggregate(self):
+        first, sql = self.data_queries()
+        self.assertTrue(sql)
+        second, sql = self.data_queries()
+        self.assertEqual(sql, [])
+        self.assertEqual(second.context["total_balance"], first.context["total_balance"])
+        self.assertEqual(
+            [row.pk for row in second.context["object_list"]], [row.pk for row in first.context["object_list"]],
+        )
+
+    def test_repeat_filtered_view_reuses_the_totals(self):
+        params = {"category": self.categories["Dining"].pk, "start_date": "2015-01-10"}
+        self.data_queries(params)
+        _response, sql = self.data_queries(params)
+        self.assertEqual(len(sql), 1)
+        self.assertNotIn("SUM(", sql[0].upper())
+
+    def test_writes_invalidate(self):
+        # The version bump runs once the write commits
+        before, _sql = self.data_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("create"), self.transaction_form(amount="1000.00"), secure=True)
+        self.assertEqual(response.status_code, 302)
+        after, sql = self.data_queries()
+        self.assertTrue(sql)
+        self.assertEqual(after.context["total_expense"], before.context["total_expense"] + Decimal("1000.00"))
+        self.assertEqual(after.context["object_list"][0], Transaction.objects.latest("date", "id"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("delete", args=[after.context["object_list"][0].pk]), secure=True)
+        self.assertEqual(response.status_code, 302)
+        again, sql = self.data_queries()
+        self.assertTrue(sql)
+        self.assertEqual(again.context["total_expense"], before.context["total_expense"])
+
+    def test_other_users_writes_keep_the_cache(self):
+        self.data_queries()
+        other = User.objects.create_user(username="bob", password="x")
+        with self.captureOnCommitCallbacks(execute=True):
+            Transaction.objects.create(
+                user=other, amount=Decimal("3.00"), category=self.categories["Dining"],
+                date=datetime.date(2025, 5, 1), description="Coffee",
+            )
+        _response, sql = self.data_queries()
+        self.assertEqual(sql, [])
+
+
+class ListScalingTests(PageTestCase):
+    """The list page costs the same whether the user has a hundred rows or thousands.
+
+    Totals are one conditional aggregate in the database (or read from the
+    rollups) and rows are read a page at a time, so neither the number of
+    queries nor the number of rows loaded into Python grows with the history.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.small = User.objects.create_user(username="small", password="x")
+        cls.large = User.objects.create_user(username="large", password="x")
+        rng = random.Random(0)
+        for user, count in ((cls.small, 100), (cls.large, 3000)):
+            Transaction.objects.bulk_create(generate_rows(rng, user, cls.categories, count), batch_size=2000)
+        rebuild_rollups()
+
+    def measure(self, user, params):
+        """Return `(queries, rows loaded, totals)` of `user`'s list page for `params`."""
+        self.client.force_login(user)
+        self.clear_caches()
+        loaded = []
+
+        def count(sender, instance, **kwargs):
+            loaded.append(instance)
+        post_init.connect(count, sender=Transaction)
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse("list"), params, secure=True)
+        finally:
+            post_init.disconnect(count, sender=Transaction)
+        context = response.context
+        return len(queries), len(loaded), (context["total_income"], context["total_expense"])
+
+    def expected_totals(self, user, params):
+        rows = Transaction.objects.filter(
+            user=user, date__gte=params.get("start_date", datetime.date.min),
+        ).select_related("category")
+        return (
+            sum(row.base_amount for row in rows if row.category.type == "income") or 0,
+            sum(row.base_amount for row in rows if row.category.type == "expense") or 0,
+        )
+
+    def test_cost_does_not_grow_with_rows(self):
+        start = timezone.localdate().replace(day=1) - datetime.timedelta(days=200)
+        for name, params in (("whole months", {}), ("partial month", {"start_date": str(start)})):
+            with self.subTest(name):
+                small_queries, small_rows, small_totals = self.measure(self.small, params)
+                large_queries, large_rows, large_totals = self.measure(self.large, params)
+                self.assertEqual(large_queries, small_queries)
+                self.assertLessEqual(large_rows, TransactionListView.page_size + 1)
+                self.assertEqual(small_totals, self.expected_totals(self.small, params))
+                self.assertEqual(large_totals, self.expected_totals(self.large, params))
+
+
+class KeysetPaginationTests(ViewBudgetTestCase):
+    """List pages are keyset queries: a deep page costs what the first one does."""
+
+    def get_page(self, cursor=None):
+        """Return `(response, sql)` for a list page requested with cold caches."""
+        self.clear_caches()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("list"), {"cursor": cursor} if cursor else {}, secure=True)
+        return response, [query["sql"] for query in queries.captured_queries]
+
+    def test_deep_page_runs_the_first_page_queries(self):
+        first, first_sql = self.get_page()
+        response, cursor = first, first.context["next_cursor"]
+        seen = [row.pk for row in first.context["transactions"]]
+        for _page in range(10):
+            response, sql = self.get_page(cursor)
+            self.assertEqual(len(sql), len(first_sql))
+            self.assertFalse([query for query in sql if "OFFSET" in query.upper()])
+            seen += [row.pk for row in response.context["transactions"]]
+            cursor = response.context["next_cursor"]
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(seen, list(
+            Transaction.objects.filter(user=self.user).order_by(*ORDERING).values_list("pk", flat=True)[:len(seen)]
+        ))
+
+    def test_tampered_cursor_restarts_at_the_first_page(self):
+        first = self.client.get(reverse("list"), secure=True)
+        for payload in (
+            {"f": {"start_date": "garbage"}, "d": "2026-01-01", "i": 1},
+            {"f": {"category": "99999999999999999999"}, "d": "2026-01-01", "i": 1},
+            {"d": "2026-13-01", "i": 1},
+            {"d": "2026-01-01", "i": 2 ** 64},
+            "not an object",
+        ):
+            with self.subTest(payload):
+                cursor = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+                response = self.client.get(reverse("list"), {"cursor": cursor}, secure=True)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(list(response.context["transactions"]), list(first.context["transactions"]))
+
+
+@skipUnless(connection.vendor == "sqlite", "reads SQLite's EXPLAIN QUERY PLAN output")
+class ListQueryPlanTests(ViewBudgetTestCase):
+    """The list page's row and totals queries search an index and read it in order.
+
+    No query may scan the transactions or rollups table, nor sort rows in a
+    temporary B-tree (the index must match the keyset ordering).
+    """
+
+    # Tables of the per-user list data; others (categories) are small lookups
+    tables = ("Transaction_transaction", "Transaction_monthlyrollup")
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Another user's rows make a full scan more expensive than the index
+        other = User.objects.create_user(username="bob", password="x")
+        Transaction.objects.bulk_create(generate_rows(random.Random(1), other, cls.categories, 300))
+        rebuild_rollups()
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def plans(self, params):
+        """Return `(sql, plan details)` of the list page's queries on `tables` for `params`."""
+        self.clear_caches()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("list"), params, secure=True)
+        self.assertEqual(response.status_code, 200)
+        plans = []
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                sql = query["sql"]
+                if any(f'"{table}"' in sql for table in self.tables):
+                    cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                    plans.append((sql, [row[-1] for row in cursor.fetchall()]))
+        return response, plans
+
+    def test_list_queries_use_indexes(self):
+        start = self.sample.date.replace(day=1) + datetime.timedelta(days=3)
+        first, _plans = self.plans({})
+        cases = {
+            "first page": {},
+            "partial month": {"start_date": start, "end_date": self.sample.date},
+            "category": {"category": self.categories["Dining"].pk},
+            "category and partial month": {"category": self.categories["Dining"].pk, "start_date": start},
+            "possible duplicates": {"duplicates": "on"},
+            "next page": {"cursor": first.context["next_cursor"]},
+        }
+        for name, params in cases.items():
+            with self.subTest(name):
+                _response, plans = self.plans(params)
+                self.assertTrue(plans)
+                for sql, details in plans:
+                    scans = [detail for detail in details if detail.startswith(tuple(f"SCAN {table}" for table in self.tables))]
+                    self.assertFalse(scans, sql)
+                    self.assertFalse([detail for detail in details if "TEMP B-TREE" in detail], sql)
+
+
+class FilterValidationTests(PageTestCase):
+    """Malformed list filters are ignored by the list page and rejected by the other views."""
+
+    def setUp(self):
+        super().setUp()
+        self.row = Transaction.objects.create(
+            user=self.user, amount=Decimal("4.50"), category=self.categories["Dining"],
+            date=datetime.date(2026, 1, 5), description="Coffee",
+        )
+
+    def test_list_ignores_malformed_filters(self):
+        for params in ({"start_date": "2020-13-45"}, {"q": "coffee", "start_date": "bad"}, {"category": "x"}):
+            with self.subTest(params):
+                response = self.client.get(reverse("list"), params, secure=True)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(list(response.context["transactions"]), [self.row])
+
+    def test_export_rejects_malformed_filters(self):
+        for params in ({"start_date": "2020-13-45"}, {"end_date": "2020-02-30"}, {"category": "99999999999999999999"}):
+            with self.subTest(params):
+                self.assertEqual(self.client.get(reverse("export"), params, secure=True).status_code, 400)
+
+    def test_bulk_rejects_malformed_filters(self):
+        response = self.client.post(
+            reverse("bulk"), {"action": "delete", "scope": "filter", "start_date": "bad"}, secure=True,
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(Transaction.objects.exists())
+
+
+class ExportMemoryTests(PageTestCase):
+    """Streaming an export holds one chunk of rows, however many the user has."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.small = User.objects.create_user(username="small", password="x")
+        cls.large = User.objects.create_user(username="large", password="x")
+        rng = random.Random(0)
+        for user, count in ((cls.small, 3000), (cls.large, 12000)):
+            Transaction.objects.bulk_create(generate_rows(rng, user, cls.categories, count), batch_size=2000)
+
+    def export_peak(self, user, export_format):
+        """Return `(peak traced bytes, body bytes)` of streaming `user`'s export."""
+        self.client.force_login(user)
+        response = self.client.get(reverse("export"), {"format": export_format}, secure=True)
+        self.assertTrue(response.streaming)
+        size = 0
+        tracemalloc.start()
+        try:
+            for chunk in response.streaming_content:
+                size += len(chunk)
+            _current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return peak, size
+
+    def test_peak_memory_does_not_grow_with_rows(self):
+        for export_format in ("csv", "ndjson"):
+            with self.subTest(export_format):
+                small_peak, small_size = self.export_peak(self.small, export_format)
+                large_peak, large_size = self.export_peak(self.large, export_format)
+                # Both exports span several `chunk_size` batches; four times the
+                # rows (and body) must not raise the peak noticeably
+                self.assertGreater(large_size, small_size * 3)
+                self.assertLess(large_peak, small_peak * 1.5)
+
+
+class TransactionCreateBudgetTests(ViewBudgetTestCase):
+
+    def test_form(self):
+        self.assertWithinBudget(self.client.get(reverse("create"), secure=True))
+
+    def test_repeating_in_new_month_over_budget(self):
+        # A converted amount in a month without rollups, a near duplicate two
+        # days earlier (in the previous month) and both budget thresholds
+        # crossed at once
+        date = datetime.date(2015, 3, 1)
+        Transaction.objects.create(
+            user=self.user, amount=Decimal("12.50"), currency="EUR", category=self.categories["Groceries"],
+            date=date - datetime.timedelta(days=2), description="Weekly shop",
+        )
+        self.clear_caches()
+        response = self.client.post(
+            reverse("create"), self.transaction_form(currency="EUR", date=str(date), repeat="monthly"), secure=True,
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Transaction.objects.get(date=date).possible_duplicate)
+        self.assertEqual(BudgetEvent.objects.filter(month=date).count(), 2)
+        self.assertWithinBudget(response)
+
+
+class TransactionDetailBudgetTests(ViewBudgetTestCase):
+
+    def test_flagged_duplicate(self):
+        self.sample.possible_duplicate = True
+        self.sample.save(update_fields=["possible_duplicate"])
+        self.assertWithinBudget(self.client.get(reverse("detail", args=[self.sample.pk]), secure=True))
+
+
+class TransactionUpdateBudgetTests(ViewBudgetTestCase):
+
+    def test_form(self):
+        self.assertWithinBudget(self.client.get(reverse("edit", args=[self.sample.pk]), secure=True))
+
+    def test_move_to_new_month_and_category(self):
+        response = self.client.post(
+            reverse("edit", args=[self.sample.pk]), self.transaction_form(currency="EUR", date="2015-03-10"),
+            secure=True,
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertWithinBudget(response)
+
+
+class TransactionDeleteBudgetTests(ViewBudgetTestCase):
+
+    def test_delete(self):
+        response = self.client.post(reverse("delete", args=[self.sample.pk]), secure=True)
+        self.assertEqual(response.status_code, 302)
+        self.assertWithinBudget(response)
+
+
+class TransactionBulkBudgetTests(ViewBudgetTestCase):
+
+    def test_recategorize_filtered(self):
+        response = self.client.post(reverse("bulk"), {
+            "action": "recategorize", "scope": "filter", "new_category": self.categories["Groceries"].pk,
+            "category": self.categories["Dining"].pk,
+        }, secure=True)
+        self.assertEqual(response.status_code, 302)
+        self.assertWithinBudget(response)
+
+    def test_delete_selected(self):
+        ids = list(Transaction.objects.filter(user=self.user).values_list("pk", flat=True)[:20])
+        response = self.client.post(
+            reverse("bulk"), {"action": "delete", "scope": "selected", "ids": ids}, secure=True,
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertWithinBudget(response)
+
+
+class BulkActionTests(PageTestCase):
+    """Bulk actions change exactly the matching rows and keep rollups and tombstones in step."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other = User.objects.create_user(username="bob", password="x")
+        for user in (cls.user, cls.other):
+            for day, category in ((3, "Dining"), (10, "Dining"), (40, "Dining"), (12, "Groceries")):
+                Transaction.objects.create(
+                    user=user, amount=Decimal(f"{day}.50"), category=cls.categories[category],
+                    date=datetime.date(2026, 1, 1) + datetime.timedelta(days=day), description=f"Row {day}",
+                )
+
+    def bulk(self, data):
+        response = self.client.post(reverse("bulk"), data, secure=True)
+        self.assertEqual(response.status_code, 302)
+        return response
+
+    @contextlib.contextmanager
+    def insert_during(self, name):
+        """Patch `bulk.<name>` to insert a matching Dining row of the user before it runs.
+
+        The injected insert is counted against the bulk view's query budget,
+        so the over-budget warning is expected.
+        """
+        original = getattr(bulk, name)
+
+        def insert_then_call(*args, **kwargs):
+            Transaction.objects.create(
+                user=self.user, amount=Decimal("1.00"), category=self.categories["Dining"],
+                date=datetime.date(2026, 1, 20), description="Late",
+            )
+            return original(*args, **kwargs)
+        with mock.patch.object(bulk, name, insert_then_call), self.assertLogs("mysite.performance", "WARNING"):
+            yield
+
+    def test_recategorize_filtered(self):
+        with self.insert_during("bucket_totals"):
+            self.bulk({
+                "action": "recategorize", "scope": "filter", "category": self.categories["Dining"].pk,
+                "new_category": self.categories["Groceries"].pk,
+            })
+        mine = Transaction.objects.filter(user=self.user)
+        self.assertEqual(list(mine.filter(category=self.categories["Dining"]).values_list("description", flat=True)), ["Late"])
+        self.assertEqual(mine.filter(category=self.categories["Groceries"]).count(), 4)
+        self.assertEqual(Transaction.objects.filter(user=self.other, category=self.categories["Dining"]).count(), 3)
+        self.assertEqual(rollup_rows(), aggregated_rollups())
+
+    def test_delete_filtered(self):
+        ids = set(Transaction.objects.filter(user=self.user, category=self.categories["Dining"]).values_list("pk", flat=True))
+        with self.insert_during("bucket_totals"):
+            self.bulk({"action": "delete", "scope": "filter", "category": self.categories["Dining"].pk})
+        self.assertEqual(
+            list(Transaction.objects.filter(user=self.user, category=self.categories["Dining"]).values_list("description", flat=True)),
+            ["Late"],
+        )
+        self.assertEqual(set(TransactionTombstone.objects.filter(user=self.user).values_list("transaction_id", flat=True)), ids)
+        self.assertEqual(Transaction.objects.filter(user=self.other).count(), 4)
+        self.assertEqual(rollup_rows(), aggregated_rollups())
+
+    def test_delete_selected(self):
+        ids = list(Transaction.objects.filter(user=self.user).order_by("pk").values_list("pk", flat=True)[:2])
+        self.bulk({"action": "delete", "scope": "selected", "ids": ids})
+        self.assertFalse(Transaction.objects.filter(pk__in=ids).exists())
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(sorted(TransactionTombstone.objects.values_list("transaction_id", flat=True)), ids)
+        self.assertEqual(rollup_rows(), aggregated_rollups())
+
+    def test_other_users_rows_are_not_found(self):
+        theirs = Transaction.objects.filter(user=self.other).values_list("pk", flat=True)[0]
+        response = self.client.post(
+            reverse("bulk"), {"action": "delete", "scope": "selected", "ids": [theirs]}, secure=True,
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(Transaction.objects.filter(pk=theirs).exists())
+        self.assertFalse(TransactionTombstone.objects.exists())
+
+
+class TransactionExportBudgetTests(ViewBudgetTestCase):
+
+    def test_export(self):
+        for export_format in ("csv", "ndjson"):
+            with self.subTest(export_format):
+                self.clear_caches()
+                self.assertWithinBudget(self.client.get(reverse("export"), {"format": export_format}, secure=True))
+
+
+class StatementBudgetTests(ViewBudgetTestCase):
+
+    def test_statement(self):
+        month = self.sample.date.replace(day=1) - datetime.timedelta(days=1)
+        for statement_format in ("html", "pdf"):
+            with self.subTest(statement_format):
+                self.clear_caches()
+                response = self.client.get(
+                    reverse("statement", args=[month.year, month.month]), {"format": statement_format}, secure=True,
+                )
+                self.assertWithinBudget(response)
+
+
+class StatementTests(PageTestCase):
+
+    def test_months_out_of_range_are_not_found(self):
+        for year, month in ((2026, 13), (2026, 0), (9999, 12)):
+            with self.subTest(year=year, month=month):
+                response = self.client.get(reverse("statement", args=[year, month]), secure=True)
+                self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse("statement", args=[9999, 11]), secure=True)
+        self.assertEqual(response.status_code, 200)
+
+
+class StatementCacheTests(ViewBudgetTestCase):
+    """The cache address of a statement is cheap to compute and follows every change of the month."""
+
+    def setUp(self):
+        super().setUp()
+        self.month = self.sample.date.replace(day=1)
+
+    def digest(self):
+        return statement_digest(self.user, self.month, "html")
+
+    def test_digest_does_not_read_the_rows(self):
+        self.digest()
+        with self.assertNumQueries(2):
+            self.digest()
+
+    def test_digest_follows_changes(self):
+        digests = [self.digest()]
+        self.sample.description = "Edited"
+        self.sample.save()
+        digests.append(self.digest())
+        Transaction.objects.create(
+            user=self.user, category=self.sample.category, amount=Decimal("1.00"),
+            description="Added", date=self.month,
+        )
+        digests.append(self.digest())
+        self.sample.delete()
+        digests.append(self.digest())
+        self.assertEqual(len(set(digests)), len(digests))
+        self.assertEqual(self.digest(), digests[-1])
+
+    def test_store_keeps_the_current_version(self):
+        prefix = _cache_prefix(self.user, self.month)
+        for name in (f"{prefix}/old.html", f"{prefix}/old.pdf"):
+            default_storage.save(name, io.BytesIO(b"old"))
+        name, exists = cached_statement(self.user, self.month, "html")
+        self.assertFalse(exists)
+        # Two requests generating the same version at once
+        first, second = _store(name, iter([b"new"])), _store(name, iter([b"new"]))
+        next(first), next(second)
+        for chunks in (first, second):
+            self.assertEqual(list(chunks), [])
+
+        self.assertEqual(cached_statement(self.user, self.month, "html"), (name, True))
+        _dirs, files = default_storage.listdir(prefix)
+        self.assertEqual(sorted(files), sorted([name.rsplit("/", 1)[1], "old.pdf"]))
+
+
+class BudgetViewBudgetTests(ViewBudgetTestCase):
+
+    def test_page(self):
+        self.assertWithinBudget(self.client.get(reverse("budgets"), secure=True))
+
+    def test_save(self):
+        data = {f"budget_{category.pk}": "100.00" for category in self.categories.values() if category.type == "expense"}
+        response = self.client.post(reverse("budgets"), data, secure=True)
+        self.assertEqual(response.status_code, 302)
+        self.assertWithinBudget(response)
+
+
+class SuggestBudgetTests(ViewBudgetTestCase):
+
+    def test_search_suggestions(self):
+        self.assertWithinBudget(self.client.get(reverse("search-suggest"), {"q": "co"}, secure=True))
+
+    def test_category_suggestions(self):
+        response = self.client.get(reverse("category-suggest"), {"description": "coffee", "type": "expense"}, secure=True)
+        self.assertWithinBudget(response)
+
+
+class TransactionAnalyticsBudgetTests(ViewBudgetTestCase):
+
+    def test_analytics(self):
+        for period in ("day", "week", "month"):
+            with self.subTest(period):
+                self.clear_caches()
+                response = self.client.get(
+                    reverse("analytics"), {"period": period, "category": self.categories["Dining"].pk}, secure=True,
+                )
+                self.assertWithinBudget(response)
+
+
+class AnalyticsTests(TestCase):
+    """`spending_analytics` against a plain Python computation over the rows.
+
+    SQLite runs the window function queries; the fallback (grouped rows summed
+    up with NumPy, or plain Python without it) must give the same numbers.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categories = ensure_categories()
+        cls.user = User.objects.create_user(username="alice", password="x")
+        other = User.objects.create_user(username="bob", password="x")
+        rng = random.Random(3)
+        for user in (cls.user, other):
+            Transaction.objects.bulk_create(generate_rows(rng, user, cls.categories, 400, years=2))
+        rebuild_rollups()
+        cls.rows = [
+            (row.date, round(row.base_amount * 100), row.category.type, row.category_id)
+            for row in Transaction.objects.filter(user=cls.user).select_related("category")
+        ]
+
+    def setUp(self):
+        invalidate_categories()
+
+    def expected(self, period, start=None, end=None, category_id=None):
+        """The analytics result, computed row by row."""
+        if start is not None:
+            start = analytics.bucket_start(start, period)
+        rows = [
+            row for row in self.rows
+            if (end is None or row[0] <= end) and (category_id is None or row[3] == category_id)
+        ]
+        buckets = {}
+        for date, cents, category_type, _category_id in rows:
+            income_expense = buckets.setdefault(analytics.bucket_start(date, period), [0, 0])
+            income_expense[category_type == "expense"] += cents
+        series = {"bucket": [], "income": [], "expense": [], "net": [], "balance": []}
+        balance = 0
+        for bucket, (income, expense) in sorted(buckets.items()):
+            balance += income - expense
+            if start is None or bucket >= start:
+                for key, value in zip(series, (bucket.isoformat(), income, expense, income - expense, balance)):
+                    series[key].append(value if key == "bucket" else value / 100)
+
+        categories = {}
+        for date, cents, _category_type, row_category_id in rows:
+            if start is None or date >= start:
+                totals = categories.setdefault(row_category_id, {})
+                bucket = analytics.bucket_start(date, period)
+                totals[bucket] = totals.get(bucket, 0) + cents
+        names = {category.pk: category for category in self.categories.values()}
+        categories = [
+            {
+                "id": pk, "name": names[pk].name, "type": names[pk].type,
+                "bucket": [bucket.isoformat() for bucket in sorted(totals)],
+                "total": [totals[bucket] / 100 for bucket in sorted(totals)],
+            }
+            for pk, totals in sorted(categories.items())
+        ]
+
+        daily = {}
+        for date, cents, category_type, _category_id in rows:
+            daily[date] = daily.get(date, 0) + (cents if category_type == "expense" else 0)
+        days = [day for day in sorted(daily) if start is None or day >= start]
+        trailing = [
+            sum(cents for date, cents in daily.items() if day - datetime.timedelta(days=30) < date <= day)
+            for day in days
+        ]
+        return {
+            "period": period,
+            "series": series,
+            "categories": categories,
+            "rolling": {
+                "date": [day.isoformat() for day in days],
+                "expense": [daily[day] / 100 for day in days],
+                "average": [round(total / analytics.ROLLING_DAYS / 100, 2) for total in trailing],
+            },
+        }
+
+    def cases(self):
+        today = timezone.localdate()
+        first = (today - datetime.timedelta(days=200)).replace(day=1)
+        last = today.replace(day=1) - datetime.timedelta(days=1)
+        dining = self.categories["Dining"].pk
+        for period in analytics.PERIODS:
+            yield period, None, None, None
+            yield period, today - datetime.timedelta(days=100), None, None
+            # Whole months: read from the rollups by month
+            yield period, first, last, None
+            yield period, first, last, dining
+            yield period, today - datetime.timedelta(days=250), today - datetime.timedelta(days=40), dining
+
+    def test_matches_the_rows(self):
+        for case in self.cases():
+            with self.subTest(case):
+                self.assertEqual(analytics.spending_analytics(self.user, *case), self.expected(*case))
+
+    def test_known_values(self):
+        user = User.objects.create_user(username="carol", password="x")
+        for date, amount, category in (
+            ("2025-01-30", "1000.00", "Salary"), ("2025-01-31", "10.00", "Dining"),
+            ("2025-02-01", "20.50", "Groceries"), ("2025-03-05", "3.00", "Dining"),
+        ):
+            Transaction.objects.create(
+                user=user, amount=Decimal(amount), category=self.categories[category], date=date, description="Row",
+            )
+        result = analytics.spending_analytics(user, "month")
+        self.assertEqual(result["series"], {
+            "bucket": ["2025-01-01", "2025-02-01", "2025-03-01"],
+            "income": [1000.0, 0.0, 0.0], "expense": [10.0, 20.5, 3.0], "net": [990.0, -20.5, -3.0],
+            "balance": [990.0, 969.5, 966.5],
+        })
+        # Mar 5 is 32 days after Feb 1, so its 30-day window holds only itself
+        self.assertEqual(result["rolling"], {
+            "date": ["2025-01-30", "2025-01-31", "2025-02-01", "2025-03-05"],
+            "expense": [0.0, 10.0, 20.5, 3.0],
+            "average": [0.0, 0.33, 1.02, 0.1],
+        })
+
+    def test_fallbacks_match_the_window_functions(self):
+        windowed = {case: analytics.spending_analytics(self.user, *case) for case in self.cases()}
+        paths = {"numpy": analytics.np} if analytics.np is not None else {}
+        paths["python"] = None
+        for name, np in paths.items():
+            with (
+                self.subTest(name),
+                mock.patch.object(connection.features, "supports_over_clause", False),
+                mock.patch.object(analytics, "np", np),
+            ):
+                self.assertFalse(analytics._window_frames_supported())
+                for case, result in windowed.items():
+                    self.assertEqual(analytics.spending_analytics(self.user, *case), result, case)
+
+
+class AsyncReadViewTests(PageTestCase):
+    """With `ASYNC_READ_VIEWS` the list, detail and analytics pages are served
+    by the async views, with the same results as the sync ones."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        other = User.objects.create_user(username="bob", password="x")
+        for user in (cls.user, other):
+            for day in range(1, 30):
+                Transaction.objects.create(
+                    user=user, amount=Decimal(f"{day}.10"), category=cls.categories["Groceries" if day % 3 else "Salary"],
+                    date=datetime.date(2025, 3, day), description=f"Row {day}",
+                )
+        cls.sample = Transaction.objects.filter(user=cls.user).latest("date")
+        cls.sample.possible_duplicate = True
+        cls.sample.save(update_fields=["possible_duplicate"])
+
+    def setUp(self):
+        super().setUp()
+        self.async_client.force_login(self.user)
+
+    @contextlib.contextmanager
+    def async_routes(self):
+        """Route the read paths to the async views; `urls.py` picks them when imported."""
+        def route():
+            importlib.reload(transaction_urls)
+            importlib.reload(project_urls)
+            clear_url_caches()
+        try:
+            with override_settings(ASYNC_READ_VIEWS=True):
+                route()
+                yield
+        finally:
+            route()
+
+    def both(self, name, *args, data=None):
+        """Request a page through the sync and then the async view, with cold caches for each."""
+        url = reverse(name, args=args)
+        sync_response = self.client.get(url, data, secure=True)
+        self.assertEqual(sync_response.status_code, 200)
+        self.clear_caches()
+        with self.async_routes():
+            self.assertTrue(resolve(url).func.view_class.__name__.startswith("Async"))
+            async_response = async_to_sync(self.async_client.get)(url, data, secure=True)
+        self.assertEqual(async_response.status_code, 200)
+        return sync_response, async_response
+
+    def assertSameList(self, sync_response, async_response):
+        for response in (sync_response, async_response):
+            self.assertTrue(all(row.user_id == self.user.pk for row in response.context["object_list"]))
+        keys = ("total_income", "total_expense", "budgets", "next_cursor", "is_first_page")
+        self.assertEqual(
+            [row.pk for row in async_response.context["object_list"]],
+            [row.pk for row in sync_response.context["object_list"]],
+        )
+        self.assertEqual(
+            {key: async_response.context[key] for key in keys}, {key: sync_response.context[key] for key in keys},
+        )
+
+    def test_list(self):
+        sync_response, async_response = self.both("list")
+        self.assertIsNotNone(sync_response.context["next_cursor"])
+        self.assertSameList(sync_response, async_response)
+
+    def test_filtered_list(self):
+        self.assertSameList(*self.both(
+            "list", data={"category": self.categories["Groceries"].pk, "start_date": "2025-03-05"},
+        ))
+
+    def test_search(self):
+        self.assertSameList(*self.both("list", data={"q": "Row"}))
+
+    def test_detail(self):
+        sync_response, async_response = self.both("detail", self.sample.pk)
+        self.assertEqual(async_response.context["object"], self.sample)
+        self.assertEqual(
+            list(async_response.context["duplicate_matches"]), list(sync_response.context["duplicate_matches"]),
+        )
+
+    def test_detail_of_another_user_is_not_found(self):
+        other = Transaction.objects.exclude(user=self.user).first()
+        with self.async_routes():
+            response = async_to_sync(self.async_client.get)(reverse("detail", args=[other.pk]), secure=True)
+        self.assertEqual(response.status_code, 404)
+
+    def test_analytics(self):
+        for period in ("day", "week", "month"):
+            with self.subTest(period=period):
+                self.clear_caches()
+                sync_response, async_response = self.both("analytics", data={"period": period})
+                self.assertEqual(json.loads(async_response.content), json.loads(sync_response.content))
+
+    def test_analytics_revalidation(self):
+        url = reverse("analytics")
+        with self.async_routes():
+            etag = async_to_sync(self.async_client.get)(url, secure=True)["ETag"]
+            response = async_to_sync(self.async_client.get)(url, secure=True, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+
+
+class APIBudgetTestCase(ViewBudgetTestCase):
+    """Requests authenticate with an API token, like the API's clients."""
+
+    def setUp(self):
+        super().setUp()
+        token = Token.objects.create(user=self.user)
+        self.client.defaults["HTTP_AUTHORIZATION"] = f"Token {token.key}"
+
+
+class TransactionAPIBudgetTests(APIBudgetTestCase):
+
+    def test_list(self):
+        response = self.client.get(reverse("api-transactions"), secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinBudget(response)
+
+    def test_sparse_fields(self):
+        response = self.client.get(reverse("api-transactions"), {"fields": "id,amount,category"}, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinBudget(response)
+
+
+class TransactionAPITests(APIBudgetTestCase):
+
+    def test_malformed_filters_are_rejected(self):
+        for params in ({"start_date": "bad"}, {"end_date": "2020-13-45"}, {"category": "x"}):
+            with self.subTest(params):
+                response = self.client.get(reverse("api-transactions"), params, secure=True)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(list(response.json()), list(params))
+
+    def test_etag_revalidation(self):
+        url = reverse("api-transactions")
+        etag = self.client.get(url, secure=True)["ETag"]
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, secure=True)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+        # An edit keeps the row count and the newest added_on
+        self.sample.description = "Edited"
+        self.sample.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["results"][0]["description"], "Edited")
+
+
+class SyncTests(TestCase):
+    """Watermark paging, tombstones and last-write-wins uploads (`sync.py`).
+
+    The clock is frozen and moved by hand; every write stamps `updated_at`
+    with it.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categories = ensure_categories()
+        cls.user = User.objects.create_user(username="alice", password="x")
+        cls.other = User.objects.create_user(username="bob", password="x")
+
+    def setUp(self):
+        self.now = datetime.datetime(2026, 3, 1, 12, tzinfo=datetime.UTC)
+        self.enterContext(mock.patch("django.utils.timezone.now", side_effect=lambda: self.now))
+
+    def tick(self, seconds=1):
+        self.now += datetime.timedelta(seconds=seconds)
+
+    def settle(self):
+        """Move past the window of recent changes that every delta re-sends."""
+        self.tick(settings.SYNC_SETTLE_SECONDS + 1)
+
+    def create(self, description, user=None):
+        self.tick()
+        return Transaction.objects.create(
+            user=user or self.user, amount=Decimal("10.00"), category=self.categories["Groceries"],
+            date=datetime.date(2026, 2, 1), description=description,
+        )
+
+    def sync(self, watermark=None, limit=None):
+        """Follow the pages of one delta; return `(changed ids, deleted ids, watermark, resets)`."""
+        changed, deleted, resets = [], [], []
+        while True:
+            page = sync.changes(self.user.pk, watermark, limit)
+            changed += [row.pk for row in page.rows]
+            deleted += page.deleted
+            resets.append(page.reset)
+            watermark = page.watermark
+            if not page.has_more:
+                return changed, deleted, watermark, resets
+
+    def upsert(self, row, when, **changes):
+        return {
+            "id": row.pk, "amount": Decimal("10.00"), "currency": "USD", "category": row.category_id,
+            "date": row.date, "description": row.description, "updated_at": when, **changes,
+        }
+
+    def test_first_sync_pages_through_everything_once(self):
+        rows = [self.create(f"Row {index}") for index in range(7)]
+        self.create("Not mine", user=self.other)
+        self.settle()
+        changed, deleted, _watermark, resets = self.sync(limit=3)
+        self.assertEqual(changed, [row.pk for row in rows])
+        self.assertEqual(deleted, [])
+        self.assertEqual(resets, [True, False, False])
+
+    def test_delta_has_edits_and_tombstones_in_change_order(self):
+        rows = [self.create(f"Row {index}") for index in range(4)]
+        self.settle()
+        _changed, _deleted, watermark, _resets = self.sync()
+
+        self.tick()
+        rows[2].description = "Edited"
+        rows[2].save()
+        self.tick()
+        gone = rows[0].pk
+        rows[0].delete()
+        self.tick()
+        bulk.delete_transactions(self.user.pk, Transaction.objects.filter(pk=rows[3].pk), self.now)
+        self.settle()
+
+        page = sync.changes(self.user.pk, watermark)
+        self.assertEqual([row.description for row in page.rows], ["Edited"])
+        self.assertEqual(page.deleted, [gone, rows[3].pk])
+        self.assertFalse(page.reset)
+        # Nothing is left once the changes have settled
+        self.settle()
+        self.assertEqual(self.sync(page.watermark)[:2], ([], []))
+
+    def test_recent_changes_are_sent_again(self):
+        row = self.create("Fresh")
+        first = sync.changes(self.user.pk)
+        self.assertEqual([r.pk for r in first.rows], [row.pk])
+        self.tick()
+        # Still inside the settle window: a commit may be pending just before it
+        self.assertEqual([r.pk for r in sync.changes(self.user.pk, first.watermark).rows], [row.pk])
+
+    def test_watermark_older_than_the_tombstones_resets(self):
+        rows = [self.create(f"Row {index}") for index in range(2)]
+        self.settle()
+        watermark = self.sync()[2]
+        self.tick(settings.SYNC_TOMBSTONE_DAYS * 86400 + 1)
+        changed, deleted, _watermark, resets = self.sync(watermark)
+        self.assertEqual((changed, deleted, resets), ([row.pk for row in rows], [], [True]))
+
+    def test_malformed_watermark(self):
+        with self.assertRaises(ValueError):
+            sync.changes(self.user.pk, "not-a-watermark")
+
+    def test_last_write_wins(self):
+        client_edit = self.now + datetime.timedelta(seconds=30)
+        stale, fresh, doomed, kept = (self.create(f"Row {index}") for index in range(4))
+        self.now = client_edit + datetime.timedelta(seconds=30)
+        # Edited on the server after the client's change: the server copy wins
+        stale.description = "Server"
+        stale.save()
+        kept.description = "Server"
+        kept.save()
+
+        result = sync.apply_changes(
+            self.user.pk,
+            [
+                self.upsert(stale, client_edit, description="Client"),
+                self.upsert(fresh, client_edit, description="Client", amount=Decimal("12.00")),
+                self.upsert(fresh, client_edit, id=10**9),
+            ],
+            [{"id": doomed.pk, "deleted_at": client_edit}, {"id": kept.pk, "deleted_at": client_edit}],
+        )
+        self.assertEqual(result.updated, [fresh.pk])
+        self.assertEqual(result.deleted, [doomed.pk])
+        self.assertEqual(sorted(result.conflicts, key=lambda conflict: conflict["id"]), [
+            {"id": stale.pk, "reason": "stale"}, {"id": kept.pk, "reason": "stale"}, {"id": 10**9, "reason": "missing"},
+        ])
+        self.assertEqual(
+            dict(Transaction.objects.values_list("pk", "description")),
+            {stale.pk: "Server", fresh.pk: "Client", kept.pk: "Server"},
+        )
+        fresh.refresh_from_db()
+        self.assertEqual((fresh.base_amount, fresh.updated_at), (Decimal("12.00"), self.now))
+        self.assertTrue(TransactionTombstone.objects.filter(transaction_id=doomed.pk, deleted_at=self.now).exists())
+        self.assertEqual(rollup_rows(), aggregated_rollups())
+
+    def test_future_client_times_count_as_now(self):
+        row = self.create("Row")
+        self.tick()
+        result = sync.apply_changes(
+            self.user.pk, [self.upsert(row, self.now + datetime.timedelta(days=365), description="Future")], [],
+        )
+        self.assertEqual(result.updated, [row.pk])
+        self.tick()
+        row.description = "Server"
+        row.save()
+        # The stored edit time is the server's, so a later server edit still wins
+        result = sync.apply_changes(self.user.pk, [self.upsert(row, self.now - datetime.timedelta(seconds=1))], [])
+        self.assertEqual(result.conflicts, [{"id": row.pk, "reason": "stale"}])
+
+    def test_repeated_uploads_are_idempotent(self):
+        client_id = uuid.uuid4()
+        item = {
+            "client_id": client_id, "amount": Decimal("3.50"), "currency": "USD",
+            "category": self.categories["Dining"].pk, "date": datetime.date(2026, 2, 3),
+            "description": "Coffee", "updated_at": self.now,
+        }
+        first = sync.apply_changes(self.user.pk, [item], [])
+        row = self.create("Row")
+        second = sync.apply_changes(self.user.pk, [item], [{"id": row.pk, "deleted_at": self.now}])
+        again = sync.apply_changes(self.user.pk, [item], [{"id": row.pk, "deleted_at": self.now}])
+        self.assertEqual(first.created, second.created)
+        self.assertEqual(again.created, first.created)
+        self.assertEqual((second.deleted, again.deleted), ([row.pk], [row.pk]))
+        self.assertEqual(Transaction.objects.filter(client_id=client_id).count(), 1)
+        self.assertEqual(TransactionTombstone.objects.filter(transaction_id=row.pk).count(), 1)
+        self.assertEqual(rollup_rows(), aggregated_rollups())
+
+    def test_other_users_rows_cannot_be_changed(self):
+        theirs = self.create("Theirs", user=self.other)
+        self.tick()
+        result = sync.apply_changes(
+            self.user.pk, [self.upsert(theirs, self.now, description="Mine")],
+            [{"id": theirs.pk, "deleted_at": self.now}],
+        )
+        self.assertEqual(result.conflicts, [{"id": theirs.pk, "reason": "missing"}])
+        theirs.refresh_from_db()
+        self.assertEqual(theirs.description, "Theirs")
+        self.assertFalse(TransactionTombstone.objects.exists())
+
+
+class TransactionSyncBudgetTests(APIBudgetTestCase):
+
+    def test_changes(self):
+        response = self.client.get(reverse("api-sync"), secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinBudget(response)
+
+    def test_upload(self):
+        now = timezone.now().isoformat()
+        rows = list(Transaction.objects.filter(user=self.user).order_by("pk")[:20])
+        upserts = [
+            {"client_id": str(uuid.uuid4()), "amount": "5.00", "category": self.categories["Groceries"].pk,
+             "date": "2015-03-10", "description": f"Offline {index}", "updated_at": now}
+            for index in range(10)
+        ] + [
+            {"id": row.pk, "amount": "7.00", "category": self.categories["Groceries"].pk,
+             "date": "2015-04-10", "description": row.description, "updated_at": now}
+            for row in rows[:10]
+        ]
+        deletes = [{"id": row.pk, "deleted_at": now} for row in rows[10:]]
+        response = self.client.post(
+            reverse("api-sync"), {"upserts": upserts, "deletes": deletes}, content_type="application/json", secure=True,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinBudget(response)
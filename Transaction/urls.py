@@ -1,16 +1,54 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, views
+
+# Read paths are served by async views under ASGI (see async_views.py)
+if settings.ASYNC_READ_VIEWS:
+    from . import async_views
+    list_view = async_views.AsyncTransactionListView
+    detail_view = async_views.AsyncTransactionDetailView
+    analytics_view = async_views.AsyncTransactionAnalyticsView
+else:
+    list_view = views.TransactionListView
+    detail_view = views.TransactionDetailView
+    analytics_view = views.TransactionAnalyticsView
 
 urlpatterns = [
-    path("list/", views.TransactionListView.as_view(), name="list"),
+    path("list/", list_view.as_view(), name="list"),
     path("home/", views.homepageView.as_view(), name="homepage"),
     
     path("create", views.TransactionCreateView.as_view(), name="create"),
     
-    path("detail/<int:pk>/", views.TransactionDetailView.as_view(), name="detail"),
+    path("detail/<int:pk>/", detail_view.as_view(), name="detail"),
     
     path("edit/<int:pk>/", views.TransactionUpdateView.as_view(), name="edit"),
   
     path("delete/<int:pk>/", views.TransactionDeleteView.as_view(), name="delete"),
+
+    path("bulk/", views.TransactionBulkView.as_view(), name="bulk"),
+
+    path("export/", views.TransactionExportView.as_view(), name="export"),
+
+    path("import/", views.TransactionImportView.as_view(), name="import"),
+
+    path("budgets/", views.BudgetView.as_view(), name="budgets"),
+
+    path("recurring/", views.RecurringRuleListView.as_view(), name="recurring"),
+
+    path("recurring/<int:pk>/end/", views.RecurringRuleEndView.as_view(), name="recurring-end"),
+
+    path("recurring/<int:pk>/delete/", views.RecurringRuleDeleteView.as_view(), name="recurring-delete"),
+
+    path("statements/<int:year>/<int:month>/", views.StatementView.as_view(), name="statement"),
+
+    path("analytics/", analytics_view.as_view(), name="analytics"),
+
+    path("search/suggest/", views.TransactionSearchSuggestView.as_view(), name="search-suggest"),
+
+    path("categories/suggest/", views.TransactionCategorySuggestView.as_view(), name="category-suggest"),
+
+    path("api/transactions/", api.TransactionListAPIView.as_view(), name="api-transactions"),
+
+    path("api/sync/", api.TransactionSyncAPIView.as_view(), name="api-sync"),
     
 ]
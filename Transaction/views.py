@@ -7,17 +7,50 @@ consistently filter queryset by the currently authenticated user to avoid
 information leakage.
 """
 
+import csv
+import datetime
+import hashlib
+import io
+import json
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from django.db import transaction
+from django.db.models import F, Q, Sum
 from django.contrib.auth.decorators import login_required   
 
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView
-from django.views.generic import TemplateView
+from django.views.generic import FormView, TemplateView, View
 from django.contrib.auth.mixins import LoginRequiredMixin
-from .models import Category, Transaction  # Import the models we defined
+from mysite.ratelimit import ratelimit
+from .models import Budget, BudgetEvent, RecurringRule, Transaction  # Import the models we defined
 from django.contrib.auth.decorators import login_required
+from . import bulk
+from .analytics import PERIODS, spending_analytics
+from .budgets import budget_status, save_limits
+from .cache import USER_CACHE_TTL, get_categories, get_categories_by_type, user_cache_key
+from .currency import base_currency
+from .duplicates import find as find_duplicates
 from .form import TransactionForm
-from .form import TransactionFilterForm
+from .form import BudgetForm, TransactionBulkForm, TransactionFilterForm, TransactionImportForm
+from .images import enqueue_receipt, stage_upload
+from .importer import import_transactions
+from .rollups import month_range_totals
+from .recurring import end_rule, start_rule
+from .pagination import FILTER_KEYS, ORDERING, decode_cursor, encode_cursor, invalid_filters, keyset_page
+from .search import search_page, search_terms, search_transactions
+from .suggest import suggest as suggest_categories
+from .statements import FORMATS as STATEMENT_FORMATS, month_bounds, statement_chunks
 
 # Updated views: these use TransactionForm and pass the request.user into the form kwargs.
 
@@ -31,6 +64,42 @@ class homepageView(TemplateView):
     template_name = 'transaction/homepage.html'
 
 
+def filter_transactions(qs, params, user_id=None):
+    """Apply the `TransactionFilterForm` parameters to a Transaction queryset.
+
+    `params` is a mapping with optional `start_date`, `end_date`, `category`,
+    `q` (full-text search, see `search.py`) and `duplicates` (only possible
+    duplicates) string values (from GET or a pagination cursor), already
+    checked with `pagination.invalid_filters`. `user_id` scopes the search
+    index lookup to the owner's rows.
+    """
+    start = params.get('start_date')
+    end = params.get('end_date')
+    category = params.get('category')
+    query = params.get('q')
+
+    if params.get('duplicates'):
+        qs = qs.filter(possible_duplicate=True)
+    if start:
+        qs = qs.filter(date__gte=start)
+    if end:
+        qs = qs.filter(date__lte=end)
+    if category:
+        qs = qs.filter(category_id=int(category))
+    if query:
+        qs = search_transactions(qs, query, user_id=user_id)
+
+    return qs
+
+
+def totals_aggregates():
+    """Aggregate kwargs summing a Transaction queryset into income and expense (base currency)."""
+    return {
+        'income': Sum('base_amount', filter=Q(category__type='income'), default=0),
+        'expense': Sum('base_amount', filter=Q(category__type='expense'), default=0),
+    }
+
+
 class TransactionListView(LoginRequiredMixin, ListView):
     """List transactions belonging to the current user.
 
@@ -38,72 +107,212 @@ class TransactionListView(LoginRequiredMixin, ListView):
     - model: Transaction
     - template_name: template used to render the list
     - context_object_name: name used in template for the queryset
+    - page_size: number of rows rendered per page
+    - performance_budget: limits enforced by `mysite.middleware.PerformanceMiddleware`
 
     The `get_queryset` method filters results to the authenticated user.
+    Rows are paginated with an opaque keyset cursor (see `pagination.py`)
+    passed as the `cursor` GET parameter; the cursor also carries the active
+    filters. Summary totals always cover the whole filtered set. With a
+    search query (`q`) rows are ordered by relevance and paged by offset.
     """
     model = Transaction
     template_name = 'transaction/transaction_list.html'
     context_object_name = 'transactions'
     login_url = 'login'
+    page_size = 25
+    # Searches take two more: the index ranks and the ranked page's rows
+    performance_budget = {'queries': 9}
+
+    def get_filter_params(self):
+        """Return the active filter parameters and the cursor position.
+
+        When a valid `cursor` is present its embedded filters win over the
+        query string; otherwise filters are read from GET and the list starts
+        at the first page.
+        """
+        if not hasattr(self, '_filter_params'):
+            decoded = None
+            token = self.request.GET.get('cursor')
+            if token:
+                decoded = decode_cursor(token)
+            if decoded and isinstance(decoded[0], int) != bool(decoded[1].get('q')):
+                # Offsets belong to ranked search pages, keysets to the rest
+                decoded = None
+            if decoded:
+                self._position, self._filter_params = decoded
+            else:
+                self._position = None
+                self._filter_params = {
+                    key: self.request.GET[key] for key in FILTER_KEYS if self.request.GET.get(key)
+                }
+                # Malformed values are ignored, like an empty filter field
+                for key in invalid_filters(self._filter_params):
+                    del self._filter_params[key]
+                # A query without any searchable word is no search at all
+                if not search_terms(self._filter_params.get('q', '')):
+                    self._filter_params.pop('q', None)
+        return self._filter_params
 
     def get_queryset(self):
         """Return only transactions owned by the current user."""
         qs = Transaction.objects.filter(user=self.request.user).select_related('category')
 
-        # Apply filters from GET parameters (start_date, end_date, category)
-        start = self.request.GET.get('start_date')
-        end = self.request.GET.get('end_date')
-        category = self.request.GET.get('category')
-
-        if start:
-            qs = qs.filter(date__gte=start)
-        if end:
-            qs = qs.filter(date__lte=end)
-        if category:
-            try:
-                cat_id = int(category)
-                qs = qs.filter(category_id=cat_id)
-            except (ValueError, TypeError):
-                pass
-
-        return qs
+        # Apply filters (start_date, end_date, category, q) from GET or the cursor
+        return filter_transactions(qs, self.get_filter_params(), user_id=self.request.user.pk)
+
+    def get_totals(self, queryset):
+        """Return `(income, expense)` for the filtered set, cached per user.
+
+        Entries are keyed by the user's cache version (see `cache.py`), so any
+        write to the user's transactions makes them unreachable.
+        """
+        params = self.get_filter_params()
+        key = user_cache_key(self.request.user.pk, 'totals', urlencode(sorted(params.items())))
+        totals = cache.get(key)
+        if totals is None:
+            totals = self.compute_totals(queryset, params)
+            cache.set(key, totals, USER_CACHE_TTL)
+        return totals
+
+    def compute_totals(self, queryset, params):
+        """Return income and expense sums for `queryset` in one aggregate query.
+
+        Ranges made of whole months (including no date filter at all) are
+        answered from `MonthlyRollup` without touching raw rows, unless a
+        search or the duplicates filter narrows the rows. Otherwise the conditional `Sum` runs over the
+        filtered transactions in the database. Ordering is cleared because it has no effect on the aggregate and only
+        adds a sort to the query plan.
+        """
+        totals = None
+        if not params.get('q') and not params.get('duplicates'):
+            totals = month_range_totals(self.request.user, *self.totals_range(params))
+        if totals is not None:
+            return totals
+
+        totals = queryset.order_by().aggregate(**totals_aggregates())
+        return totals['income'], totals['expense']
+
+    def totals_range(self, params):
+        """Return the `(start, end, category_id)` arguments for the rollup totals."""
+        try:
+            category_id = int(params['category']) if params.get('category') else None
+        except ValueError:
+            category_id = None
+        return params.get('start_date'), params.get('end_date'), category_id
+
+    def get_page(self, params):
+        """Return `(rows, has_next)` for the current page.
+
+        The unfiltered first page is the most common view and is cached per
+        user; other pages are cheap keyset queries. Search pages are ranked.
+        """
+        if params.get('q'):
+            return search_page(self.object_list, params['q'], self.request.user.pk, self._position or 0, self.page_size)
+        if params or self._position is not None:
+            return keyset_page(self.object_list, self._position, self.page_size)
+        key = user_cache_key(self.request.user.pk, 'first-page', self.page_size)
+        page = cache.get(key)
+        if page is None:
+            page = keyset_page(self.object_list, None, self.page_size)
+            cache.set(key, page, USER_CACHE_TTL)
+        return page
 
     def get_context_data(self, **kwargs):
-        """Add total_balance to context for display."""
-        context = super().get_context_data(**kwargs)
-        transactions = context.get('transactions', [])
-
-        income = sum(
-            t.amount for t in transactions
-            if getattr(t, 'category', None) and t.category.type == 'income'
-        )
-        expense = sum(
-            t.amount for t in transactions
-            if getattr(t, 'category', None) and t.category.type == 'expense'
-        )
+        """Add the current page, pagination links and totals to the context."""
+        params = self.get_filter_params()
+        page = self.get_page(params)
+        totals = self.get_totals(self.object_list)
+        # Budgets of the current month (cached with the user's other data)
+        budgets = budget_status(self.request.user.pk, timezone.localdate().replace(day=1))
+        return self.build_context(params, page, totals, budgets, base_currency(self.request.user.pk), **kwargs)
+
+    def build_context(self, params, page, totals, budgets, currency, **kwargs):
+        """Assemble the template context from already loaded data.
+
+        Shared with `async_views.AsyncTransactionListView`, which loads the
+        page, totals and budgets concurrently. Issues no query once the
+        category cache is warm. `totals` and `budgets` are amounts in the
+        user's base currency `currency`.
+        """
+        rows, has_next = page
+        context = super().get_context_data(object_list=rows, **kwargs)
+        income, expense = totals
 
         context['total_balance'] = income - expense
         context['total_income'] = income
         context['total_expense'] = expense
+        context['base_currency'] = currency
+
+        # Add filter form populated from the active filters and list of categories for the filters partial
+        context['filter_form'] = TransactionFilterForm(params or None)
+        context['all_categories'] = get_categories()
+        # Bulk actions post the active filters back for "all matching" actions
+        context['bulk_form'] = TransactionBulkForm()
+        context['filter_params'] = params
+
+        # Keyset pagination links; "first page" keeps the active filters
+        if not has_next:
+            context['next_cursor'] = None
+        elif params.get('q'):
+            context['next_cursor'] = encode_cursor(None, params, offset=(self._position or 0) + len(rows))
+        else:
+            context['next_cursor'] = encode_cursor(rows[-1], params)
+        context['first_page_query'] = urlencode(params)
+        context['is_first_page'] = self._position is None
+        context['budgets'] = budgets
+        context['statement_month'] = timezone.localdate().replace(day=1) - datetime.timedelta(days=1)
+
+        return context
 
-        # Add filter form populated from GET and list of categories for the filters partial
-        context['filter_form'] = TransactionFilterForm(self.request.GET or None)
-        context['all_categories'] = Category.objects.all()
 
+class ReceiptUploadMixin:
+    """Hand uploaded receipt images to the background pipeline.
+
+    Used by the create and update views. A newly uploaded file is staged on
+    local disk instead of being written to media storage during the request;
+    the previous image (if any) stays in place until the worker has produced
+    the recompressed image and thumbnail (see `images.py`). Clearing the image
+    also clears its thumbnail.
+    """
+
+    def form_valid(self, form):
+        """Stage a new upload, save the Transaction, then queue processing."""
+        upload = form.cleaned_data.get('image')
+        staged_name = None
+        if isinstance(upload, UploadedFile):
+            staged_name = stage_upload(upload)
+            form.instance.image = form.initial.get('image') or None
+        elif upload is False:
+            form.instance.thumbnail = None
+
+        response = super().form_valid(form)
+        if staged_name:
+            enqueue_receipt(self.object.pk, staged_name)
+        return response
+
+    def get_context_data(self, **kwargs):
+        """Expose the upload size limit to the form template."""
+        context = super().get_context_data(**kwargs)
+        context['receipt_max_upload_size'] = settings.RECEIPT_MAX_UPLOAD_SIZE
         return context
 
 
-class TransactionCreateView(LoginRequiredMixin, CreateView):
+@method_decorator(ratelimit('create'), name='post')
+class TransactionCreateView(LoginRequiredMixin, ReceiptUploadMixin, CreateView):
     """Create a new Transaction for the logged-in user.
 
     The view injects `user` into the form kwargs and sets `form.instance.user`
     in `form_valid` to ensure the saved Transaction references the authenticated
-    user.
+    user. POSTs are subject to the `create` rate limit, and the form refuses
+    an unconfirmed exact duplicate (a double-submitted form).
     """
     model = Transaction
     form_class = TransactionForm
     template_name = 'transaction/transaction_form.html'
     success_url = reverse_lazy('list')
+    # Repeating transactions also insert their RecurringRule
+    performance_budget = {'queries': 16}
 
     def get_form_kwargs(self):
         """Add the current user to the form kwargs for potential use in form logic."""
@@ -112,9 +321,20 @@ class TransactionCreateView(LoginRequiredMixin, CreateView):
         return kwargs
 
     def form_valid(self, form):
-        """Assign the logged-in user to the Transaction before saving."""
+        """Assign the logged-in user to the Transaction before saving.
+
+        With `repeat` set, a `RecurringRule` is created first and the new
+        transaction becomes its first occurrence.
+        """
         form.instance.user = self.request.user
-        return super().form_valid(form)
+        if not form.cleaned_data.get('repeat'):
+            return super().form_valid(form)
+        with transaction.atomic():
+            start_rule(
+                form.instance, form.cleaned_data['repeat'],
+                count=form.cleaned_data.get('repeat_count'), until=form.cleaned_data.get('repeat_until'),
+            )
+            return super().form_valid(form)
 
     def get_context_data(self, **kwargs):
         """Provide template flags used to control form rendering."""
@@ -123,24 +343,41 @@ class TransactionCreateView(LoginRequiredMixin, CreateView):
         context['edit_transaction'] = False
         
         # Add categories by type for JavaScript filtering
-        context['income_categories'] = Category.objects.filter(type='income')
-        context['expense_categories'] = Category.objects.filter(type='expense')
+        context['income_categories'] = get_categories_by_type('income')
+        context['expense_categories'] = get_categories_by_type('expense')
         
         return context
 
 
 class TransactionDetailView(LoginRequiredMixin, DetailView):
-    """Show a single Transaction, ensuring it belongs to the user."""
+    """Show a single Transaction, ensuring it belongs to the user.
+
+    A transaction flagged as a possible duplicate also lists the
+    transactions it matches (one indexed query, see `duplicates.py`).
+    """
     model = Transaction
     template_name = 'transaction/transaction_detail.html'
     context_object_name = 'transaction'
+    performance_budget = {'queries': 4}
 
     def get_queryset(self):
         """Limit visible objects to those owned by the request user."""
-        return super().get_queryset().filter(user=self.request.user)
+        return super().get_queryset().filter(user=self.request.user).select_related('category')
+
+    def get_duplicate_matches(self, transaction):
+        """Return the transactions a flagged `transaction` may duplicate."""
+        if not transaction.possible_duplicate:
+            return []
+        return find_duplicates(transaction.user_id, transaction.fingerprint, transaction.date, exclude=transaction.pk)
+
+    def get_context_data(self, **kwargs):
+        """Add `duplicate_matches` unless the caller loaded them."""
+        if 'duplicate_matches' not in kwargs:
+            kwargs['duplicate_matches'] = self.get_duplicate_matches(self.object)
+        return super().get_context_data(**kwargs)
 
 
-class TransactionUpdateView(LoginRequiredMixin, UpdateView):
+class TransactionUpdateView(LoginRequiredMixin, ReceiptUploadMixin, UpdateView):
     """Edit an existing Transaction owned by the user.
 
     Ensures the form receives the `user` and that only objects owned by the
@@ -150,6 +387,7 @@ class TransactionUpdateView(LoginRequiredMixin, UpdateView):
     form_class = TransactionForm
     template_name = 'transaction/transaction_form.html'
     success_url = reverse_lazy('list')
+    performance_budget = {'queries': 16}
 
     def get_queryset(self):
         """Limit editable objects to those owned by the request user."""
@@ -168,8 +406,8 @@ class TransactionUpdateView(LoginRequiredMixin, UpdateView):
         context['edit_transaction'] = True
         
         # Add categories by type for JavaScript filtering
-        context['income_categories'] = Category.objects.filter(type='income')
-        context['expense_categories'] = Category.objects.filter(type='expense')
+        context['income_categories'] = get_categories_by_type('income')
+        context['expense_categories'] = get_categories_by_type('expense')
         
         return context
 
@@ -179,8 +417,342 @@ class TransactionDeleteView(LoginRequiredMixin, DeleteView):
     model = Transaction
 
     success_url = reverse_lazy('list')
+    performance_budget = {'queries': 7}
 
     def get_queryset(self):
         """Return only objects owned by the request user so other users cannot delete them."""
         return super().get_queryset().filter(user=self.request.user)
 
+
+class TransactionBulkView(LoginRequiredMixin, View):
+    """Recategorize or delete many of the user's transactions in one request.
+
+    POST fields are those of `TransactionBulkForm`; with `scope=filter` the
+    list filters (`start_date`, `end_date`, `category`, `q`, `duplicates`) select the rows
+    instead of `ids` (400 if malformed). Selected ids must all belong to the
+    user (one COUNT query, 404 otherwise). The action runs inside one database transaction
+    with a single UPDATE or DELETE (see `bulk.py`), then redirects back to
+    the filtered list.
+    """
+    performance_budget = {'queries': 12}
+
+    def post(self, request, *args, **kwargs):
+        form = TransactionBulkForm(request.POST)
+        params = {key: request.POST[key] for key in FILTER_KEYS if request.POST.get(key)}
+        if not form.is_valid():
+            return HttpResponseBadRequest(' '.join(message for errors in form.errors.values() for message in errors))
+        if invalid_filters(params):
+            return HttpResponseBadRequest("Invalid filter value.")
+        data = form.cleaned_data
+        with transaction.atomic():
+            if data['scope'] == 'filter':
+                queryset = filter_transactions(Transaction.objects.filter(user=request.user), params, user_id=request.user.pk)
+            else:
+                queryset = bulk.owned(request.user.pk, data['ids'])
+                if queryset is None:
+                    raise Http404("No such transactions.")
+            if data['action'] == 'delete':
+                bulk.delete_transactions(request.user.pk, queryset)
+            elif data['action'] == 'not_duplicate':
+                bulk.clear_duplicate_flags(request.user.pk, queryset)
+            else:
+                bulk.recategorize(request.user.pk, queryset, data['new_category'])
+        return redirect(f"{reverse('list')}?{urlencode(params)}" if params else reverse('list'))
+
+
+class _Echo:
+    """File-like object whose `write` returns the value, for streaming csv."""
+
+    def write(self, value):
+        return value
+
+
+class TransactionExportView(LoginRequiredMixin, View):
+    """Stream the user's (filtered) transactions as CSV or NDJSON.
+
+    Query parameters:
+    - format: `csv` (default) or `ndjson`
+    - start_date, end_date, category, q, duplicates: same filters as the list
+      page; malformed values answer 400
+
+    Rows are read with `values_list(...).iterator(chunk_size=...)` and written
+    as they arrive through a `StreamingHttpResponse`, so memory use does not
+    depend on how many transactions the user has.
+    """
+    chunk_size = 2000
+    performance_budget = {'queries': 3}
+    columns = ('id', 'date', 'category__name', 'category__type', 'amount', 'currency', 'base_amount', 'description')
+    headers = ('id', 'date', 'category', 'type', 'amount', 'currency', 'base_amount', 'description')
+
+    def get(self, request, *args, **kwargs):
+        """Return a StreamingHttpResponse with an attachment filename."""
+        export_format = request.GET.get('format', 'csv')
+        if export_format not in ('csv', 'ndjson'):
+            return HttpResponseBadRequest("Unsupported export format.")
+
+        params = {key: request.GET[key] for key in FILTER_KEYS if request.GET.get(key)}
+        if invalid_filters(params):
+            return HttpResponseBadRequest("Invalid filter value.")
+        qs = filter_transactions(Transaction.objects.filter(user=request.user), params, user_id=request.user.pk)
+        rows = qs.order_by(*ORDERING).values_list(*self.columns).iterator(chunk_size=self.chunk_size)
+
+        if export_format == 'csv':
+            content = self.csv_lines(rows)
+            content_type = 'text/csv'
+        else:
+            content = self.ndjson_lines(rows)
+            content_type = 'application/x-ndjson'
+
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="transactions.{export_format}"'
+        return response
+
+    def csv_lines(self, rows):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(self.headers)
+        for row in rows:
+            yield writer.writerow(row)
+
+    def ndjson_lines(self, rows):
+        for row in rows:
+            record = dict(zip(self.headers, row))
+            record['date'] = record['date'].isoformat()
+            record['amount'] = str(record['amount'])
+            record['base_amount'] = str(record['base_amount'])
+            yield json.dumps(record) + '\n'
+
+
+@method_decorator(ratelimit('import'), name='post')
+class TransactionImportView(LoginRequiredMixin, FormView):
+    """Bulk import transactions from an uploaded CSV file.
+
+    GET renders the upload form. A valid POST streams the file through
+    `importer.import_transactions` and re-renders the page with the number of
+    rows created and a per-row error report. POSTs are subject to the
+    `import` rate limit.
+    """
+    form_class = TransactionImportForm
+    template_name = 'transaction/transaction_import.html'
+
+    def form_valid(self, form):
+        """Run the import and show its result instead of redirecting."""
+        upload = form.cleaned_data['file']
+        lines = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        result = import_transactions(self.request.user, lines)
+        return self.render_to_response(self.get_context_data(form=self.form_class(), result=result))
+
+
+class StatementView(LoginRequiredMixin, View):
+    """Monthly statement of the user's transactions as HTML or PDF.
+
+    URL arguments `year` and `month` select the month; the `format` query
+    parameter is `html` (default, shown inline) or `pdf` (downloaded). The
+    document is streamed (see `statements.py`); statements of closed months
+    are served from the media storage cache while the month is unchanged.
+    """
+    performance_budget = {'queries': 8}
+
+    def get(self, request, year, month, *args, **kwargs):
+        statement_format = request.GET.get('format', 'html')
+        if statement_format not in STATEMENT_FORMATS:
+            return HttpResponseBadRequest("Unsupported statement format.")
+        try:
+            # The following month bounds the statement, so it must exist too
+            first, _following = month_bounds(datetime.date(year, month, 1))
+        except ValueError:
+            raise Http404("No such month.")
+
+        chunks, cached_name = statement_chunks(request.user, first, statement_format, timezone.localdate())
+        content_type = STATEMENT_FORMATS[statement_format]
+        if cached_name is not None:
+            response = FileResponse(default_storage.open(cached_name, 'rb'), content_type=content_type)
+        else:
+            response = StreamingHttpResponse(chunks, content_type=content_type)
+        disposition = 'inline' if statement_format == 'html' else 'attachment'
+        response['Content-Disposition'] = f'{disposition}; filename="statement-{first:%Y-%m}.{statement_format}"'
+        patch_cache_control(response, private=True)
+        return response
+
+
+class BudgetView(LoginRequiredMixin, FormView):
+    """Set monthly budgets per expense category and review their alerts.
+
+    GET renders one limit field per expense category, the current month's
+    spending against each budget and the latest threshold alerts. A valid
+    POST replaces the user's budgets (`budgets.save_limits`).
+    """
+    form_class = BudgetForm
+    template_name = 'transaction/budgets.html'
+    success_url = reverse_lazy('budgets')
+    events_shown = 10
+    performance_budget = {'queries': 7}
+
+    def get_form_kwargs(self):
+        """Prefill the form with the user's current limits."""
+        kwargs = super().get_form_kwargs()
+        kwargs['initial_limits'] = dict(
+            Budget.objects.filter(user=self.request.user).values_list('category_id', 'limit')
+        )
+        return kwargs
+
+    def form_valid(self, form):
+        save_limits(self.request.user, form.limits())
+        return super().form_valid(form)
+
+    def get_context_data(self, **kwargs):
+        """Add this month's budget status and the latest alerts."""
+        context = super().get_context_data(**kwargs)
+        context['budgets'] = budget_status(self.request.user.pk, timezone.localdate().replace(day=1))
+        context['base_currency'] = base_currency(self.request.user.pk)
+        names = {category.pk: category.name for category in get_categories()}
+        context['events'] = [
+            {'category': names.get(category_id, ''), 'month': month, 'threshold': threshold,
+             'spent': spent, 'created_on': created_on}
+            for category_id, month, threshold, spent, created_on in
+            BudgetEvent.objects.filter(budget__user=self.request.user)
+            .values_list('budget__category_id', 'month', 'threshold', 'spent', 'created_on')[:self.events_shown]
+        ]
+        return context
+
+
+class RecurringRuleListView(LoginRequiredMixin, ListView):
+    """List the user's recurring transactions, active rules first.
+
+    Each rule shows its schedule and next occurrence, and can be ended
+    (`RecurringRuleEndView`) or deleted (`RecurringRuleDeleteView`). The
+    transactions a rule created are kept either way.
+    """
+    model = RecurringRule
+    template_name = 'transaction/recurring_rules.html'
+    context_object_name = 'rules'
+    login_url = 'login'
+    performance_budget = {'queries': 3}
+
+    def get_queryset(self):
+        """Return the user's rules, the next due first and ended ones last."""
+        return (
+            RecurringRule.objects.filter(user=self.request.user)
+            .select_related('category')
+            .order_by(F('next_date').asc(nulls_last=True), '-dtstart', '-id')
+        )
+
+
+class RecurringRuleEndView(LoginRequiredMixin, View):
+    """POST: stop one of the user's rules after its existing occurrences."""
+    performance_budget = {'queries': 3}
+
+    def post(self, request, pk, *args, **kwargs):
+        if not end_rule(request.user.pk, pk):
+            raise Http404("No such recurring transaction.")
+        return redirect('recurring')
+
+
+class RecurringRuleDeleteView(LoginRequiredMixin, DeleteView):
+    """POST: delete one of the user's rules; its transactions lose the link only."""
+    model = RecurringRule
+    http_method_names = ['post']
+    success_url = reverse_lazy('recurring')
+    performance_budget = {'queries': 5}
+
+    def get_queryset(self):
+        """Return only rules owned by the request user so other users cannot delete them."""
+        return super().get_queryset().filter(user=self.request.user)
+
+
+class TransactionSearchSuggestView(LoginRequiredMixin, View):
+    """Autocomplete suggestions for the list page search box.
+
+    GET `?q=` returns `{"suggestions": [...]}`: up to `limit` distinct
+    descriptions of the user's transactions matching `q`, best match first
+    (the last word is matched as a prefix).
+    """
+    limit = 8
+    performance_budget = {'queries': 5}
+
+    def get(self, request, *args, **kwargs):
+        query = request.GET.get('q', '')
+        suggestions = []
+        if search_terms(query):
+            qs = search_transactions(Transaction.objects.filter(user=request.user), query, user_id=request.user.pk)
+            # Over-fetch a little: several rows usually share a description
+            rows, _has_next = search_page(qs.only('description'), query, request.user.pk, 0, self.limit * 5)
+            suggestions = list(dict.fromkeys(row.description for row in rows))[:self.limit]
+        return JsonResponse({'suggestions': suggestions})
+
+
+class TransactionCategorySuggestView(LoginRequiredMixin, View):
+    """Category suggestions for the transaction form's description field.
+
+    GET `?description=&type=` returns `{"suggestions": [{"id", "name", "type",
+    "probability"}]}`, most likely first, from the user's in-memory model
+    (see `suggest.py`); `type` (income or expense) limits the categories.
+    Served without a query once the user's model is loaded.
+    """
+    limit = 3
+    performance_budget = {'queries': 4}
+
+    def get(self, request, *args, **kwargs):
+        category_type = request.GET.get('type')
+        if category_type not in ('income', 'expense'):
+            category_type = None
+        suggestions = [
+            {'id': category.pk, 'name': category.name, 'type': category.type, 'probability': round(probability, 3)}
+            for category, probability in
+            suggest_categories(request.user.pk, request.GET.get('description', ''), category_type, self.limit)
+        ]
+        return JsonResponse({'suggestions': suggestions})
+
+
+def _analytics_etag(request, *args, **kwargs):
+    """ETag for the analytics of the current user and query string.
+
+    Built from the per-user cache key, which changes whenever one of the
+    user's transactions does, so revalidation needs no database query.
+    """
+    if not request.user.is_authenticated:
+        return None
+    key = user_cache_key(request.user.pk, 'analytics', urlencode(sorted(request.GET.items())))
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+@method_decorator(condition(etag_func=_analytics_etag), name='get')
+class TransactionAnalyticsView(LoginRequiredMixin, View):
+    """JSON spending analytics for charts (see `analytics.py`).
+
+    Query parameters:
+    - period: `day`, `week` or `month` (default)
+    - start_date, end_date, category: same filters as the list page
+
+    Results are cached per user and query string and invalidated by any
+    write to the user's transactions. Responses carry an ETag and
+    `Cache-Control: private, no-cache`, so browsers revalidate and get a 304
+    while nothing changed.
+    """
+    performance_budget = {'queries': 6}
+
+    def get(self, request, *args, **kwargs):
+        """Return the analytics series as JSON, or 400 for bad parameters."""
+        period = request.GET.get('period', 'month')
+        if period not in PERIODS:
+            return HttpResponseBadRequest("Unsupported period.")
+        try:
+            start = self.parse_date('start_date')
+            end = self.parse_date('end_date')
+            category = request.GET.get('category')
+            category_id = int(category) if category else None
+        except ValueError:
+            return HttpResponseBadRequest("Invalid filter value.")
+
+        # The encoded body is cached, so hits skip serialization as well
+        key = user_cache_key(request.user.pk, 'analytics', urlencode(sorted(request.GET.items())))
+        content = cache.get(key)
+        if content is None:
+            content = json.dumps(spending_analytics(request.user, period, start, end, category_id))
+            cache.set(key, content, USER_CACHE_TTL)
+        response = HttpResponse(content, content_type='application/json')
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def parse_date(self, name):
+        value = self.request.GET.get(name)
+        return datetime.date.fromisoformat(value) if value else None
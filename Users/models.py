@@ -1,4 +1,28 @@
+from django.conf import settings
 from django.db import models
 
 
-# Create your models here.
+def default_currency():
+    """Base currency of users without a profile (`settings.BASE_CURRENCY`)."""
+    return settings.BASE_CURRENCY
+
+
+class Profile(models.Model):
+    """Per-user preferences.
+
+    Fields
+    - user: the auth user the preferences belong to
+    - base_currency: ISO 4217 code that the user's totals, rollups and
+      analytics are converted to (see `Transaction/currency.py`)
+
+    Notes
+    - Users without a profile use `settings.BASE_CURRENCY`. Changing the
+      base currency reconverts the user's transactions (see the Transaction
+      signals).
+    """
+    user = models.OneToOneField("auth.User", on_delete=models.CASCADE, related_name="profile")
+    base_currency = models.CharField(max_length=3, default=default_currency)
+
+    def __str__(self):
+        """Readable label used in admin."""
+        return f"{self.user_id} {self.base_currency}"
@@ -1,3 +1,99 @@
-from django.test import TestCase
+"""Tests for the Users app: the rate limits in front of the auth views."""
 
-# Create your tests here.
+import threading
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, modify_settings, override_settings
+from django.urls import reverse
+
+from mysite.ratelimit import ratelimit
+
+
+@override_settings(RATE_LIMIT_ENABLED=True, RATE_LIMITS={"burst": {"ip": (10, 3600)}})
+class RateLimitBurstTests(SimpleTestCase):
+    """A concurrent burst gets exactly the limit through, whatever the interleaving."""
+
+    clients = 40
+
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_burst(self):
+        view = ratelimit("burst")(lambda request: HttpResponse("ok"))
+        factory = RequestFactory()
+        barrier = threading.Barrier(self.clients)
+        responses = []
+
+        def client():
+            request = factory.post("/", REMOTE_ADDR="203.0.113.7")
+            barrier.wait()
+            responses.append(view(request))
+
+        threads = [threading.Thread(target=client) for _ in range(self.clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        allowed = [response for response in responses if response.status_code == 200]
+        rejected = [response for response in responses if response.status_code == 429]
+        self.assertEqual(len(allowed), 10)
+        self.assertEqual(len(rejected), self.clients - 10)
+        for response in rejected:
+            self.assertGreaterEqual(int(response["Retry-After"]), 1)
+            self.assertLessEqual(int(response["Retry-After"]), 3600)
+
+        # Other addresses have their own budget
+        self.assertEqual(view(factory.post("/", REMOTE_ADDR="203.0.113.8")).status_code, 200)
+
+
+@modify_settings(INSTALLED_APPS={"append": "tailwind"})
+@override_settings(
+    RATE_LIMIT_ENABLED=True,
+    RATE_LIMITS={"login": {"username": (5, 300)}},
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    STORAGES={
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    },
+)
+class LoginRateLimitTests(TestCase):
+    """Failed logins are limited per username across client addresses.
+
+    Successful logins are not counted, and addresses that logged in to the
+    account before are not limited by failures sent from elsewhere.
+    """
+
+    limit, window = 5, 300
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user(username="alice", password="correct horse")
+
+    def setUp(self):
+        cache.clear()
+
+    def login(self, password, address):
+        return self.client.post(
+            reverse("login"), {"username": "alice", "password": password}, REMOTE_ADDR=address, secure=True,
+        )
+
+    def test_username_limit_spans_addresses(self):
+        statuses = [self.login("guess", f"198.51.100.{attempt}") for attempt in range(self.limit + 1)]
+        self.assertEqual([response.status_code for response in statuses], [200] * self.limit + [429])
+        self.assertTrue(1 <= int(statuses[-1]["Retry-After"]) <= self.window)
+
+    def test_successful_logins_are_not_counted(self):
+        for attempt in range(self.limit * 2):
+            self.assertEqual(self.login("correct horse", f"198.51.100.{attempt}").status_code, 302)
+            self.client.logout()
+
+    def test_failures_elsewhere_do_not_lock_out_known_addresses(self):
+        self.assertEqual(self.login("correct horse", "203.0.113.7").status_code, 302)
+        self.client.logout()
+        for attempt in range(self.limit):
+            self.assertEqual(self.login("guess", f"198.51.100.{attempt}").status_code, 200)
+        self.assertEqual(self.login("correct horse", "198.51.100.99").status_code, 429)
+        self.assertEqual(self.login("correct horse", "203.0.113.7").status_code, 302)
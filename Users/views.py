@@ -251,8 +251,13 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
 from .forms import SignupForm, LoginForm
 from django.contrib.auth.decorators import login_required
+from mysite.ratelimit import ratelimit, record_failure, record_success
 
+# Rate limit kinds of the `login` scope that count failed logins only
+LOGIN_FAILURE_LIMITS = ('username',)
 
+
+@ratelimit('signup')
 def signup_view(request):
     """Render and process the signup form.
 
@@ -266,7 +271,8 @@ def signup_view(request):
 
     Returns:
     - HttpResponse rendering the form for GET or invalid POST, or a
-      redirect HttpResponse on successful signup.
+      redirect HttpResponse on successful signup; 429 when the client's
+      address is over the `signup` rate limit (checked before hashing).
     """
     if request.method == 'POST':
         form = SignupForm(request.POST)
@@ -282,6 +288,7 @@ def signup_view(request):
     return render(request, 'Users/register.html', {'form': form})
 
 
+@ratelimit('login', failures_only=LOGIN_FAILURE_LIMITS)
 def login_view(request):
     """Render and process the login form.
 
@@ -299,7 +306,10 @@ def login_view(request):
 
     Returns:
     - HttpResponse rendering the login template, or a redirect on successful
-      login.
+      login; 429 when the client's address or the submitted username is over
+      the `login` rate limit (checked before `authenticate` hashes anything).
+      The username limit counts failed logins only, and not those sent from
+      an address that logged in to the account before.
     """
     # handle both GET and POST and always return an HttpResponse
     next_url = request.GET.get('next', '')
@@ -310,8 +320,10 @@ def login_view(request):
             password = form.cleaned_data['password']
             user = authenticate(request, username=username, password=password)
             if user:
+                record_success(request, 'login', LOGIN_FAILURE_LIMITS)
                 login(request, user)
                 return redirect(next_url or 'list')
+            record_failure(request, 'login', LOGIN_FAILURE_LIMITS)
             messages.error(request, 'Invalid credentials')
         # fall through to render the form with errors
     else:
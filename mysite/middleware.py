@@ -0,0 +1,201 @@
+"""Request performance instrumentation.
+
+`PerformanceMiddleware` measures, for every request:
+
+- the number of SQL queries and the time spent in them (via
+  `connection.execute_wrapper`);
+- template rendering time (it renders `TemplateResponse`s itself);
+- total wall time.
+
+The numbers are sent to the client as a `Server-Timing` header and logged as
+one JSON line at DEBUG level on the `mysite.performance` logger (shown with
+`PERF_LOG_LEVEL=DEBUG`).
+
+Views may declare a `performance_budget` dict (class attribute for class-based
+views, function attribute for function views) with any of the keys `queries`,
+`db_ms` and `total_ms`. Requests over budget are logged as warnings; with
+`PERFORMANCE_BUDGET_RAISE = True` (set by the test suite) the middleware
+raises `PerformanceBudgetExceeded` instead, so regressions such as an N+1
+query fail the tests. Writes are never failed after the fact: POST and
+friends are only logged, and tests check them against
+`request._performance["metrics"]`.
+
+The queries of a `StreamingHttpResponse` body (exports, statements) are
+counted while the server streams it, and logged once it is exhausted.
+
+The middleware is both sync and async capable, so under ASGI it does not
+force the async read views (`Transaction/async_views.py`) through a thread.
+Database connections are thread-local and the async ORM runs its queries
+in the request's thread-sensitive worker thread, so in async mode the query
+timer is installed (and removed) from that thread.
+"""
+
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import FileResponse
+
+
+logger = logging.getLogger("mysite.performance")
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class PerformanceBudgetExceeded(AssertionError):
+    """Raised when a view goes over its declared `performance_budget`."""
+
+
+class _QueryTimer:
+    """`execute_wrapper` callable that counts queries and sums their time."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+
+
+class PerformanceMiddleware:
+    """Record query count, DB/template/total time and enforce view budgets.
+
+    Place it first in MIDDLEWARE so it measures the whole stack and is the
+    last `process_template_response` hook to run (it renders the response).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        start = time.perf_counter()
+        timer = self.start(request)
+        with self.measure(timer):
+            response = self.get_response(request)
+        return self.finish(request, response, timer, start)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        timer = self.start(request)
+        stack = await sync_to_async(self.measure)(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.finish(request, response, timer, start)
+
+    def start(self, request):
+        request._performance = {"view": None, "budget": None, "template_seconds": 0.0}
+        return _QueryTimer()
+
+    def measure(self, timer):
+        """Return a context manager routing every connection's queries through `timer`."""
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timer))
+        return stack
+
+    def finish(self, request, response, timer, start):
+        """Add the Server-Timing header, log the metrics and check the budget.
+
+        A streaming body runs its queries while the server iterates it, after
+        this returns, so it is wrapped and reported once exhausted; the
+        header can only cover the work done before the first byte.
+        """
+        metrics = self.metrics(request, timer, start)
+        response["Server-Timing"] = ", ".join([
+            f'db;dur={metrics["db_ms"]};desc="{metrics["queries"]} queries"',
+            f'tpl;dur={metrics["template_ms"]}',
+            f'total;dur={metrics["total_ms"]}',
+        ])
+        # Files are read from storage without queries, and wrapping them would
+        # lose the server's sendfile path. Async bodies are not measured.
+        if response.streaming and not response.is_async and not isinstance(response, FileResponse):
+            response.streaming_content = self.stream(request, response, response.streaming_content, timer, start)
+            return response
+        self.report(request, response, metrics)
+        return response
+
+    def stream(self, request, response, content, timer, start):
+        """Yield the chunks of `content`, the body of `response`, counting the queries that produce them."""
+        chunks = iter(content)
+        while True:
+            with self.measure(timer):
+                chunk = next(chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+        self.report(request, response, self.metrics(request, timer, start))
+
+    def metrics(self, request, timer, start):
+        """Return the request's metrics so far, also kept in `request._performance["metrics"]`."""
+        state = request._performance
+        state["metrics"] = {
+            "queries": timer.count,
+            "db_ms": round(timer.seconds * 1000, 2),
+            "template_ms": round(state["template_seconds"] * 1000, 2),
+            "total_ms": round((time.perf_counter() - start) * 1000, 2),
+        }
+        return state["metrics"]
+
+    def report(self, request, response, metrics):
+        """Log the request's metrics and check them against the view's budget."""
+        state = request._performance
+        logger.debug(json.dumps({
+            "method": request.method,
+            "path": request.path,
+            "view": state["view"],
+            "status": response.status_code,
+            **metrics,
+        }))
+        self.check_budget(request, state, metrics)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """Remember which view handles the request and its budget."""
+        view = getattr(view_func, "view_class", view_func)
+        request._performance["view"] = f"{view.__module__}.{view.__qualname__}"
+        request._performance["budget"] = getattr(view, "performance_budget", None)
+        return None
+
+    def process_template_response(self, request, response):
+        """Render the response here so template time can be measured."""
+        start = time.perf_counter()
+        response.render()
+        request._performance["template_seconds"] += time.perf_counter() - start
+        return response
+
+    def check_budget(self, request, state, metrics):
+        """Log (or raise, in strict mode) when a view exceeds its budget.
+
+        Only safe requests raise: an unsafe one has committed its writes by
+        now, and turning it into a 500 would hide that it succeeded.
+        """
+        budget = state["budget"]
+        if not budget:
+            return
+        over = {key: (metrics[key], limit) for key, limit in budget.items() if metrics.get(key, 0) > limit}
+        if not over:
+            return
+        message = f"{state['view']} over performance budget: " + ", ".join(
+            f"{key}={value} (budget {limit})" for key, (value, limit) in over.items()
+        )
+        if getattr(settings, "PERFORMANCE_BUDGET_RAISE", False) and request.method in SAFE_METHODS:
+            raise PerformanceBudgetExceeded(message)
+        logger.warning(message)
@@ -0,0 +1,182 @@
+"""Sliding-window rate limiting backed by Django's cache.
+
+`ratelimit(scope)` decorates a view so that its POST requests are counted
+against the limits configured for `scope` in `settings.RATE_LIMITS`:
+
+    RATE_LIMITS = {"login": {"ip": (20, 300), "username": (5, 300)}, ...}
+
+Each entry maps a key kind to `(requests, window seconds)`:
+
+- `ip`: the client address (see `client_ip`);
+- `username`: the `username` field of the submitted form, so one account
+  can't be attacked from many addresses;
+- `user`: the authenticated user's id.
+
+Counts are kept per fixed window with an atomic `cache.incr`, and the
+sliding estimate weights the previous window by how much of it still
+overlaps the last `window` seconds (the "sliding window counter"
+algorithm). Every request is counted before it is judged, so concurrent
+bursts can't all slip in between a read and a write: the Nth request of a
+window sees N. Rejected requests count too, so a sustained burst stays
+blocked until it slows down.
+
+Key kinds listed in the decorator's `failures_only` are checked the same
+way but counted only when the view reports a failure (`record_failure`,
+e.g. a wrong password), so successful logins never use up an account's
+limit. A success (`record_success`) also exempts the client address from
+those limits for `RATE_LIMIT_TRUST_SECONDS`: failures sent from elsewhere
+can't lock the account's owner out of the addresses they use.
+
+A rejected request gets `429 Too Many Requests` with `Retry-After` before
+the view runs, i.e. before any password hashing. A check costs two or
+three cache operations per key kind (microseconds with the local memory
+cache); use a shared cache (`REDIS_URL`) so limits hold across workers.
+"""
+
+import functools
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+
+KEY_PREFIX = "ratelimit"
+
+
+def client_ip(request):
+    """Return the client address, honouring `RATE_LIMIT_PROXY_COUNT` trusted proxies.
+
+    Behind N proxies the address is the Nth entry from the right of
+    `X-Forwarded-For` (the one added by the outermost trusted proxy), so a
+    client can't pick its own key by sending the header.
+    """
+    proxies = getattr(settings, "RATE_LIMIT_PROXY_COUNT", 0)
+    if proxies:
+        hops = [hop.strip() for hop in request.META.get("HTTP_X_FORWARDED_FOR", "").split(",") if hop.strip()]
+        if len(hops) >= proxies:
+            return hops[-proxies]
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def _identity(request, kind):
+    if kind == "ip":
+        return client_ip(request)
+    if kind == "username":
+        username = request.POST.get("username", "").strip().lower()
+        # Hashed: usernames are user input and cache keys have a restricted alphabet
+        return hashlib.md5(username.encode()).hexdigest() if username else ""
+    if kind == "user":
+        return str(request.user.pk) if request.user.is_authenticated else ""
+    raise ValueError(f"Unknown rate limit key kind: {kind}")
+
+
+def _increment(key, timeout):
+    """Atomically add one to `key` and return the new count."""
+    if cache.add(key, 1, timeout):
+        return 1
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Expired between add() and incr()
+        cache.add(key, 1, timeout)
+        return 1
+
+
+def hit(scope, kind, identity, limit, window, now=None, count=True):
+    """Count one request and return 0 if allowed, else an estimate of the seconds to wait.
+
+    The estimate is `previous * overlap + current`, where `overlap` is the
+    share of the previous fixed window still inside the sliding window.
+    With `count` false the request is judged as if it were counted, but
+    nothing is stored.
+    """
+    now = time.time() if now is None else now
+    index, offset = divmod(now, window)
+    index = int(index)
+    base = f"{KEY_PREFIX}:{scope}:{kind}:{identity}:"
+    if count:
+        # Kept for two windows: the next window still reads this one
+        current = _increment(f"{base}{index}", window * 2)
+    else:
+        current = cache.get(f"{base}{index}", 0) + 1
+    if current > limit:
+        return max(1, math.ceil(window - offset))
+    previous = cache.get(f"{base}{index - 1}", 0)
+    overlap = 1 - offset / window
+    if previous * overlap + current <= limit:
+        return 0
+    # The previous window's weight decays linearly; wait until it is low enough
+    wait = (previous * overlap + current - limit) / previous * window
+    return max(1, math.ceil(min(wait, window - offset)))
+
+
+def _trust_key(request, scope, kind, identity):
+    return f"{KEY_PREFIX}:{scope}:{kind}:{identity}:trusted:{client_ip(request)}"
+
+
+def check(request, scope, failures_only=()):
+    """Return 0 if `request` is within every limit of `scope`, else seconds to wait.
+
+    Kinds in `failures_only` are not counted here (see `record_failure`)
+    and don't apply to addresses trusted by `record_success`.
+    """
+    limits = getattr(settings, "RATE_LIMITS", {}).get(scope)
+    if not limits or not getattr(settings, "RATE_LIMIT_ENABLED", True):
+        return 0
+    now = time.time()
+    retry_after = 0
+    for kind, (limit, window) in limits.items():
+        identity = _identity(request, kind)
+        if not identity:
+            continue
+        if kind in failures_only:
+            if cache.get(_trust_key(request, scope, kind, identity)):
+                continue
+            retry_after = max(retry_after, hit(scope, kind, identity, limit, window, now, count=False))
+        else:
+            retry_after = max(retry_after, hit(scope, kind, identity, limit, window, now))
+    return retry_after
+
+
+def record_failure(request, scope, kinds):
+    """Count a failed attempt (e.g. a wrong password) against the `kinds` limits of `scope`."""
+    limits = getattr(settings, "RATE_LIMITS", {}).get(scope, {})
+    now = time.time()
+    for kind in kinds:
+        identity = _identity(request, kind)
+        if identity and kind in limits:
+            limit, window = limits[kind]
+            hit(scope, kind, identity, limit, window, now)
+
+
+def record_success(request, scope, kinds):
+    """Exempt the client address from the `kinds` limits of `scope` for this identity."""
+    for kind in kinds:
+        identity = _identity(request, kind)
+        if identity:
+            cache.set(_trust_key(request, scope, kind, identity), True, settings.RATE_LIMIT_TRUST_SECONDS)
+
+
+def ratelimit(scope, methods=("POST",), failures_only=()):
+    """Decorator rejecting requests over the `scope` limits with a 429 response.
+
+    Only `methods` are counted (by default POST, i.e. the requests that
+    hash passwords or write rows); the view counts the failures of the
+    `failures_only` kinds itself (see `record_failure`). Use
+    `method_decorator(ratelimit(...), name='post')` on class-based views.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method in methods:
+                retry_after = check(request, scope, failures_only)
+                if retry_after:
+                    response = HttpResponse("Too many requests, please try again later.", status=429)
+                    response["Retry-After"] = str(retry_after)
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -35,6 +35,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "mysite.middleware.PerformanceMiddleware",  # first: measures the whole stack
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",  # must be just after SecurityMiddleware
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -96,10 +97,76 @@ if USE_SPACES:
     else:
         MEDIA_URL = f"https://{AWS_STORAGE_BUCKET_NAME}.{AWS_S3_REGION_NAME}.digitaloceanspaces.com/"
 
-    DEFAULT_FILE_STORAGE = "storages.backends.s3boto3.S3Boto3Storage"
+    STORAGES["default"] = {"BACKEND": "storages.backends.s3boto3.S3Boto3Storage"}
 else:
     MEDIA_URL = "/media/"
     MEDIA_ROOT = BASE_DIR / "media"
+    STORAGES["default"] = {"BACKEND": "django.core.files.storage.FileSystemStorage"}
+
+# Cache: per-process LocMem by default; set REDIS_URL to share cached data
+# (e.g. the Category lookup table) between workers
+REDIS_URL = os.getenv("REDIS_URL", "").strip()
+if REDIS_URL:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": REDIS_URL}}
+else:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+CATEGORY_CACHE_TTL = int(os.getenv("CATEGORY_CACHE_TTL", "300"))  # shared cache, seconds
+CATEGORY_LOCAL_TTL = int(os.getenv("CATEGORY_LOCAL_TTL", "30"))  # per-process copy, seconds
+TRANSACTION_CACHE_TTL = int(os.getenv("TRANSACTION_CACHE_TTL", "600"))  # per-user list data, seconds
+
+# Sliding-window rate limits (mysite/ratelimit.py): scope -> {key kind: (requests, window seconds)}.
+# Counters live in CACHES, so set REDIS_URL for limits shared between workers.
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "True").lower() == "true"
+RATE_LIMIT_PROXY_COUNT = int(os.getenv("RATE_LIMIT_PROXY_COUNT", "0"))  # trusted X-Forwarded-For hops (1 on Heroku)
+RATE_LIMIT_TRUST_SECONDS = 30 * 24 * 3600  # a successful login exempts its address from the username limit
+RATE_LIMITS = {
+    # The username limit counts failed logins only (see Users.views.login_view)
+    "login": {"ip": (20, 300), "username": (5, 300)},
+    "signup": {"ip": (5, 3600)},
+    "create": {"user": (60, 60)},
+    "import": {"user": (10, 3600)},
+}
+
+# Currencies (Transaction/currency.py): totals are shown in each user's base currency
+# (Users.Profile, BASE_CURRENCY when unset). Exchange rates are loaded offline from
+# FX_RATES_FILE (ECB reference-rate CSV layout, rates per 1 FX_REFERENCE_CURRENCY)
+# with `manage.py load_fx_rates`.
+BASE_CURRENCY = os.getenv("BASE_CURRENCY", "USD").upper()
+FX_REFERENCE_CURRENCY = os.getenv("FX_REFERENCE_CURRENCY", "EUR").upper()
+FX_RATES_FILE = Path(os.getenv("FX_RATES_FILE", str(BASE_DIR / "Transaction" / "fixtures" / "fx_rates.csv")))
+FX_LOCAL_TTL = int(os.getenv("FX_LOCAL_TTL", "30"))  # seconds before a worker re-checks for reloaded rates
+
+# Offline sync API (Transaction/sync.py): page size of a delta, how far back every delta
+# re-reads to catch writes that committed late, and how long deletions are remembered
+# (clients that have not synced for longer are sent everything again)
+SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", "500"))
+SYNC_MAX_UPLOAD = int(os.getenv("SYNC_MAX_UPLOAD", "500"))  # upserts + deletes per POST
+SYNC_SETTLE_SECONDS = int(os.getenv("SYNC_SETTLE_SECONDS", "60"))
+SYNC_TOMBSTONE_DAYS = int(os.getenv("SYNC_TOMBSTONE_DAYS", "90"))
+
+# Category suggestions (Transaction/suggest.py): per-user models kept in each worker's memory
+SUGGEST_CACHE_USERS = int(os.getenv("SUGGEST_CACHE_USERS", "256"))  # models kept per process (LRU)
+SUGGEST_HISTORY = int(os.getenv("SUGGEST_HISTORY", "5000"))  # most recent transactions a model is built from
+SUGGEST_MODEL_TTL = int(os.getenv("SUGGEST_MODEL_TTL", "300"))  # seconds before a model is rebuilt
+
+# Duplicate detection (Transaction/duplicates.py): equal transactions at most this
+# many days apart are flagged as possible duplicates
+DUPLICATE_WINDOW_DAYS = int(os.getenv("DUPLICATE_WINDOW_DAYS", "3"))
+
+# Serve the list/detail/analytics pages with async views (Transaction/async_views.py);
+# only worth enabling when running under an ASGI server (see SETUP_STEPS.md)
+ASYNC_READ_VIEWS = os.getenv("ASYNC_READ_VIEWS", "False").lower() == "true"
+
+# Receipt images: uploads are staged on local disk and resized/recompressed by
+# a background worker before being stored in media storage (see Transaction/images.py)
+RECEIPT_MAX_UPLOAD_SIZE = int(os.getenv("RECEIPT_MAX_UPLOAD_SIZE", str(10 * 1024 * 1024)))  # bytes
+RECEIPT_STAGING_ROOT = Path(os.getenv("RECEIPT_STAGING_ROOT", str(BASE_DIR / "staging")))
+RECEIPT_WORKERS = int(os.getenv("RECEIPT_WORKERS", "2"))
+RECEIPT_MAX_DIMENSION = 1600  # px, longest side of the stored image
+RECEIPT_THUMBNAIL_SIZE = 160  # px
+RECEIPT_QUALITY = 80
+RECEIPT_PROCESS_SYNC = os.getenv("RECEIPT_PROCESS_SYNC", "False").lower() == "true"
 
 # Tailwind settings (safe defaults for Linux servers; override via env if needed)
 TAILWIND_APP_NAME = os.getenv("TAILWIND_APP_NAME", "theme")
@@ -159,4 +226,11 @@ LOGGING = {
     "disable_existing_loggers": False,
     "handlers": {"console": {"class": "logging.StreamHandler"}},
     "root": {"handlers": ["console"], "level": os.getenv("LOG_LEVEL", "INFO")},
+    # Over-budget warnings from mysite.middleware.PerformanceMiddleware; DEBUG adds
+    # one JSON line of metrics per request
+    "loggers": {"mysite.performance": {"level": os.getenv("PERF_LOG_LEVEL", "INFO")}},
 }
+
+# Raise instead of logging when a safe (GET/HEAD/OPTIONS) request exceeds its view's
+# performance_budget; the test suite turns it on (see Transaction/tests.py)
+PERFORMANCE_BUDGET_RAISE = os.getenv("PERFORMANCE_BUDGET_RAISE", "False").lower() == "true"